@@ -1,37 +1,366 @@
-from flask import Flask, request, jsonify, send_from_directory, render_template_string
+import time
+# 冷启动计时从导入 Flask 之前开始
+_import_started = time.perf_counter()
+
+from flask import Flask, request, jsonify, send_from_directory, render_template_string, abort, redirect, g
 from flask_cors import CORS
 import os
 import json
+import math
 import uuid
+import functools
+import mimetypes
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone, timedelta
+from urllib.parse import urlsplit
 from werkzeug.utils import secure_filename
+from werkzeug.security import safe_join
+from werkzeug.middleware.proxy_fix import ProxyFix
 import logging
-# from cloud_storage import storage  # 暂时注释掉云存储模块
+from cloud_storage import (storage, cloud_storage_configured, LocalStorage, TieredStorage,
+                           DedupCloudStorage)
+from works_store import (create_works_store, summarize_work, WorkNotFoundError,
+                         CommentNotFoundError, PermissionDeniedError)
+from works_cache import WorksCache
+from pagination import (InvalidCursorError, work_cursor, work_cursor_key,
+                        comment_cursor, comment_cursor_key, search_cursor, search_cursor_key,
+                        parse_fields, project)
+from image_variants import ImageVariantPipeline
+from upload_ingest import (stream_to_file, UploadSessionManager, InvalidImageError,
+                           UploadTooLargeError, UploadSessionError)
+from blob_store import BlobStore
+from leaderboard import LEADERBOARD_WINDOWS
+from search_index import query_terms
+from metrics import MetricsRegistry, SIZE_BUCKETS, instrument_methods
+from profiler import create_profiler
+from compression import ENCODINGS, compress, encoded_etag, etag_matches, negotiate
+from json_codec import FastJSONProvider
+from cold_start import StartupTimer, SnapshotSync, create_snapshot_store, hydrate
+from rate_limit import ConcurrencyLimiter, RateLimiter, build_rules, create_bucket_backend
+import logging_config
 
-# 配置日志
-logging.basicConfig(level=logging.DEBUG)
+# 配置日志（LOG_LEVEL / LOG_FORMAT），日志由后台线程写出
+logging_config.configure_logging()
 logger = logging.getLogger(__name__)
 
+# 启动各阶段耗时，启动完成时输出，并在 /api/health 中返回
+startup = StartupTimer(_import_started)
+startup.mark('import')
+
 app = Flask(__name__)
+# 安装了 orjson 时用 orjson 序列化响应；中文直接输出 UTF-8，不再转义
+app.json = FastJSONProvider(app)
 CORS(app)
 
 # 配置
-UPLOAD_FOLDER = '/tmp/uploads' if os.environ.get('VERCEL') else 'uploads'
+# 使用绝对路径：send_from_directory 会把相对路径解析到应用目录，而不是当前工作目录
+UPLOAD_FOLDER = os.path.abspath('/tmp/uploads' if os.environ.get('VERCEL') else 'uploads')
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
 MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+DEFAULT_COMMENTS_PAGE_SIZE = 20
+MAX_SEARCH_QUERY_LENGTH = 200
+MAX_STATUS_BATCH = 500  # 批量查询点赞状态的最大作品数
+MAX_BATCH_OPERATIONS = 100  # 批量修改接口一次最多的操作数
+IMAGE_DELETE_WORKERS = 8  # 删除作品时并行删除图片的线程数
+DEFAULT_LEADERBOARD_SIZE = 10
+MAX_LEADERBOARD_SIZE = 100
+SESSION_CHUNK_SIZE = 4 * 1024 * 1024  # 分块上传时建议客户端使用的块大小
+# 上传的图片文件名唯一且内容不会改变，可长期缓存
+UPLOADS_MAX_AGE = 365 * 24 * 3600
+# 上传图片的发送方式：
+# - app（默认）：由 Flask 发送，支持 Range；WSGI 服务器提供 wsgi.file_wrapper 时（如 gunicorn）使用 sendfile 零拷贝
+# - x-sendfile：只返回 X-Sendfile 头，由 Apache(mod_xsendfile)/lighttpd 发送文件
+# - x-accel：只返回 X-Accel-Redirect 头，由 nginx 的 internal location 发送文件
+UPLOADS_SERVE_MODES = ('app', 'x-sendfile', 'x-accel')
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
+app.config['UPLOADS_SERVE_MODE'] = os.environ.get('UPLOADS_SERVE_MODE', 'app')
+app.config['UPLOADS_ACCEL_PREFIX'] = os.environ.get('UPLOADS_ACCEL_PREFIX', '/_uploads')
+# 位于反向代理之后时按 X-Forwarded-For 取客户端 IP（限流按 IP 计数），值为可信代理的层数（Vercel 上默认 1）
+TRUSTED_PROXIES = int(os.environ.get('TRUSTED_PROXIES', '1' if os.environ.get('VERCEL') else '0'))
+if TRUSTED_PROXIES:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXIES)
+if app.config['UPLOADS_SERVE_MODE'] not in UPLOADS_SERVE_MODES:
+    logger.warning(f"未知的 UPLOADS_SERVE_MODE: {app.config['UPLOADS_SERVE_MODE']}，使用 app")
+    app.config['UPLOADS_SERVE_MODE'] = 'app'
 
 # 确保上传目录存在（用于本地存储）
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+# 图片多尺寸生成（后台线程）
+image_pipeline = ImageVariantPipeline(UPLOAD_FOLDER)
+
+# 分块上传会话（大图可断点续传）
+upload_sessions = UploadSessionManager(UPLOAD_FOLDER, MAX_CONTENT_LENGTH)
+
+# 按内容哈希保存图片，重复上传的图片只保存一份
+blob_store = BlobStore(UPLOAD_FOLDER)
+
 # 数据文件 - 在Vercel中使用临时存储
 DATA_FILE = '/tmp/works.json' if os.environ.get('VERCEL') else 'works.json'
 
 # 配置WORKS_FILE
 app.config['WORKS_FILE'] = DATA_FILE
 
+# 作品存储后端（WORKS_STORE=json/sqlite，默认json）
+app.config['WORKS_DB'] = os.environ.get('WORKS_DB', os.path.splitext(DATA_FILE)[0] + '.db')
+works_store = create_works_store(app.config['WORKS_FILE'], app.config['WORKS_DB'])
+startup.mark('init')
+
+# 作品快照（设置 SNAPSHOT_URL 或 SNAPSHOT_DIR 时启用）：无服务器实例启动时本地没有数据，从快照恢复；
+# 修改请求结束后把数据写回快照（SNAPSHOT_MIN_INTERVAL 秒内最多写一次，默认每次修改都写）
+snapshot_store = create_snapshot_store()
+snapshot_sync = None
+if snapshot_store is not None:
+    try:
+        restored = hydrate(works_store, snapshot_store)
+    except Exception as e:
+        # 快照存在但无法读取：本实例不写回快照，避免用空数据覆盖
+        logger.error(f"恢复作品快照失败，本实例不会写回快照: {e}")
+    else:
+        if restored is not None:
+            startup.details['hydrated'] = restored
+        snapshot_sync = SnapshotSync(works_store, snapshot_store,
+                                     float(os.environ.get('SNAPSHOT_MIN_INTERVAL', '0')))
+    startup.mark('hydrate')
+
+# 作品列表读缓存：保存排序后的列表和序列化好的响应体
+works_cache = WorksCache(works_store, lambda works: app.json.response(works).get_data())
+
+def on_image_replicated(filename, local_url, cloud_url, meta):
+    """图片复制到云存储后，把作品中的本地地址替换为云存储地址；作品已删除时返回 False"""
+    try:
+        works_store.replace_image_url(meta['work_id'], local_url, cloud_url)
+        return True
+    except WorkNotFoundError:
+        # 作品已删除；相同内容仍被其他作品引用时保留云端副本
+        return blob_store.refs(filename) > 0
+
+# 实时事件推送（设置 EVENTS_PORT 时启用）：SSE 服务器在该端口上由一个事件循环线程服务所有连接，
+# 事件写入 works.json.events，多个 worker 进程之间共享
+# 预加载（gunicorn preload_app）时主进程只创建不启动，由 fork 出的 worker 各自启动
+PRELOADED = os.environ.get('APP_PRELOAD') == '1'
+events = None
+if os.environ.get('EVENTS_PORT'):
+    # asyncio 导入较慢，未启用事件推送时不导入
+    from event_stream import create_event_stream
+    events = create_event_stream(DATA_FILE + '.events', start=not PRELOADED)
+
+def publish_event(event_type, data):
+    """发布增量事件（未启用事件推送时忽略）"""
+    if events is not None:
+        events.publish(event_type, data)
+
+# 云存储（配置了 IMGBB_API_KEY 或 CLOUDINARY_CLOUD_NAME 时启用）：图片先保存到本地并立即返回，
+# 再由后台线程复制到云存储；未配置时只使用本地存储
+cloud_backend = None
+if cloud_storage_configured():
+    cloud_backend = TieredStorage(LocalStorage(UPLOAD_FOLDER),
+                                  DedupCloudStorage(storage, os.path.join(UPLOAD_FOLDER, '.cloud_index')),
+                                  os.path.join(UPLOAD_FOLDER, '.replication'),
+                                  on_replicated=on_image_replicated)
+
+# 运行指标（默认开启，METRICS_ENABLED=0 关闭），在 /api/metrics 以 Prometheus 格式导出；
+# 多个 worker 进程时设置 METRICS_DIR 为共享目录，导出时汇总所有进程的数据
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') != '0'
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')  # 设置后抓取指标需要 Authorization: Bearer <token>
+metrics = MetricsRegistry(os.environ.get('METRICS_DIR'))
+request_count = metrics.counter('http_requests_total', '请求数', ('method', 'endpoint', 'status'))
+request_latency = metrics.histogram('http_request_duration_seconds', '请求处理耗时（秒）', ('method', 'endpoint'))
+response_size = metrics.histogram('http_response_size_bytes', '响应体大小（字节）', ('endpoint',), SIZE_BUCKETS)
+store_latency = metrics.histogram('works_store_operation_seconds', '作品存储操作耗时（秒）', ('backend', 'operation'))
+store_errors = metrics.counter('works_store_errors_total', '作品存储操作失败次数', ('backend', 'operation'))
+storage_latency = metrics.histogram('storage_operation_seconds', '图片存储操作耗时（秒）', ('backend', 'operation'))
+storage_errors = metrics.counter('storage_errors_total', '图片存储操作失败次数', ('backend', 'operation'))
+startup_latency = metrics.histogram('app_startup_seconds', '启动各阶段耗时（秒）', ('phase', 'deploy'))
+rate_limit_rejections = metrics.counter('rate_limited_requests_total', '被限流拒绝的请求数', ('route', 'reason'))
+upload_queue_wait = metrics.histogram('upload_queue_wait_seconds', '上传请求排队等待时间（秒）')
+
+STORE_METRIC_METHODS = ('load_works', 'save_works', 'list_works', 'get_work', 'list_comments', 'search',
+                        'leaderboard', 'liked_status', 'create_work', 'delete_work', 'toggle_like',
+                        'add_comment', 'delete_comment', 'toggle_pin', 'replace_image_url', 'apply_batch')
+STORAGE_METRIC_METHODS = ('upload_image', 'upload_file', 'upload_files', 'delete_image')
+
+if METRICS_ENABLED:
+    instrument_methods(works_store, STORE_METRIC_METHODS, store_latency, type(works_store).__name__,
+                       errors=store_errors)
+    instrument_methods(blob_store, ('add', 'release'), storage_latency, 'BlobStore', errors=storage_errors)
+    instrument_methods(storage, STORAGE_METRIC_METHODS, storage_latency, type(storage).__name__,
+                       errors=storage_errors)
+    if cloud_backend is not None:
+        instrument_methods(cloud_backend.local, STORAGE_METRIC_METHODS, storage_latency, 'LocalStorage',
+                           errors=storage_errors)
+
+# 慢请求采样分析（设置 PROFILE_SLOW_REQUEST_MS 时启用），结果在 /api/metrics/profiles 查看
+profiler = create_profiler()
+
+def warm_up():
+    """加载作品数据、建立索引并生成列表缓存
+
+    多进程部署时在主进程 fork 之前调用，各 worker 通过写时复制共享这些内存，不必各自重新加载
+    """
+    start = time.perf_counter()
+    works_store.warm_up()
+    snapshot = works_cache.get()
+    if COMPRESSION_ENABLED and len(snapshot.body) >= COMPRESS_MIN_SIZE:
+        for encoding in ENCODINGS:
+            snapshot.encoded(encoding)
+    logger.info(f"预加载完成，耗时 {(time.perf_counter() - start) * 1000:.0f} ms")
+
+def after_fork():
+    """在 fork 出的 worker 进程中调用：重建线程和数据库连接等不能跨进程共享的资源"""
+    logging_config.after_fork()
+    works_store.after_fork()
+    metrics.reset()
+    if profiler is not None:
+        profiler.after_fork()
+    if cloud_backend is not None:
+        cloud_backend.after_fork()
+    if events is not None:
+        events.server.start()
+    if rate_limiter is not None:
+        rate_limiter.backend.after_fork()
+
+@app.before_request
+def start_request_metrics():
+    g.request_start = time.perf_counter()
+    if profiler is not None:
+        profiler.start()
+
+@app.after_request
+def record_request_metrics(response):
+    """记录请求数、耗时和响应大小（耗时不含流式响应体的发送时间）"""
+    start = g.pop('request_start', None)
+    if start is None:
+        return response
+    # 按路由规则而不是实际路径分组，避免作品ID等参数产生大量标签
+    endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    if METRICS_ENABLED:
+        request_latency.observe(time.perf_counter() - start, request.method, endpoint)
+        request_count.inc(request.method, endpoint, str(response.status_code))
+        response_size.observe(response.content_length or 0, endpoint)
+        metrics.maybe_flush()
+    if profiler is not None:
+        profiler.stop(method=request.method, path=request.path, endpoint=endpoint, status=response.status_code)
+    return response
+
+WRITE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+@app.after_request
+def sync_snapshot(response):
+    """修改成功后把数据写回快照（数据版本没有变化时只是一次比较）"""
+    if snapshot_sync is not None and request.method in WRITE_METHODS and response.status_code < 400:
+        snapshot_sync.maybe_save()
+    return response
+
+# 响应压缩（默认开启，RESPONSE_COMPRESSION=0 关闭，例如由反向代理负责压缩时）：
+# 超过 COMPRESS_MIN_SIZE 字节的 JSON 响应按 Accept-Encoding 使用 br/gzip 压缩
+COMPRESSION_ENABLED = os.environ.get('RESPONSE_COMPRESSION', '1') != '0'
+COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', '1024'))
+
+def response_encoding(size):
+    """当前请求的响应应使用的压缩编码，不压缩时返回 None"""
+    if not COMPRESSION_ENABLED or size < COMPRESS_MIN_SIZE:
+        return None
+    return negotiate(request.accept_encodings)
+
+# 在 record_request_metrics 之前执行（after_request 按注册的逆序执行），指标记录的是压缩后的大小
+@app.after_request
+def compress_response(response):
+    """压缩 JSON 响应（已设置 Content-Encoding 的响应，如使用缓存压缩结果的作品列表，不再处理）"""
+    if (not COMPRESSION_ENABLED or response.status_code != 200 or response.mimetype != 'application/json'
+            or response.direct_passthrough or response.is_streamed or 'Content-Encoding' in response.headers):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = response_encoding(response.content_length or 0)
+    if encoding is None:
+        return response
+    response.set_data(compress(response.get_data(), encoding))
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(encoded_etag(etag, encoding))
+    return response
+
+# 写接口限流（默认开启，RATE_LIMIT_ENABLED=0 关闭）：按客户端 IP 和用户ID 的令牌桶，
+# 规则可用 RATE_LIMIT_<路由>_<维度> 覆盖（如 RATE_LIMIT_LIKE_USER=30/minute，off 关闭）；
+# 默认每个进程单独计数，多个 worker 进程共享限流状态时设置 RATE_LIMIT_BACKEND=sqlite
+RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', '1') != '0'
+# 同一教室、同一公司的用户可能共用一个出口 IP，按 IP 的限额比按用户的宽松
+RATE_LIMITS = {
+    'upload': {'ip': '120/hour'},
+    'upload_session': {'ip': '600/hour'},
+    'like': {'ip': '600/minute', 'user': '60/minute'},
+    'comment': {'ip': '120/minute', 'user': '10/minute'},
+    'comment_delete': {'ip': '120/minute', 'user': '30/minute'},
+    'batch': {'ip': '600/minute'},  # 按操作数计
+    'admin_login': {'ip': '10/minute'},
+}
+rate_limiter = None
+if RATE_LIMIT_ENABLED:
+    rate_limiter = RateLimiter(create_bucket_backend(os.path.splitext(DATA_FILE)[0] + '.ratelimit.db'),
+                               build_rules(RATE_LIMITS))
+
+# 同时处理的上传请求数（每个进程），超出时最多 UPLOAD_QUEUE_SIZE 个请求排队等待 UPLOAD_QUEUE_TIMEOUT 秒
+upload_limiter = ConcurrencyLimiter(int(os.environ.get('UPLOAD_CONCURRENCY', '4')),
+                                    int(os.environ.get('UPLOAD_QUEUE_SIZE', '16')),
+                                    float(os.environ.get('UPLOAD_QUEUE_TIMEOUT', '10')))
+
+def too_many_requests(retry_after, message='请求过于频繁，请稍后再试'):
+    """429 响应，Retry-After 为建议的重试等待秒数"""
+    seconds = max(1, math.ceil(retry_after))
+    response = jsonify({'error': message, 'retry_after': seconds})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(seconds)
+    return response
+
+def request_user_id():
+    """JSON 请求体中的 user_id；匿名用户不单独计数，只按 IP 限流"""
+    data = request.get_json(silent=True)
+    user_id = data.get('user_id') if isinstance(data, dict) else None
+    if not user_id or user_id == 'anonymous':
+        return None
+    return str(user_id)[:128]
+
+def batch_size():
+    data = request.get_json(silent=True)
+    operations = data.get('operations') if isinstance(data, dict) else None
+    return max(1, len(operations)) if isinstance(operations, list) else 1
+
+def rate_limited(route, user_id=None, cost=None):
+    """按 RATE_LIMITS[route] 限流的装饰器；user_id、cost 为从请求中取值的函数"""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if rate_limiter is not None:
+                identities = {'ip': request.remote_addr, 'user': user_id() if user_id else None}
+                wait, scope = rate_limiter.check(route, identities, cost() if cost else 1)
+                if wait:
+                    rate_limit_rejections.inc(route, scope)
+                    logger.info(f"请求被限流: {route} {scope}={identities[scope]}，{wait:.1f} 秒后可重试")
+                    return too_many_requests(wait)
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def upload_slot(view):
+    """限制同时处理的上传请求数（在读取请求体之前排队，排不上时返回 429）"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        if not upload_limiter.acquire():
+            rate_limit_rejections.inc('upload', 'concurrency')
+            return too_many_requests(upload_limiter.timeout, '上传请求过多，请稍后再试')
+        upload_queue_wait.observe(time.perf_counter() - start)
+        try:
+            return view(*args, **kwargs)
+        finally:
+            upload_limiter.release()
+    return wrapper
+
 # 管理员配置
 ADMIN_PASSWORD = os.environ.get('ADMIN_PASSWORD', 'op123')  # 默认密码，建议在生产环境中设置环境变量
 
@@ -46,32 +375,22 @@ def allowed_file(filename):
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 def load_works():
-    """从JSON文件加载作品数据"""
-    try:
-        if os.path.exists(app.config['WORKS_FILE']):
-            with open(app.config['WORKS_FILE'], 'r', encoding='utf-8') as f:
-                works = json.load(f)
-                # 确保每个作品都有置顶字段
-                for work in works:
-                    if 'is_pinned' not in work:
-                        work['is_pinned'] = False
-                return works
-        return []
-    except Exception as e:
-        logger.error(f"加载作品数据失败: {e}")
-        return []
+    """加载作品数据"""
+    return works_store.load_works()
 
 def save_works(works):
-    """保存作品数据到JSON文件"""
-    try:
-        # 按置顶状态和创建时间排序：置顶的在前，然后按时间倒序
-        sorted_works = sorted(works, key=lambda x: (not x.get('is_pinned', False), x.get('created_at', ''), x.get('id', '')), reverse=True)
-        
-        with open(app.config['WORKS_FILE'], 'w', encoding='utf-8') as f:
-            json.dump(sorted_works, f, ensure_ascii=False, indent=2)
-        logger.info(f"作品数据已保存，共 {len(works)} 个作品")
-    except Exception as e:
-        logger.error(f"保存作品数据失败: {e}")
+    """保存作品数据"""
+    works_store.save_works(works)
+
+def new_comment(content, user_id, username):
+    """创建评论对象"""
+    return {
+        'id': str(uuid.uuid4()),
+        'content': content,
+        'user_id': user_id,
+        'username': username,
+        'created_at': get_beijing_time().isoformat()
+    }
 
 def is_admin(request):
     """检查是否为管理员"""
@@ -81,6 +400,29 @@ def is_admin(request):
         return token == ADMIN_PASSWORD
     return False
 
+def cached_json_response(snapshot, variant, build):
+    """带 ETag/Last-Modified 的 JSON 响应，客户端缓存有效时直接返回 304"""
+    etag = snapshot.variant_etag(variant)
+    if etag_matches(request.if_none_match, etag):
+        response = app.response_class(status=304)
+    else:
+        response = build()
+    response.set_etag(encoded_etag(etag, response.headers.get('Content-Encoding')))
+    response.last_modified = snapshot.last_modified
+    # 允许客户端缓存，但每次使用前需要重新验证
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+def snapshot_response(snapshot):
+    """完整的作品列表响应：直接使用快照中缓存的响应体和压缩结果"""
+    encoding = response_encoding(len(snapshot.body))
+    if encoding is None:
+        return app.response_class(snapshot.body, mimetype=app.json.mimetype)
+    response = app.response_class(snapshot.encoded(encoding), mimetype=app.json.mimetype)
+    response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response
+
 @app.route('/')
 def index():
     """根路由 - 返回前端页面"""
@@ -108,18 +450,121 @@ def index():
 
 @app.route('/api/works', methods=['GET'])
 def get_works():
-    """获取所有作品列表"""
+    """获取作品列表
+
+    不带参数时返回全部作品（兼容旧版本）；
+    limit/cursor 参数启用游标分页，fields 参数只返回指定字段（如 fields=id,title,likes,comments_count）
+    """
     try:
-        works = load_works()
-        # 按置顶状态和创建时间排序
-        sorted_works = sorted(works, key=lambda x: (not x.get('is_pinned', False), x.get('created_at', ''), x.get('id', '')), reverse=True)
-        logger.info(f"获取作品列表，共 {len(works)} 个作品")
-        return jsonify(sorted_works)
+        # 从缓存获取已排序的作品列表和响应体
+        snapshot = works_cache.get()
+        limit = request.args.get('limit', type=int)
+        cursor = request.args.get('cursor')
+        fields = parse_fields(request.args.get('fields'))
+
+        if limit is None and cursor is None:
+            if fields is None:
+                logger.debug(f"获取作品列表，共 {len(snapshot.works)} 个作品")
+                return cached_json_response(snapshot, '', lambda: snapshot_response(snapshot))
+            return cached_json_response(snapshot, request.query_string.decode('utf-8'), lambda: jsonify(
+                [project(work, fields) for work in snapshot.works]))
+
+        # 游标分页
+        limit = max(1, min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE))
+        try:
+            after_key = work_cursor_key(cursor) if cursor else None
+        except InvalidCursorError:
+            return jsonify({'error': '无效的分页游标'}), 400
+
+        def build_page():
+            page, has_more = snapshot.page(after_key, limit)
+            return jsonify({
+                'works': [project(work, fields) for work in page],
+                'next_cursor': work_cursor(page[-1]) if page and has_more else None,
+                'has_more': has_more
+            })
+
+        return cached_json_response(snapshot, request.query_string.decode('utf-8'), build_page)
     except Exception as e:
         logger.error(f"获取作品列表失败: {e}")
         return jsonify({'error': '获取作品列表失败'}), 500
 
+@app.route('/api/works/<work_id>', methods=['GET'])
+def get_work(work_id):
+    """获取单个作品（按ID直接查找，不加载整个列表；评论通过评论接口获取）"""
+    try:
+        work = works_store.get_work(work_id, include_comments=False)
+        if work is None:
+            return jsonify({'error': '作品不存在'}), 404
+        return jsonify(project(work, parse_fields(request.args.get('fields'))))
+    except Exception as e:
+        logger.error(f"获取作品失败: {e}")
+        return jsonify({'error': '获取作品失败'}), 500
+
+@app.route('/api/works/<work_id>/comments', methods=['GET'])
+def get_comments(work_id):
+    """分页获取作品的评论（按创建时间正序），limit/cursor 参数与作品列表相同"""
+    try:
+        limit = max(1, min(request.args.get('limit', DEFAULT_COMMENTS_PAGE_SIZE, type=int), MAX_PAGE_SIZE))
+        cursor = request.args.get('cursor')
+        try:
+            after_key = comment_cursor_key(cursor) if cursor else None
+        except InvalidCursorError:
+            return jsonify({'error': '无效的分页游标'}), 400
+
+        try:
+            comments, has_more = works_store.list_comments(work_id, after_key, limit)
+        except WorkNotFoundError:
+            return jsonify({'error': '作品不存在'}), 404
+
+        return jsonify({
+            'comments': comments,
+            'next_cursor': comment_cursor(comments[-1]) if comments and has_more else None,
+            'has_more': has_more
+        })
+    except Exception as e:
+        logger.error(f"获取评论失败: {e}")
+        return jsonify({'error': '获取评论失败'}), 500
+
+@app.route('/api/search', methods=['GET'])
+def search_works():
+    """全文搜索作品标题、描述、作者和评论
+
+    q: 搜索词（所有词都要匹配，中文按相邻两字匹配）；结果按相关度（score）排序，
+    limit/cursor/fields 参数与作品列表相同
+    """
+    try:
+        query = request.args.get('q', '').strip()
+        if not query:
+            return jsonify({'error': '请输入搜索词'}), 400
+        if len(query) > MAX_SEARCH_QUERY_LENGTH:
+            return jsonify({'error': f'搜索词不能超过 {MAX_SEARCH_QUERY_LENGTH} 个字符'}), 400
+        if not query_terms(query):
+            return jsonify({'error': '搜索词中没有可搜索的文字'}), 400
+
+        limit = max(1, min(request.args.get('limit', DEFAULT_PAGE_SIZE, type=int), MAX_PAGE_SIZE))
+        cursor = request.args.get('cursor')
+        fields = parse_fields(request.args.get('fields'))
+        try:
+            after = search_cursor_key(cursor) if cursor else None
+        except InvalidCursorError:
+            return jsonify({'error': '无效的分页游标'}), 400
+
+        works, has_more, total = works_store.search(query, after, limit)
+        return jsonify({
+            'query': query,
+            'works': [project(work, fields and fields + ['score']) for work in works],
+            'next_cursor': search_cursor(works[-1]) if works and has_more else None,
+            'has_more': has_more,
+            'total': total
+        })
+    except Exception as e:
+        logger.error(f"搜索作品失败: {e}")
+        return jsonify({'error': '搜索失败'}), 500
+
 @app.route('/api/works', methods=['POST'])
+@rate_limited('upload')
+@upload_slot
 def upload_work():
     """上传作品（支持多图）"""
     try:
@@ -132,13 +577,11 @@ def upload_work():
         if not title:
             return jsonify({'error': '标题不能为空'}), 400
         
-        # 检查是否有图片文件
-        if 'images' not in request.files:
-            return jsonify({'error': '请选择至少一张图片'}), 400
-        
         images = request.files.getlist('images')  # 获取多个图片文件
+        upload_ids = request.form.getlist('upload_ids')  # 分块上传完成的会话
         
-        if not images or all(img.filename == '' for img in images):
+        # 检查是否有图片文件
+        if all(img.filename == '' for img in images) and not upload_ids:
             return jsonify({'error': '请选择至少一张图片'}), 400
         
         # 验证所有图片文件
@@ -147,67 +590,101 @@ def upload_work():
             if img and img.filename and allowed_file(img.filename):
                 valid_images.append(img)
         
-        if not valid_images:
+        valid_sessions = []
+        for upload_id in upload_ids:
+            try:
+                session = upload_sessions.get(upload_id)
+            except UploadSessionError:
+                return jsonify({'error': f'上传会话不存在: {upload_id}'}), 400
+            if session['offset'] != session['size']:
+                return jsonify({'error': f'图片尚未上传完成: {session["filename"]}'}), 400
+            if allowed_file(session['filename']):
+                valid_sessions.append(session)
+        
+        if not valid_images and not valid_sessions:
             return jsonify({'error': '没有有效的图片文件'}), 400
         
         # 生成作品ID
         work_id = str(uuid.uuid4())
         
-        # 保存所有图片
+        # 保存所有图片：按块流式写入临时文件，同时计算哈希并校验文件头，
+        # 再按内容哈希存入图片存储（相同的图片只保存一份）
         image_urls = []
-        for i, img in enumerate(valid_images):
-            # 生成唯一文件名
-            file_ext = os.path.splitext(img.filename)[1]
-            unique_filename = f"{work_id}_{i}{file_ext}"
-            
-            # 读取图片数据
-            img.seek(0)  # 重置文件指针
-            image_data = img.read()
-            
-            # 尝试上传到云存储
-            # cloud_url = storage.upload_image(image_data, unique_filename)
-            
-            # if cloud_url:
-            #     # 云存储成功
-            #     image_urls.append(cloud_url)
-            #     logger.info(f"图片上传到云存储成功: {unique_filename}")
-            # else:
-            #     # 云存储失败，回退到本地存储
-            #     img.seek(0)  # 再次重置文件指针
-            #     image_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-            #     img.save(image_path)
-            #     local_url = f'/api/uploads/{unique_filename}'
-            #     image_urls.append(local_url)
-            #     logger.warning(f"云存储失败，使用本地存储: {unique_filename}")
-            # 暂时注释掉云存储，使用本地存储
-            img.seek(0)  # 重置文件指针
-            image_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-            img.save(image_path)
-            local_url = f'/api/uploads/{unique_filename}'
-            image_urls.append(local_url)
-            logger.warning(f"云存储失败，使用本地存储: {unique_filename}")
-        
-        # 创建作品对象
-        work = {
-            'id': work_id,
-            'title': title,
-            'description': description,
-            'image_urls': image_urls,  # 改为复数，存储多个图片URL
-            'main_image_url': image_urls[0],  # 主图片（第一张）
-            'likes': 0,
-            'liked_by': [],
-            'comments': [],
-            'created_at': get_beijing_time().isoformat(),
-            'username': username,
-            'realName': realName,
-            'is_pinned': False  # 新作品默认不置顶
-        }
-        
-        # 保存作品信息
-        works = load_works()
-        works.append(work)
-        save_works(works)
+        image_hashes = []
+        saved_filenames = []
+        new_filenames = []  # 首次出现的内容，需要生成变体
+        invalid_filename = None
+        temp_path = None
+        sources = [(img.filename, img) for img in valid_images] + \
+                  [(session['filename'], session) for session in valid_sessions]
+        try:
+            for i, (original_filename, source) in enumerate(sources):
+                temp_path = os.path.join(app.config['UPLOAD_FOLDER'], f".{work_id}_{i}.incoming")
+                try:
+                    if isinstance(source, dict):
+                        result = upload_sessions.finalize(source['upload_id'], temp_path)
+                    else:
+                        result = stream_to_file(source.stream, temp_path, MAX_CONTENT_LENGTH)
+                except (InvalidImageError, UploadTooLargeError, UploadSessionError):
+                    invalid_filename = original_filename
+                    break
+
+                filename, created = blob_store.add(temp_path, result.sha256, result.image_type)
+                if created:
+                    new_filenames.append(filename)
+                local_url = f'/api/uploads/{filename}'
+                image_urls.append(local_url)
+                image_hashes.append(result.sha256)
+                saved_filenames.append(filename)
+
+            if invalid_filename is None:
+                # 创建作品对象
+                work = {
+                    'id': work_id,
+                    'title': title,
+                    'description': description,
+                    'image_urls': image_urls,  # 改为复数，存储多个图片URL
+                    'main_image_url': image_urls[0],  # 主图片（第一张）
+                    'image_variants': [image_pipeline.variant_urls(url) for url in image_urls],  # 各图片的缩略图/中图/大图
+                    'image_files': saved_filenames,  # 本地保存的文件名
+                    'image_hashes': image_hashes,  # 各图片内容的 SHA-256
+                    'likes': 0,
+                    'liked_by': [],
+                    'comments': [],
+                    'created_at': get_beijing_time().isoformat(),
+                    'username': username,
+                    'realName': realName,
+                    'is_pinned': False  # 新作品默认不置顶
+                }
+
+                # 保存作品信息
+                works_store.create_work(work)
+        except Exception:
+            # 客户端断开、磁盘错误等：释放本次已保存的图片，由外层返回 500
+            release_saved_images(saved_filenames, temp_path)
+            raise
+
+        if invalid_filename is not None:
+            release_saved_images(saved_filenames, temp_path)
+            return jsonify({'error': f'图片文件无效: {invalid_filename}'}), 400
+
+        # 作品已保存，分块上传的会话不再需要
+        for session in valid_sessions:
+            try:
+                upload_sessions.discard(session['upload_id'])
+            except OSError as e:
+                # 过期后会被 cleanup_expired 清理
+                logger.warning(f"删除上传会话失败: {session['upload_id']}, {e}")
+        
+        # 后台生成缩略图等尺寸，不阻塞上传请求（已存在的内容复用已有变体）
+        image_pipeline.submit(new_filenames)
         
+        # 后台复制到云存储，完成后作品中的图片地址替换为云存储地址
+        if cloud_backend is not None:
+            cloud_backend.replicate(saved_filenames, {'work_id': work_id})
+        
+        work = summarize_work(work)
+        publish_event('work_created', work)
         logger.info(f"作品上传成功: {work_id}, 图片数量: {len(image_urls)}")
         return jsonify(work), 201
         
@@ -215,6 +692,72 @@ def upload_work():
         logger.error(f"上传失败: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+def release_saved_images(saved_filenames, temp_path=None):
+    """上传失败时释放本次已保存的图片，并删除未存入图片存储的临时文件"""
+    for filename in saved_filenames:
+        try:
+            blob_store.release(filename)
+        except Exception as e:
+            logger.warning(f"释放图片失败: {filename}, {e}")
+    if temp_path and os.path.exists(temp_path):
+        os.remove(temp_path)
+
+def delete_image_file(work_id, image_url, image_filename):
+    """删除作品的一张图片：相同内容仍被其他作品引用时只减少引用计数，否则删除本地文件、变体和云端副本"""
+    try:
+        unreferenced = blob_store.release(image_filename)
+        if cloud_backend is not None and image_url.startswith('/api/uploads/'):
+            # 尚未复制到云存储，取消复制任务
+            cloud_backend.cancel(image_filename, {'work_id': work_id})
+        if not unreferenced:
+            return
+        # 引用计数已经释放，先删除本地图片及其变体，云端删除失败也不会留下本地文件
+        image_path = os.path.join(app.config['UPLOAD_FOLDER'], image_filename)
+        if os.path.exists(image_path):
+            os.remove(image_path)
+            logger.info(f"本地图片文件已删除: {image_filename}")
+        image_pipeline.delete_variants(image_filename)
+    except Exception as e:
+        logger.warning(f"删除图片文件失败: {image_filename}, {e}")
+        return
+    if cloud_backend is not None and not image_url.startswith('/api/uploads/'):
+        try:
+            if cloud_backend.delete_image(image_url):
+                logger.info(f"云存储图片删除成功: {image_url}")
+        except Exception as e:
+            logger.warning(f"删除云存储图片失败: {image_url}, {e}")
+
+def delete_legacy_image_file(image_url):
+    """旧版本单图作品（image_url）：只删除本地文件"""
+    try:
+        image_filename = image_url.split('/')[-1]
+        image_path = os.path.join(app.config['UPLOAD_FOLDER'], image_filename)
+        if os.path.exists(image_path):
+            os.remove(image_path)
+            logger.info(f"本地图片文件已删除: {image_filename}")
+    except Exception as e:
+        logger.warning(f"删除本地图片文件失败: {e}")
+
+def delete_work_images(works):
+    """删除已移除作品的全部图片文件；多张图片并行删除（云存储删除需要网络请求）"""
+    tasks = []
+    for work in works:
+        if 'image_urls' in work:
+            # 新版本：多图支持
+            image_files = work.get('image_files') or [url.split('/')[-1] for url in work['image_urls']]
+            tasks.extend((delete_image_file, work['id'], image_url, image_filename)
+                         for image_url, image_filename in zip(work['image_urls'], image_files))
+        elif 'image_url' in work:
+            # 旧版本：单图支持（向后兼容）
+            tasks.append((delete_legacy_image_file, work['image_url']))
+    if len(tasks) <= 1:
+        for func, *args in tasks:
+            func(*args)
+        return
+    with ThreadPoolExecutor(max_workers=min(IMAGE_DELETE_WORKERS, len(tasks))) as pool:
+        for future in [pool.submit(func, *args) for func, *args in tasks]:
+            future.result()
+
 @app.route('/api/works/<work_id>', methods=['DELETE'])
 def delete_work(work_id):
     """删除作品（仅管理员）"""
@@ -222,78 +765,16 @@ def delete_work(work_id):
         return jsonify({'error': '权限不足'}), 403
     
     try:
-        works = load_works()
-        work = None
-        work_index = None
-        
-        for i, w in enumerate(works):
-            if w['id'] == work_id:
-                work = w
-                work_index = i
-                break
-        
-        if not work:
+        try:
+            # 先从存储中移除作品，再清理图片文件
+            work = works_store.delete_work(work_id)
+        except WorkNotFoundError:
             return jsonify({'error': '作品不存在'}), 404
         
         # 删除图片文件
-        try:
-            # 删除所有相关图片
-            if 'image_urls' in work:
-                # 新版本：多图支持
-                for image_url in work['image_urls']:
-                    # 尝试从云存储删除
-                    # if storage.delete_image(image_url):
-                    #     logger.info(f"云存储图片删除成功: {image_url}")
-                    # else:
-                    #     # 如果云存储删除失败，尝试删除本地文件
-                    #     try:
-                    #         image_filename = image_url.split('/')[-1]
-                    #         image_path = os.path.join(app.config['UPLOAD_FOLDER'], image_filename)
-                    #         if os.path.exists(image_path):
-                    #             os.remove(image_path)
-                    #             logger.info(f"本地图片文件已删除: {image_filename}")
-                    #     except Exception as e:
-                    #         logger.warning(f"删除本地图片文件失败: {e}")
-                    # 暂时注释掉云存储，使用本地存储
-                    try:
-                        image_filename = image_url.split('/')[-1]
-                        image_path = os.path.join(app.config['UPLOAD_FOLDER'], image_filename)
-                        if os.path.exists(image_path):
-                            os.remove(image_path)
-                            logger.info(f"本地图片文件已删除: {image_filename}")
-                    except Exception as e:
-                        logger.warning(f"删除本地图片文件失败: {e}")
-            elif 'image_url' in work:
-                # 旧版本：单图支持（向后兼容）
-                image_url = work['image_url']
-                # if storage.delete_image(image_url):
-                #     logger.info(f"云存储图片删除成功: {image_url}")
-                # else:
-                #     # 回退到本地删除
-                #     try:
-                #         image_filename = image_url.split('/')[-1]
-                #         image_path = os.path.join(app.config['UPLOAD_FOLDER'], image_filename)
-                #         if os.path.exists(image_path):
-                #             os.remove(image_path)
-                #             logger.info(f"本地图片文件已删除: {image_filename}")
-                #     except Exception as e:
-                #         logger.warning(f"删除本地图片文件失败: {e}")
-                # 暂时注释掉云存储，使用本地存储
-                try:
-                    image_filename = image_url.split('/')[-1]
-                    image_path = os.path.join(app.config['UPLOAD_FOLDER'], image_filename)
-                    if os.path.exists(image_path):
-                        os.remove(image_path)
-                        logger.info(f"本地图片文件已删除: {image_filename}")
-                except Exception as e:
-                    logger.warning(f"删除本地图片文件失败: {e}")
-        except Exception as e:
-            logger.warning(f"删除图片文件失败: {e}")
-        
-        # 从列表中移除作品
-        works.pop(work_index)
-        save_works(works)
+        delete_work_images([work])
         
+        publish_event('work_deleted', {'work_id': work_id})
         logger.info(f"作品删除成功: {work_id}")
         return jsonify({'message': '作品删除成功'})
         
@@ -302,50 +783,91 @@ def delete_work(work_id):
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/works/<work_id>/like', methods=['POST'])
+@rate_limited('like', user_id=request_user_id)
 def like_work(work_id):
     """点赞/取消点赞作品"""
     try:
         data = request.get_json()
         user_id = data.get('user_id', 'anonymous')
         
-        works = load_works()
-        work = None
-        work_index = None
-        
-        for i, w in enumerate(works):
-            if w['id'] == work_id:
-                work = w
-                work_index = i
-                break
-        
-        if not work:
+        try:
+            result = works_store.toggle_like(work_id, user_id, get_beijing_time().isoformat())
+        except WorkNotFoundError:
             return jsonify({'error': '作品不存在'}), 404
         
-        # 检查用户是否已经点赞
-        if user_id in work['liked_by']:
-            # 取消点赞
-            work['liked_by'].remove(user_id)
-            work['likes'] -= 1
-            liked = False
-        else:
-            # 点赞
-            work['liked_by'].append(user_id)
-            work['likes'] += 1
-            liked = True
+        publish_event('like', {'work_id': work_id, 'user_id': user_id,
+                               'likes': result['likes'], 'liked': result['liked']})
+        return jsonify({
+            'likes': result['likes'],
+            'liked': result['liked']
+        })
         
-        # 保存更新
-        works[work_index] = work
-        save_works(works)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/leaderboard', methods=['GET'])
+def get_leaderboard():
+    """点赞排行榜
+
+    window: day（最近一天）/ week（最近一周）/ all（全部时间，默认）；limit: 返回数量
+    时间窗口内按窗口中的点赞数排名（score），全部时间按总点赞数排名
+    """
+    try:
+        window = request.args.get('window', 'all')
+        if window not in LEADERBOARD_WINDOWS:
+            return jsonify({'error': f"window 必须是 {'/'.join(LEADERBOARD_WINDOWS)} 之一"}), 400
+        limit = max(1, min(request.args.get('limit', DEFAULT_LEADERBOARD_SIZE, type=int), MAX_LEADERBOARD_SIZE))
+
+        return jsonify({
+            'window': window,
+            'works': works_store.leaderboard(window, limit)
+        })
+    except Exception as e:
+        logger.error(f"获取排行榜失败: {e}")
+        return jsonify({'error': '获取排行榜失败'}), 500
+
+@app.route('/api/events', methods=['GET'])
+def event_stream():
+    """实时事件流（SSE）
+
+    事件由独立端口上的异步服务器推送（生产环境由反向代理把 /api/events 转发到 EVENTS_PORT）；
+    直接请求 Flask 时重定向到该端口，不占用 Flask 的工作线程
+    """
+    if events is None:
+        return jsonify({'error': '事件推送未启用'}), 503
+    target = os.environ.get('EVENTS_PUBLIC_URL')
+    if not target:
+        # 去掉请求地址中的端口；IPv6 地址需要保留方括号，如 [::1]
+        hostname = urlsplit(request.host_url).hostname
+        if ':' in hostname:
+            hostname = f'[{hostname}]'
+        target = f"{request.scheme}://{hostname}:{events.server.port}/api/events"
+    if request.query_string:
+        target += '?' + request.query_string.decode('utf-8')
+    return redirect(target, code=307)
+
+@app.route('/api/likes/status', methods=['POST'])
+def liked_status():
+    """批量查询用户对多个作品的点赞状态"""
+    try:
+        data = request.get_json()
+        user_id = data.get('user_id', 'anonymous')
+        work_ids = data.get('work_ids', [])
+        
+        if not isinstance(work_ids, list) or len(work_ids) > MAX_STATUS_BATCH:
+            return jsonify({'error': f'work_ids 必须是列表，且不超过 {MAX_STATUS_BATCH} 个'}), 400
         
         return jsonify({
-            'likes': work['likes'],
-            'liked': liked
+            'user_id': user_id,
+            'liked': works_store.liked_status(user_id, [str(work_id) for work_id in work_ids])
         })
         
     except Exception as e:
+        logger.error(f"查询点赞状态失败: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/works/<work_id>/comments', methods=['POST'])
+@rate_limited('comment', user_id=request_user_id)
 def add_comment(work_id):
     """添加评论"""
     try:
@@ -356,40 +878,19 @@ def add_comment(work_id):
         if not content:
             return jsonify({'error': '评论内容不能为空'}), 400
         
-        works = load_works()
-        work = None
-        work_index = None
-        
-        for i, w in enumerate(works):
-            if w['id'] == work_id:
-                work = w
-                work_index = i
-                break
-        
-        if not work:
-            return jsonify({'error': '作品不存在'}), 404
-        
         # 获取用户名
         username = data.get('username', '匿名用户')
 
         # 创建评论对象
-        comment = {
-            'id': str(uuid.uuid4()),
-            'content': content,
-            'user_id': user_id,
-            'username': username,
-            'created_at': get_beijing_time().isoformat()
-        }
+        comment = new_comment(content, user_id, username)
         
         # 添加评论到作品
-        if 'comments' not in work:
-            work['comments'] = []
-        work['comments'].append(comment)
-        
-        # 保存更新
-        works[work_index] = work
-        save_works(works)
+        try:
+            works_store.add_comment(work_id, comment)
+        except WorkNotFoundError:
+            return jsonify({'error': '作品不存在'}), 404
         
+        publish_event('comment_added', {'work_id': work_id, 'comment': comment})
         logger.info(f"评论添加成功: {comment['id']}")
         return jsonify(comment), 201
         
@@ -398,48 +899,23 @@ def add_comment(work_id):
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/works/<work_id>/comments/<comment_id>', methods=['DELETE'])
+@rate_limited('comment_delete', user_id=request_user_id)
 def delete_comment(work_id, comment_id):
     """删除评论（仅管理员或评论作者）"""
     try:
         data = request.get_json()
         user_id = data.get('user_id', 'anonymous')
         
-        works = load_works()
-        work = None
-        work_index = None
-        
-        for i, w in enumerate(works):
-            if w['id'] == work_id:
-                work = w
-                work_index = i
-                break
-        
-        if not work:
+        try:
+            works_store.delete_comment(work_id, comment_id, user_id, is_admin(request))
+        except WorkNotFoundError:
             return jsonify({'error': '作品不存在'}), 404
-        
-        # 查找评论
-        comment = None
-        comment_index = None
-        for i, c in enumerate(work.get('comments', [])):
-            if c['id'] == comment_id:
-                comment = c
-                comment_index = i
-                break
-        
-        if not comment:
+        except CommentNotFoundError:
             return jsonify({'error': '评论不存在'}), 404
-        
-        # 检查权限（管理员或评论作者）
-        if not is_admin(request) and comment['user_id'] != user_id:
+        except PermissionDeniedError:
             return jsonify({'error': '权限不足，只能删除自己的评论'}), 403
         
-        # 删除评论
-        work['comments'].pop(comment_index)
-        
-        # 保存更新
-        works[work_index] = work
-        save_works(works)
-        
+        publish_event('comment_deleted', {'work_id': work_id, 'comment_id': comment_id})
         logger.info(f"评论删除成功: {comment_id}")
         return jsonify({'message': '评论删除成功'})
         
@@ -447,7 +923,135 @@ def delete_comment(work_id, comment_id):
         logger.error(f"删除评论失败: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+class BatchOperationError(Exception):
+    """批量修改中单个操作的参数或权限错误"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+def parse_batch_operation(item, admin, created_at):
+    """把批量请求中的一个操作转换为存储修改操作"""
+    if not isinstance(item, dict):
+        raise BatchOperationError(400, '操作必须是对象')
+    kind = item.get('op')
+    work_id = item.get('work_id')
+    if not isinstance(work_id, str) or not work_id:
+        raise BatchOperationError(400, '缺少 work_id')
+    user_id = item.get('user_id', 'anonymous')
+
+    if kind in ('like', 'unlike'):
+        return {'op': 'set_like', 'work_id': work_id, 'user_id': user_id, 'liked': kind == 'like',
+                'created_at': created_at}
+    if kind == 'comment':
+        content = str(item.get('content', '')).strip()
+        if not content:
+            raise BatchOperationError(400, '评论内容不能为空')
+        return {'op': 'add_comment', 'work_id': work_id,
+                'comment': new_comment(content, user_id, item.get('username', '匿名用户'))}
+    if kind == 'delete_comment':
+        if not item.get('comment_id'):
+            raise BatchOperationError(400, '缺少 comment_id')
+        return {'op': 'delete_comment', 'work_id': work_id, 'comment_id': item['comment_id'],
+                'user_id': user_id, 'is_admin': admin}
+    if kind in ('pin', 'delete_work'):
+        if not admin:
+            raise BatchOperationError(403, '需要管理员权限')
+        if kind == 'delete_work':
+            return {'op': 'delete_work', 'work_id': work_id}
+        # 指定 pinned 时设置为该状态，否则切换
+        if 'pinned' in item:
+            return {'op': 'set_pin', 'work_id': work_id, 'is_pinned': bool(item['pinned'])}
+        return {'op': 'toggle_pin', 'work_id': work_id}
+    raise BatchOperationError(400, f'未知的操作类型: {kind}')
+
+def batch_operation_done(op, value):
+    """操作成功后发布事件，返回该操作的结果"""
+    kind = op['op']
+    work_id = op['work_id']
+    if kind == 'set_like':
+        publish_event('like', {'work_id': work_id, 'user_id': op['user_id'],
+                               'likes': value['likes'], 'liked': value['liked']})
+        return value
+    if kind == 'add_comment':
+        publish_event('comment_added', {'work_id': work_id, 'comment': value})
+        return value
+    if kind == 'delete_comment':
+        publish_event('comment_deleted', {'work_id': work_id, 'comment_id': op['comment_id']})
+        return {'comment_id': op['comment_id']}
+    if kind in ('set_pin', 'toggle_pin'):
+        publish_event('work_pinned', {'work_id': work_id, 'is_pinned': value})
+        return {'is_pinned': value}
+    publish_event('work_deleted', {'work_id': work_id})
+    return {'work_id': work_id}
+
+def batch_operation_error(error):
+    """存储层异常 -> (状态码, 错误信息)"""
+    if isinstance(error, WorkNotFoundError):
+        return 404, '作品不存在'
+    if isinstance(error, CommentNotFoundError):
+        return 404, '评论不存在'
+    if isinstance(error, PermissionDeniedError):
+        return 403, '权限不足，只能删除自己的评论'
+    return 500, str(error)
+
+@app.route('/api/batch', methods=['POST'])
+@rate_limited('batch', cost=batch_size)
+def batch_operations():
+    """批量修改：点赞、取消点赞、评论、删除评论、置顶（管理员）、删除作品（管理员）
+
+    请求体 {"operations": [{"op": "like", "work_id": "...", "user_id": "..."}, ...]}，
+    全部操作一次加载、一次保存；每个操作单独返回结果，失败的操作不影响其他操作
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        operations = data.get('operations')
+        if not isinstance(operations, list) or not operations:
+            return jsonify({'error': 'operations 必须是非空数组'}), 400
+        if len(operations) > MAX_BATCH_OPERATIONS:
+            return jsonify({'error': f'一次最多 {MAX_BATCH_OPERATIONS} 个操作'}), 400
+
+        admin = is_admin(request)
+        created_at = get_beijing_time().isoformat()
+        results = [None] * len(operations)
+        ops, positions = [], []
+        for index, item in enumerate(operations):
+            try:
+                ops.append(parse_batch_operation(item, admin, created_at))
+                positions.append(index)
+            except BatchOperationError as e:
+                results[index] = {'index': index, 'ok': False, 'status': e.status, 'error': e.message}
+
+        outcomes = works_store.apply_batch(ops)
+        deleted_works = []
+        for index, op, (ok, value) in zip(positions, ops, outcomes):
+            if ok:
+                results[index] = {'index': index, 'ok': True, 'status': 200,
+                                  'result': batch_operation_done(op, value)}
+                if op['op'] == 'delete_work':
+                    deleted_works.append(value)
+            else:
+                status, error = batch_operation_error(value)
+                results[index] = {'index': index, 'ok': False, 'status': status, 'error': error}
+
+        # 已删除作品的图片并行删除
+        if deleted_works:
+            delete_work_images(deleted_works)
+
+        succeeded = sum(1 for result in results if result['ok'])
+        logger.info(f"批量修改完成: {succeeded}/{len(results)} 个操作成功")
+        return jsonify({
+            'results': results,
+            'succeeded': succeeded,
+            'failed': len(results) - succeeded
+        })
+    except Exception as e:
+        logger.error(f"批量修改失败: {e}")
+        return jsonify({'error': '批量修改失败'}), 500
+
 @app.route('/api/admin/login', methods=['POST'])
+@rate_limited('admin_login')
 def admin_login():
     """管理员登录"""
     try:
@@ -466,16 +1070,158 @@ def admin_login():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/uploads/sessions', methods=['POST'])
+@rate_limited('upload_session')
+def create_upload_session():
+    """创建分块上传会话"""
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'error': '请求体必须是 JSON 对象'}), 400
+        filename = data.get('filename')
+        size = data.get('size')
+        if isinstance(size, str) and size.strip().isdigit():
+            size = int(size)
+        # bool 是 int 的子类，需要单独排除
+        if not isinstance(size, int) or isinstance(size, bool):
+            return jsonify({'error': 'size 必须是整数（字节数）'}), 400
+        
+        if not isinstance(filename, str) or not allowed_file(filename):
+            return jsonify({'error': '不支持的文件类型'}), 400
+        
+        try:
+            session = upload_sessions.create(filename, size)
+        except UploadTooLargeError:
+            return jsonify({'error': '文件大小无效或超过限制'}), 400
+        
+        logger.info(f"创建上传会话: {session['upload_id']}, 文件: {filename}, 大小: {size}")
+        return jsonify({**session, 'chunk_size': SESSION_CHUNK_SIZE}), 201
+        
+    except Exception as e:
+        logger.error(f"创建上传会话失败: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/uploads/sessions/<upload_id>', methods=['GET'])
+def get_upload_session(upload_id):
+    """查询分块上传进度（断点续传时从 offset 继续）"""
+    try:
+        return jsonify(upload_sessions.get(upload_id))
+    except UploadSessionError:
+        return jsonify({'error': '上传会话不存在'}), 404
+
+@app.route('/api/uploads/sessions/<upload_id>', methods=['PUT'])
+@upload_slot
+def upload_session_chunk(upload_id):
+    """上传一块数据，请求体为原始字节，offset 参数为该块的起始位置"""
+    offset = request.args.get('offset', type=int)
+    if offset is None:
+        return jsonify({'error': '缺少 offset 参数'}), 400
+    
+    try:
+        session = upload_sessions.append(upload_id, offset, request.stream)
+    except InvalidImageError:
+        return jsonify({'error': '文件内容不是有效的图片'}), 400
+    except UploadTooLargeError:
+        return jsonify({'error': '上传内容超过声明的文件大小'}), 413
+    except UploadSessionError:
+        try:
+            session = upload_sessions.get(upload_id)
+        except UploadSessionError:
+            return jsonify({'error': '上传会话不存在'}), 404
+        # 偏移量不一致，返回服务端已接收的位置
+        return jsonify({'error': '偏移量不一致', 'offset': session['offset']}), 409
+    
+    return jsonify(session)
+
+def send_upload(filename, max_age):
+    """按 UPLOADS_SERVE_MODE 发送上传目录中的文件"""
+    mode = app.config['UPLOADS_SERVE_MODE']
+    if mode == 'app':
+        # 不支持多区间 Range，按规范忽略 Range 返回完整文件（而不是 416）
+        if ',' in request.headers.get('Range', ''):
+            request.environ.pop('HTTP_RANGE', None)
+        # send_from_directory 处理 Range/条件请求，并通过 wsgi.file_wrapper 交给服务器发送
+        return send_from_directory(app.config['UPLOAD_FOLDER'], filename, max_age=max_age)
+
+    # 由前置服务器发送文件（包括 Range 和条件请求），Flask 只负责校验路径
+    path = safe_join(app.config['UPLOAD_FOLDER'], filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+    response = app.response_class(mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+    if mode == 'x-accel':
+        response.headers['X-Accel-Redirect'] = f"{app.config['UPLOADS_ACCEL_PREFIX'].rstrip('/')}/{filename}"
+    else:
+        response.headers['X-Sendfile'] = path
+    response.cache_control.max_age = max_age
+    return response
+
 @app.route('/api/uploads/<filename>')
 def uploaded_file(filename):
-    """提供上传的图片文件"""
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+    """提供上传的图片文件，size=thumb/medium/full 时返回对应尺寸"""
+    size = request.args.get('size')
+    if size:
+        # 只有浏览器明确声明支持 WebP 时才返回 WebP
+        accept_webp = any(mimetype == 'image/webp' and quality for mimetype, quality in request.accept_mimetypes)
+        variant = image_pipeline.resolve(filename, size, accept_webp)
+        if variant is None:
+            # 变体尚未生成完成，先返回原图，且不能长期缓存
+            response = send_upload(filename, max_age=0)
+            response.vary.add('Accept')
+            return response
+        response = send_upload(variant, max_age=UPLOADS_MAX_AGE)
+        response.vary.add('Accept')
+    else:
+        response = send_upload(filename, max_age=UPLOADS_MAX_AGE)
+    # send_from_directory 会处理 ETag/Last-Modified 条件请求并返回 304
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
 
 @app.route('/api/health')
 def health_check():
     """健康检查"""
-    logger.info("健康检查请求")
-    return jsonify({'status': 'ok', 'message': '服务正常运行'})
+    logger.debug("健康检查请求")
+    result = {
+        'status': 'ok',
+        'message': '服务正常运行',
+        'works_cache': works_cache.stats()
+    }
+    if cloud_backend is not None:
+        result['cloud_replication'] = cloud_backend.stats()
+    if events is not None:
+        result['events'] = events.stats()
+    if snapshot_sync is not None:
+        result['snapshot'] = snapshot_sync.stats()
+    result['uploads'] = upload_limiter.stats()
+    result['startup'] = startup.report()
+    return jsonify(result)
+
+@app.route('/api/metrics')
+def metrics_endpoint():
+    """Prometheus 格式的运行指标"""
+    if not METRICS_ENABLED:
+        return jsonify({'error': '运行指标未启用'}), 404
+    if METRICS_TOKEN and request.headers.get('Authorization') != f'Bearer {METRICS_TOKEN}':
+        return jsonify({'error': '需要指标访问令牌'}), 401
+    try:
+        return app.response_class(metrics.render(), mimetype='text/plain; version=0.0.4')
+    except Exception as e:
+        logger.error(f"导出运行指标失败: {e}")
+        return jsonify({'error': '导出运行指标失败'}), 500
+
+@app.route('/api/metrics/profiles')
+def slow_request_profiles():
+    """最近慢请求的热点调用栈（仅管理员）；format=collapsed 返回 flamegraph.pl 的输入格式"""
+    if not is_admin(request):
+        return jsonify({'error': '需要管理员权限'}), 403
+    if profiler is None:
+        return jsonify({'error': '慢请求采样分析未启用（设置 PROFILE_SLOW_REQUEST_MS）'}), 404
+    if request.args.get('format') == 'collapsed':
+        return app.response_class(profiler.collapsed(), mimetype='text/plain')
+    return jsonify({
+        'threshold_ms': profiler.threshold * 1000,
+        'profiles': profiler.recent()
+    })
 
 @app.route('/api/works/<work_id>/pin', methods=['POST'])
 def toggle_pin_work(work_id):
@@ -486,30 +1232,33 @@ def toggle_pin_work(work_id):
         if not admin_token or admin_token != 'Bearer op123':
             return jsonify({'error': '需要管理员权限'}), 403
         
-        works = load_works()
-        work = next((w for w in works if w['id'] == work_id), None)
-        
-        if not work:
+        try:
+            # 切换置顶状态
+            is_pinned = works_store.toggle_pin(work_id)
+        except WorkNotFoundError:
             return jsonify({'error': '作品不存在'}), 404
         
-        # 切换置顶状态
-        work['is_pinned'] = not work.get('is_pinned', False)
-        
-        # 保存更新
-        save_works(works)
-        
-        action = "置顶" if work['is_pinned'] else "取消置顶"
+        publish_event('work_pinned', {'work_id': work_id, 'is_pinned': is_pinned})
+        action = "置顶" if is_pinned else "取消置顶"
         logger.info(f"作品 {work_id} 已{action}")
         
         return jsonify({
             'message': f'作品已{action}',
-            'is_pinned': work['is_pinned']
+            'is_pinned': is_pinned
         })
         
     except Exception as e:
         logger.error(f"切换置顶状态失败: {e}")
         return jsonify({'error': '操作失败'}), 500
 
+startup.mark('setup')
+startup_report = startup.report()
+if METRICS_ENABLED:
+    for phase, seconds in startup.phases.items():
+        startup_latency.observe(seconds, phase, startup_report['deploy'])
+logger.info(f"应用初始化完成，耗时 {startup_report['total_ms']} ms: {startup_report['phases_ms']}",
+            extra={'data': startup_report})
+
 if __name__ == '__main__':
     logger.info("启动Flask应用...")
-    app.run(debug=True, host='0.0.0.0', port=8000)
+    app.run(debug=os.environ.get('FLASK_DEBUG') == '1', host='0.0.0.0', port=8000)
@@ -0,0 +1,470 @@
+#!/usr/bin/env python3
+"""
+API 性能测试 - 在合成数据集上测量各接口的吞吐量和 p50/p99 延迟，结果写入 JSON 便于跨提交对比
+
+数据集: 100 ~ 100k 个作品，点赞数和评论数服从长尾（Pareto）分布，热门作品收到更多点赞和评论
+接口: 作品列表（全部 / 分页）、点赞、评论、上传、删除
+微基准: 存储的 load_works / save_works / list_works
+
+每个场景（存储后端 x 作品数）在独立的子进程和临时目录中运行，互不影响；
+默认通过 Flask 测试客户端调用（不含网络开销），--server 时启动本地 WSGI 线程服务器并通过 HTTP 调用
+
+用法:
+    cd api
+    python bench_api.py                                   # json/sqlite，100 和 1000 个作品
+    python bench_api.py --sizes 100,10000,100000 --backends sqlite --json result.json
+    python bench_api.py --server --clients 8 --json result.json
+    python bench_api.py --json new.json --compare old.json  # 与之前的结果对比
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+import http.client
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+API_DIR = os.path.dirname(os.path.abspath(__file__))
+BEIJING_TZ = timezone(timedelta(hours=8))
+ADMIN_TOKEN = os.environ.get('ADMIN_PASSWORD', 'op123')
+
+# 长尾分布参数：越小越集中在少数热门作品
+PARETO_ALPHA = 1.5
+
+TITLE_WORDS = ('春天', '夜空', '少女', '机甲', '城市', '森林', '星辰', '海边', '猫咪', '魔法', '旅途', '樱花')
+COMMENT_WORDS = ('画得真好', '太好看了', '线条很流畅', '配色好棒', '期待下一幅', '好喜欢这个角色',
+                 '背景好细致', '构图很有想法', '加油', '大佬')
+
+# 测试的接口，按执行顺序（删除的是上传阶段新建的作品）
+OPERATIONS = ('list', 'list_page', 'like', 'comment', 'upload', 'delete')
+
+
+def long_tail(rng: random.Random, mean: float, cap: int) -> int:
+    """均值约为 mean 的长尾分布整数"""
+    value = (rng.paretovariate(PARETO_ALPHA) - 1) * mean * (PARETO_ALPHA - 1)
+    return min(int(value), cap)
+
+
+def generate_catalogue(size: int, rng: random.Random, avg_likes: float, avg_comments: float,
+                       users: int) -> List[dict]:
+    """合成作品数据（与 works.json 格式相同，点赞时间分布在最近两周内）"""
+    now = datetime.now(BEIJING_TZ)
+    user_ids = [f'user_{n}' for n in range(users)]
+    works = []
+    for i in range(size):
+        created_at = now - timedelta(minutes=(size - i) * 10)
+        liked_by = rng.sample(user_ids, long_tail(rng, avg_likes, users))
+        like_times = {user_id: (now - timedelta(seconds=rng.uniform(0, 14 * 24 * 3600))).isoformat()
+                      for user_id in liked_by}
+        comments = []
+        for j in range(long_tail(rng, avg_comments, 10000)):
+            comments.append({
+                'id': f'c{i}_{j}',
+                'content': rng.choice(COMMENT_WORDS),
+                'user_id': rng.choice(user_ids),
+                'username': f'用户{rng.randrange(users)}',
+                'created_at': (created_at + timedelta(seconds=j + 1)).isoformat(),
+            })
+        image_count = rng.randint(1, 3)
+        image_urls = [f'/api/uploads/bench_{i}_{k}.png' for k in range(image_count)]
+        works.append({
+            'id': f'work_{i}',
+            'title': f'{rng.choice(TITLE_WORDS)}{rng.choice(TITLE_WORDS)} #{i}',
+            'description': '合成测试数据 ' * rng.randint(1, 5),
+            'image_urls': image_urls,
+            'main_image_url': image_urls[0],
+            'likes': len(liked_by),
+            'liked_by': liked_by,
+            'like_times': like_times,
+            'comments': comments,
+            'created_at': created_at.isoformat(),
+            'username': f'作者{rng.randrange(users)}',
+            'realName': '',
+            'is_pinned': i % 500 == 0,
+        })
+    return works
+
+
+def seed_store(backend: str, works: List[dict]) -> None:
+    """把数据集写入当前目录下的存储文件（与 app.py 默认路径相同）"""
+    sys.path.insert(0, API_DIR)
+    from works_store import JsonWorksStore, SQLiteWorksStore
+    if backend == 'sqlite':
+        SQLiteWorksStore('works.db').import_works(works, source='bench')
+    else:
+        JsonWorksStore('works.json', journal=True).save_works(works)
+
+
+def random_png(rng: random.Random, size: int = 64) -> bytes:
+    """随机噪点 PNG（每张内容不同，不会被内容去重）"""
+    from PIL import Image
+    buf = io.BytesIO()
+    Image.frombytes('RGB', (size, size), rng.randbytes(size * size * 3)).save(buf, 'PNG')
+    return buf.getvalue()
+
+
+def multipart_body(fields: Dict[str, str], files: List[Tuple[str, str, bytes]]) -> Tuple[bytes, str]:
+    boundary = f'bench{random.getrandbits(64):x}'
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode('utf-8'))
+    for name, filename, data in files:
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                     f'Content-Type: image/png\r\n\r\n'.encode('utf-8') + data + b'\r\n')
+    parts.append(f'--{boundary}--\r\n'.encode('ascii'))
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+def json_request(method: str, path: str, payload: dict, headers: Optional[dict] = None) -> tuple:
+    body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    return method, path, dict(headers or {}, **{'Content-Type': 'application/json'}), body
+
+
+class TestClientTransport:
+    """通过 Flask 测试客户端调用（每个线程一个客户端）"""
+
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+
+    def request(self, method: str, path: str, headers: dict, body: Optional[bytes]) -> Tuple[int, bytes]:
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        response = client.open(path, method=method, headers=headers, data=body)
+        return response.status_code, response.get_data()
+
+
+class HTTPTransport:
+    """通过 HTTP 长连接调用本地服务器（每个线程一个连接）"""
+
+    def __init__(self, port: int):
+        self.port = port
+        self._local = threading.local()
+
+    def request(self, method: str, path: str, headers: dict, body: Optional[bytes]) -> Tuple[int, bytes]:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=60)
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            return response.status, response.read()
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            self._local.conn = None
+            raise
+
+
+def summarize_latencies(latencies: List[float], errors: int, elapsed: float) -> dict:
+    latencies = sorted(latencies)
+    count = len(latencies)
+
+    def percentile(p):
+        return round(latencies[min(count - 1, int(count * p))] * 1000, 3) if count else None
+
+    return {
+        'requests': count,
+        'errors': errors,
+        'req_per_sec': round(count / elapsed, 1) if elapsed else None,
+        'p50_ms': percentile(0.5),
+        'p99_ms': percentile(0.99),
+        'max_ms': round(latencies[-1] * 1000, 3) if count else None,
+    }
+
+
+def run_operation(transport, build: Callable[[random.Random], tuple], count: int, clients: int, seed: int,
+                  on_response: Optional[Callable[[bytes], None]] = None) -> dict:
+    """clients 个线程共发送 count 个请求；build(rng) 返回 (method, path, headers, body)"""
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    shares = [count // clients + (1 if n < count % clients else 0) for n in range(clients)]
+
+    def client(n: int, share: int):
+        rng = random.Random(seed * 1000 + n)
+        local_latencies = []
+        local_errors = 0
+        for _ in range(share):
+            method, path, headers, body = build(rng)
+            start = time.perf_counter()
+            try:
+                status, data = transport.request(method, path, headers, body)
+            except Exception:
+                local_errors += 1
+                continue
+            local_latencies.append(time.perf_counter() - start)
+            if status >= 400:
+                local_errors += 1
+            elif on_response is not None:
+                on_response(data)
+        with lock:
+            latencies.extend(local_latencies)
+            errors[0] += local_errors
+
+    threads = [threading.Thread(target=client, args=(n, share)) for n, share in enumerate(shares) if share]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return summarize_latencies(latencies, errors[0], time.perf_counter() - started)
+
+
+def time_calls(fn: Callable[[], object], repeat: int) -> dict:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return {
+        'repeat': repeat,
+        'min_ms': round(timings[0] * 1000, 3),
+        'median_ms': round(timings[len(timings) // 2] * 1000, 3),
+        'max_ms': round(timings[-1] * 1000, 3),
+    }
+
+
+def run_scenario(config: dict) -> dict:
+    """在当前目录（临时目录）中准备数据、加载应用并运行全部测试（子进程中执行）"""
+    rng = random.Random(config['seed'])
+    size = config['size']
+    started = time.perf_counter()
+    works = generate_catalogue(size, rng, config['avg_likes'], config['avg_comments'], config['users'])
+    dataset = {
+        'works': size,
+        'likes': sum(len(w['liked_by']) for w in works),
+        'comments': sum(len(w['comments']) for w in works),
+        'max_likes': max((len(w['liked_by']) for w in works), default=0),
+        'max_comments': max((len(w['comments']) for w in works), default=0),
+    }
+    seed_store(config['backend'], works)
+    dataset['prepare_sec'] = round(time.perf_counter() - started, 2)
+
+    # 热门作品收到更多点赞和评论（按已有点赞数加权）
+    work_ids = [w['id'] for w in works]
+    cum_weights = []
+    total = 0
+    for w in works:
+        total += len(w['liked_by']) + 1
+        cum_weights.append(total)
+    del works
+
+    import logging
+    logging.disable(logging.WARNING)
+    import app as appmod
+
+    server = None
+    if config['server']:
+        from wsgiref.simple_server import make_server
+        from bench_uploads import free_port, _ThreadingWSGIServer, _QuietHandler
+        port = free_port()
+        server = make_server('127.0.0.1', port, appmod.app, server_class=_ThreadingWSGIServer,
+                             handler_class=_QuietHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        transport = HTTPTransport(port)
+    else:
+        transport = TestClientTransport(appmod.app)
+
+    def pick_work(r: random.Random) -> str:
+        return r.choices(work_ids, cum_weights=cum_weights, k=1)[0]
+
+    count = config['requests']
+    images = [random_png(rng) for _ in range(count)]
+    image_lock = threading.Lock()
+    uploaded: List[str] = []
+
+    def next_image() -> bytes:
+        with image_lock:
+            return images.pop()
+
+    def build_upload(r):
+        body, content_type = multipart_body({'title': f'上传测试 {r.random():.6f}', 'username': 'bench'},
+                                            [('images', 'bench.png', next_image())])
+        return 'POST', '/api/works', {'Content-Type': content_type}, body
+
+    def on_uploaded(data: bytes):
+        with image_lock:
+            uploaded.append(json.loads(data)['id'])
+
+    def build_delete(r):
+        with image_lock:
+            work_id = uploaded.pop() if uploaded else 'missing'
+        return 'DELETE', f'/api/works/{work_id}', {'Authorization': f'Bearer {ADMIN_TOKEN}'}, None
+
+    builders = {
+        'list': (lambda r: ('GET', '/api/works', {}, None), None),
+        'list_page': (lambda r: ('GET', '/api/works?limit=20', {}, None), None),
+        'like': (lambda r: json_request('POST', f'/api/works/{pick_work(r)}/like',
+                                        {'user_id': f'user_{r.randrange(config["users"] * 2)}'}), None),
+        'comment': (lambda r: json_request('POST', f'/api/works/{pick_work(r)}/comments',
+                                           {'user_id': 'bench', 'username': 'bench', 'content': r.choice(COMMENT_WORDS)}),
+                    None),
+        'upload': (build_upload, on_uploaded),
+        'delete': (build_delete, None),
+    }
+
+    results = {}
+    try:
+        for index, name in enumerate(OPERATIONS):
+            build, on_response = builders[name]
+            # 第一个请求单独计时：包含加载数据、建立缓存等冷启动开销
+            method, path, headers, body = build(rng)
+            start = time.perf_counter()
+            status, data = transport.request(method, path, headers, body)
+            cold_ms = round((time.perf_counter() - start) * 1000, 3)
+            if on_response is not None and status < 400:
+                on_response(data)
+            results[name] = run_operation(transport, build, count - 1, config['clients'],
+                                          config['seed'] + index, on_response)
+            results[name]['cold_ms'] = cold_ms
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    store = appmod.works_store
+    repeat = config['micro_repeat']
+    loaded = store.load_works()
+    micro = {
+        'load_works': time_calls(store.load_works, repeat),
+        'list_works': time_calls(store.list_works, repeat),
+        'save_works': time_calls(lambda: store.save_works(loaded), repeat),
+    }
+    return {'dataset': dataset, 'operations': results, 'micro': micro}
+
+
+def run_in_subprocess(config: dict) -> dict:
+    root = tempfile.mkdtemp(prefix='bench_api_')
+    env = dict(os.environ, WORKS_STORE=config['backend'])
+    for name in ('WORKS_DB', 'EVENTS_PORT', 'METRICS_DIR', 'PROFILE_SLOW_REQUEST_MS', 'SNAPSHOT_DIR', 'SNAPSHOT_URL'):
+        env.pop(name, None)
+    # 所有请求来自同一个 IP，测量的是接口本身的吞吐量
+    env['RATE_LIMIT_ENABLED'] = '0'
+    env['PYTHONPATH'] = API_DIR + os.pathsep + env.get('PYTHONPATH', '')
+    try:
+        process = subprocess.run([sys.executable, os.path.abspath(__file__), '--scenario', json.dumps(config)],
+                                 cwd=root, env=env, capture_output=True, text=True)
+        if process.returncode != 0:
+            raise RuntimeError(f"场景运行失败:\n{process.stderr[-4000:]}")
+        return json.loads(process.stdout.strip().splitlines()[-1])
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=API_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_scenario(backend: str, size: int, result: dict) -> None:
+    dataset = result['dataset']
+    print(f"\n[{backend}] {size} 个作品（{dataset['likes']} 个点赞，{dataset['comments']} 条评论）")
+    for name, r in result['operations'].items():
+        print(f"  {name:<10} {r['req_per_sec']:>9} req/s  p50 {r['p50_ms']:>9} ms  p99 {r['p99_ms']:>9} ms  "
+              f"首次 {r['cold_ms']} ms  错误 {r['errors']}")
+    for name, r in result['micro'].items():
+        print(f"  {name:<10} 中位数 {r['median_ms']} ms（最小 {r['min_ms']} ms，{r['repeat']} 次）")
+
+
+def compare(baseline: dict, current: dict) -> None:
+    """按 p50 延迟对比两次结果（比值 > 1 表示变慢）"""
+    meta = baseline.get('meta', {})
+    print(f"\n与 {meta.get('git_revision')} 对比（p50 / 中位数，新/旧）:")
+    for key in ('mode', 'clients', 'seed'):
+        if meta.get(key) != current['meta'][key]:
+            print(f"  注意: 两次测试的 {key} 不同（{meta.get(key)} / {current['meta'][key]}），结果不能直接比较")
+    compared = 0
+    for backend, sizes in current['results'].items():
+        for size, result in sizes.items():
+            old = baseline.get('results', {}).get(backend, {}).get(size)
+            if old is None:
+                continue
+            compared += 1
+            for group, key in (('operations', 'p50_ms'), ('micro', 'median_ms')):
+                for name, r in result[group].items():
+                    before = old.get(group, {}).get(name, {}).get(key)
+                    if before and r.get(key):
+                        ratio = r[key] / before
+                        flag = '  <-- 变慢' if ratio > 1.2 else ''
+                        print(f"  [{backend} {size}] {name:<10} {before} -> {r[key]} ms  x{ratio:.2f}{flag}")
+    if not compared:
+        print("  没有相同的场景（存储后端和作品数）")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='API 吞吐量和延迟测试')
+    parser.add_argument('--sizes', default='100,1000', help='作品数，逗号分隔（如 100,10000,100000）')
+    parser.add_argument('--backends', default='json,sqlite', help='存储后端，逗号分隔（json/sqlite）')
+    parser.add_argument('--requests', type=int, default=200, help='每个接口的请求数')
+    parser.add_argument('--clients', type=int, default=1, help='并发客户端数')
+    parser.add_argument('--server', action='store_true', help='启动本地 WSGI 线程服务器，通过 HTTP 调用')
+    parser.add_argument('--avg-likes', type=float, default=8.0, help='每个作品的平均点赞数')
+    parser.add_argument('--avg-comments', type=float, default=3.0, help='每个作品的平均评论数')
+    parser.add_argument('--users', type=int, default=5000, help='用户数')
+    parser.add_argument('--micro-repeat', type=int, default=5, help='load_works/save_works 的重复次数')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子（相同参数生成相同的数据和请求）')
+    parser.add_argument('--json', help='把结果写入 JSON 文件')
+    parser.add_argument('--compare', help='与之前保存的 JSON 结果对比')
+    parser.add_argument('--scenario', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.scenario:
+        print(json.dumps(run_scenario(json.loads(args.scenario)), ensure_ascii=False))
+        return
+
+    sizes = [int(s) for s in args.sizes.split(',') if s.strip()]
+    backends = [b.strip() for b in args.backends.split(',') if b.strip()]
+    mode = "HTTP（wsgiref 线程服务器）" if args.server else 'Flask 测试客户端'
+    print(f"调用方式: {mode}，并发客户端: {args.clients}，每个接口 {args.requests} 个请求，随机种子 {args.seed}")
+
+    results: Dict[str, Dict[str, dict]] = {}
+    for backend in backends:
+        for size in sizes:
+            config = {'backend': backend, 'size': size, 'requests': max(2, args.requests),
+                      'clients': max(1, args.clients), 'server': args.server, 'avg_likes': args.avg_likes,
+                      'avg_comments': args.avg_comments, 'users': args.users,
+                      'micro_repeat': max(1, args.micro_repeat), 'seed': args.seed}
+            result = run_in_subprocess(config)
+            results.setdefault(backend, {})[str(size)] = result
+            print_scenario(backend, size, result)
+
+    output = {
+        'meta': {
+            'git_revision': git_revision(),
+            'time': datetime.now(BEIJING_TZ).isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'mode': 'server' if args.server else 'test_client',
+            'clients': args.clients,
+            'requests': args.requests,
+            'avg_likes': args.avg_likes,
+            'avg_comments': args.avg_comments,
+            'users': args.users,
+            'seed': args.seed,
+        },
+        'results': results,
+    }
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(output, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已写入 {args.json}")
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(json.load(f), output)
+
+
+if __name__ == '__main__':
+    main()
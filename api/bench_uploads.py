@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+图片发送性能测试 - 对比 /api/uploads 各发送方式的吞吐量
+
+发送方式（UPLOADS_SERVE_MODE）:
+- app（关闭 sendfile）: Flask 按块读取文件写入 socket
+- app（sendfile）: gunicorn 通过 wsgi.file_wrapper 使用 sendfile 零拷贝发送
+- x-sendfile / x-accel: Flask 只返回响应头，文件由前置服务器发送（这里只测 Flask 一侧的开销）
+
+用法:
+    cd api
+    python bench_uploads.py                       # 每种方式 5 秒，8 个并发客户端
+    python bench_uploads.py --duration 10 --clients 16 --json result.json
+
+安装了 gunicorn 时使用 gunicorn（gthread）测试，否则使用 wsgiref 线程服务器（无法测试 sendfile）
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import shutil
+import argparse
+import tempfile
+import threading
+import subprocess
+import http.client
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIServer, WSGIRequestHandler, make_server
+
+API_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 测试文件：文件名 -> 大小
+BENCH_FILES = {
+    'bench_thumb.jpg': 32 * 1024,
+    'bench_full.jpg': 2 * 1024 * 1024,
+}
+
+# 请求类型：名称 -> (文件名, Range 头)
+REQUESTS = {
+    'thumb 32KB': ('bench_thumb.jpg', None),
+    'full 2MB': ('bench_full.jpg', None),
+    'range 64KB': ('bench_full.jpg', 'bytes=1048576-1114111'),
+}
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def prepare_folder(root: str) -> None:
+    upload_folder = os.path.join(root, 'uploads')
+    os.makedirs(upload_folder, exist_ok=True)
+    for filename, size in BENCH_FILES.items():
+        with open(os.path.join(upload_folder, filename), 'wb') as f:
+            f.write(b'\xff\xd8\xff' + os.urandom(size - 3))
+
+
+def wait_ready(port: int, timeout: float = 15.0) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('GET', '/api/uploads/bench_thumb.jpg')
+            conn.getresponse().read()
+            conn.close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f'服务器未能在 {timeout} 秒内启动')
+
+
+def run_clients(port: int, path: str, range_header, clients: int, duration: float) -> dict:
+    """多个长连接客户端循环请求，统计吞吐量和延迟"""
+    latencies = []
+    total_bytes = [0]
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.time() + duration
+
+    def client():
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        headers = {'Range': range_header} if range_header else {}
+        local_latencies = []
+        local_bytes = 0
+        while time.time() < deadline:
+            start = time.perf_counter()
+            try:
+                conn.request('GET', path, headers=headers)
+                response = conn.getresponse()
+                body = response.read()
+                if response.status not in (200, 206):
+                    raise RuntimeError(response.status)
+            except Exception:
+                with lock:
+                    errors[0] += 1
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+                continue
+            local_latencies.append(time.perf_counter() - start)
+            local_bytes += len(body)
+        conn.close()
+        with lock:
+            latencies.extend(local_latencies)
+            total_bytes[0] += local_bytes
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    count = len(latencies)
+    return {
+        'requests': count,
+        'errors': errors[0],
+        'req_per_sec': round(count / elapsed, 1),
+        'mb_per_sec': round(total_bytes[0] / elapsed / 1024 / 1024, 1),
+        'p50_ms': round(latencies[count // 2] * 1000, 2) if count else None,
+        'p99_ms': round(latencies[min(count - 1, int(count * 0.99))] * 1000, 2) if count else None,
+    }
+
+
+class _ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def start_gunicorn(root: str, port: int, mode: str, sendfile: bool) -> subprocess.Popen:
+    cmd = [sys.executable, '-m', 'gunicorn', '--chdir', root, '--pythonpath', API_DIR,
+           '-w', '2', '-k', 'gthread', '--threads', '8', '-b', f'127.0.0.1:{port}',
+           '--log-level', 'warning', 'app:app']
+    if not sendfile:
+        cmd.insert(-1, '--no-sendfile')
+    env = dict(os.environ, UPLOADS_SERVE_MODE=mode)
+    return subprocess.Popen(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def benchmark_scenario(root: str, label: str, mode: str, sendfile, args) -> dict:
+    port = free_port()
+    if sendfile is None:
+        # wsgiref 线程服务器（进程内）
+        import app as appmod
+        appmod.app.config['UPLOADS_SERVE_MODE'] = mode
+        server = make_server('127.0.0.1', port, appmod.app, server_class=_ThreadingWSGIServer,
+                             handler_class=_QuietHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        stop = server.shutdown
+    else:
+        process = start_gunicorn(root, port, mode, sendfile)
+        stop = lambda: (process.terminate(), process.wait())
+
+    try:
+        wait_ready(port)
+        results = {}
+        for name, (filename, range_header) in REQUESTS.items():
+            results[name] = run_clients(port, f'/api/uploads/{filename}', range_header,
+                                        args.clients, args.duration)
+            print(f"  {label:<22} {name:<12} {results[name]['req_per_sec']:>9} req/s "
+                  f"{results[name]['mb_per_sec']:>8} MB/s  p50 {results[name]['p50_ms']} ms  "
+                  f"p99 {results[name]['p99_ms']} ms")
+        return results
+    finally:
+        stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='对比 /api/uploads 各发送方式的吞吐量')
+    parser.add_argument('--duration', type=float, default=5.0, help='每个场景的测试时长（秒）')
+    parser.add_argument('--clients', type=int, default=8, help='并发客户端数')
+    parser.add_argument('--json', help='把结果写入 JSON 文件')
+    args = parser.parse_args()
+
+    try:
+        import gunicorn  # noqa: F401
+        scenarios = [
+            ('app (no sendfile)', 'app', False),
+            ('app (sendfile)', 'app', True),
+            ('x-sendfile', 'x-sendfile', True),
+            ('x-accel', 'x-accel', True),
+        ]
+        server = 'gunicorn gthread (2 workers x 8 threads)'
+    except ImportError:
+        scenarios = [(mode, mode, None) for mode in ('app', 'x-sendfile', 'x-accel')]
+        server = 'wsgiref (threading)'
+
+    root = tempfile.mkdtemp(prefix='bench_uploads_')
+    cwd = os.getcwd()
+    try:
+        prepare_folder(root)
+        os.chdir(root)
+        sys.path.insert(0, API_DIR)
+        print(f"服务器: {server}，并发客户端: {args.clients}，每项 {args.duration} 秒")
+        results = {label: benchmark_scenario(root, label, mode, sendfile, args)
+                   for label, mode, sendfile in scenarios}
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(root, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'server': server, 'clients': args.clients, 'duration': args.duration,
+                       'results': results}, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入 {args.json}")
+
+
+if __name__ == '__main__':
+    main()
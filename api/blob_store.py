@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+内容寻址图片存储模块 - 图片文件名由内容的 SHA-256 决定，相同的图片只保存一份
+每个图片文件有一个引用计数（被多少个作品引用），删除作品时只删除不再被引用的文件
+"""
+
+import os
+import re
+import json
+from typing import Optional, Tuple
+import logging
+
+from write_coordinator import FileLock, atomic_write
+
+logger = logging.getLogger(__name__)
+
+# 图片类型 -> 扩展名
+IMAGE_EXTENSIONS = {
+    'jpeg': '.jpg',
+    'png': '.png',
+    'gif': '.gif',
+    'webp': '.webp',
+}
+
+BLOB_NAME_PATTERN = re.compile(r'^[0-9a-f]{64}\.[a-z]+$')
+
+
+class BlobStore:
+    """内容寻址存储：文件保存在 folder/{sha256}{ext}，引用计数保存在 folder/.blobs/{文件名}.json"""
+
+    def __init__(self, folder: str):
+        self.folder = folder
+        self.ref_folder = os.path.join(folder, '.blobs')
+        os.makedirs(self.ref_folder, exist_ok=True)
+        # 引用计数的读-改-写需要跨进程互斥
+        self.lock = FileLock(os.path.join(self.ref_folder, '.lock'))
+
+    @staticmethod
+    def blob_name(sha256: str, image_type: str) -> str:
+        return f"{sha256}{IMAGE_EXTENSIONS.get(image_type, '.' + image_type)}"
+
+    @staticmethod
+    def is_blob(filename: str) -> bool:
+        """是否为内容寻址的文件名（旧版本按作品ID命名的文件不是）"""
+        return bool(BLOB_NAME_PATTERN.match(filename))
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.folder, name)
+
+    def _ref_path(self, name: str) -> str:
+        return os.path.join(self.ref_folder, f'{name}.json')
+
+    def _read_record(self, name: str) -> Optional[dict]:
+        try:
+            with open(self._ref_path(name), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write_record(self, name: str, record: dict) -> None:
+        atomic_write(self._ref_path(name), json.dumps(record).encode('utf-8'))
+
+    def add(self, temp_path: str, sha256: str, image_type: str) -> Tuple[str, bool]:
+        """把已写入临时文件的图片加入存储并增加引用，返回 (文件名, 是否为新内容)
+
+        内容已存在时删除临时文件，只增加引用计数
+        """
+        name = self.blob_name(sha256, image_type)
+        with self.lock:
+            record = self._read_record(name)
+            if record is not None and os.path.exists(self.path(name)):
+                os.remove(temp_path)
+                record['refs'] += 1
+                created = False
+            else:
+                os.replace(temp_path, self.path(name))
+                record = {'refs': 1}
+                created = True
+            self._write_record(name, record)
+        logger.info(f"图片{'已保存' if created else '已存在，复用'}: {name}, 引用数 {record['refs']}")
+        return name, created
+
+    def release(self, name: str) -> bool:
+        """减少一次引用，引用数归零时删除文件；返回内容是否已不再被引用
+
+        非内容寻址的旧文件没有引用计数，总是返回 True（由调用方按原方式删除）
+        """
+        if not self.is_blob(name):
+            return True
+        with self.lock:
+            record = self._read_record(name)
+            if record is None:
+                return True
+            record['refs'] -= 1
+            if record['refs'] > 0:
+                self._write_record(name, record)
+                return False
+            os.remove(self._ref_path(name))
+            if os.path.exists(self.path(name)):
+                os.remove(self.path(name))
+        logger.info(f"图片已无引用，已删除: {name}")
+        return True
+
+    def refs(self, name: str) -> int:
+        """当前引用数"""
+        record = self._read_record(name) if self.is_blob(name) else None
+        return record['refs'] if record else 0
@@ -2,17 +2,40 @@
 """
 云存储模块 - 解决图片持久化问题
 支持多种云存储服务，确保图片不会丢失
+
+HTTP 云存储共用一个连接池（requests.Session），同一作品的多张图片并发上传，
+失败时按指数退避重试；图片从磁盘按块读取发送，不整体载入内存。
+TieredStorage 先写本地并立即返回，再由后台线程从持久化队列复制到云存储
 """
 
+import io
 import os
-import requests
-import base64
+import json
+import uuid
+import fcntl
+import hashlib
 import time
-from typing import List, Optional
+import random
+import mimetypes
+import threading
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, BinaryIO, Callable, Dict, List, Optional, Tuple, Union
 import logging
 
+# requests 导入较慢，首次使用 HTTP 云存储时才导入（缩短无服务器部署的冷启动时间）
+if TYPE_CHECKING:
+    import requests
+
+from write_coordinator import atomic_write
+
 logger = logging.getLogger(__name__)
 
+READ_CHUNK_SIZE = 64 * 1024
+
+# 需要重试的 HTTP 状态码（限流、服务端错误）
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
 class CloudStorage:
     """云存储基类"""
     
@@ -23,17 +46,190 @@ class CloudStorage:
         """上传图片到云存储"""
         raise NotImplementedError
     
+    def upload_file(self, file_path: str, filename: str) -> Optional[str]:
+        """上传本地图片文件（默认读入内存后调用 upload_image）"""
+        with open(file_path, 'rb') as f:
+            return self.upload_image(f.read(), filename)
+
+    def upload_files(self, files: List[Tuple[str, str]]) -> List[Optional[str]]:
+        """上传多个 (本地路径, 文件名)，返回与输入一一对应的地址，失败的为 None"""
+        return [self.upload_file(file_path, filename) for file_path, filename in files]
+
     def delete_image(self, image_url: str) -> bool:
         """删除云存储中的图片"""
         raise NotImplementedError
 
-class ImgBBStorage(CloudStorage):
+class MultipartStream:
+    """multipart/form-data 请求体，按块读取，文件内容直接从磁盘流式发送"""
+
+    def __init__(self, fields: Dict[str, str], file_field: str, filename: str,
+                 source: Union[str, bytes]):
+        boundary = uuid.uuid4().hex
+        self.content_type = f'multipart/form-data; boundary={boundary}'
+        content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        head = ''.join(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'
+                       for name, value in fields.items())
+        head += (f'--{boundary}\r\nContent-Disposition: form-data; name="{file_field}"; '
+                 f'filename="{filename}"\r\nContent-Type: {content_type}\r\n\r\n')
+        tail = f'\r\n--{boundary}--\r\n'
+
+        if isinstance(source, bytes):
+            self._file: BinaryIO = io.BytesIO(source)
+            file_size = len(source)
+        else:
+            self._file = open(source, 'rb')
+            file_size = os.fstat(self._file.fileno()).st_size
+        self._segments: List[Union[bytes, BinaryIO]] = [head.encode('utf-8'), self._file, tail.encode('utf-8')]
+        self._length = len(self._segments[0]) + file_size + len(self._segments[2])
+
+    def __len__(self) -> int:
+        # requests 据此设置 Content-Length，不使用分块传输编码
+        return self._length
+
+    def __iter__(self):
+        return iter(lambda: self.read(READ_CHUNK_SIZE), b'')
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            size = self._length
+        out = []
+        while size > 0 and self._segments:
+            segment = self._segments[0]
+            if isinstance(segment, bytes):
+                chunk = segment[:size]
+                if len(segment) > size:
+                    self._segments[0] = segment[size:]
+                else:
+                    self._segments.pop(0)
+            else:
+                chunk = segment.read(size)
+                if not chunk:
+                    self._segments.pop(0)
+                    continue
+            out.append(chunk)
+            size -= len(chunk)
+        return b''.join(out)
+
+    def close(self) -> None:
+        self._file.close()
+
+class PooledHTTPStorage(CloudStorage):
+    """HTTP 云存储基类：复用连接、并发上传、失败重试
+
+    子类实现 _upload_request（上传地址、表单字段、文件字段名）和 _parse_upload（从响应中取出图片地址）
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, max_retries: Optional[int] = None,
+                 backoff: float = 0.5, timeout: float = 30):
+        super().__init__()
+        # 进程内所有上传共用的并发上限（也是连接池大小）
+        self.max_workers = max_workers or int(os.environ.get('CLOUD_UPLOAD_CONCURRENCY', '4'))
+        self.max_retries = max_retries if max_retries is not None else int(os.environ.get('CLOUD_UPLOAD_RETRIES', '3'))
+        self.backoff = backoff
+        self.timeout = timeout
+        self._session: Optional['requests.Session'] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._init_lock = threading.Lock()
+
+    @property
+    def session(self) -> 'requests.Session':
+        """延迟创建的共享会话，保持长连接"""
+        if self._session is None:
+            with self._init_lock:
+                if self._session is None:
+                    import requests
+                    from requests.adapters import HTTPAdapter
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.max_workers)
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    self._session = session
+        return self._session
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._init_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                        thread_name_prefix='cloud-upload')
+        return self._executor
+
+    def _upload_request(self, filename: str) -> Tuple[str, Dict[str, str], str]:
+        """返回 (上传地址, 表单字段, 文件字段名)"""
+        raise NotImplementedError
+
+    def _parse_upload(self, result: dict, filename: str) -> Optional[str]:
+        """从上传响应中取出图片地址"""
+        raise NotImplementedError
+
+    def _retry_delay(self, attempt: int, response: Optional['requests.Response']) -> float:
+        """指数退避加随机抖动；服务端给出 Retry-After 时以其为准"""
+        if response is not None:
+            retry_after = response.headers.get('Retry-After', '')
+            if retry_after.isdigit():
+                return min(float(retry_after), 60.0)
+        return min(self.backoff * (2 ** attempt), 30.0) + random.uniform(0, self.backoff)
+
+    def _upload(self, source: Union[str, bytes], filename: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        import requests
+
+        name = self.__class__.__name__
+        for attempt in range(self.max_retries + 1):
+            response = None
+            try:
+                url, fields, file_field = self._upload_request(filename)
+                # 每次尝试都重新构造请求体（流式请求体只能读一遍）
+                body = MultipartStream(fields, file_field, filename, source)
+                try:
+                    response = self.session.post(url, data=body, headers={'Content-Type': body.content_type},
+                                                 timeout=self.timeout)
+                finally:
+                    body.close()
+
+                if response.status_code == 200:
+                    image_url = self._parse_upload(response.json(), filename)
+                    if image_url:
+                        logger.info(f"图片上传到{name}成功: {filename}")
+                    return image_url
+                if response.status_code not in RETRY_STATUS_CODES:
+                    logger.error(f"{name} API请求失败: {response.status_code}")
+                    return None
+                logger.warning(f"{name} API请求失败: {response.status_code}，第 {attempt + 1} 次尝试")
+            except (requests.ConnectionError, requests.Timeout) as e:
+                logger.warning(f"{name}上传网络错误: {e}，第 {attempt + 1} 次尝试")
+            except Exception as e:
+                logger.error(f"{name}上传异常: {e}")
+                return None
+
+            if attempt < self.max_retries:
+                time.sleep(self._retry_delay(attempt, response))
+
+        logger.error(f"{name}上传失败，已重试 {self.max_retries} 次: {filename}")
+        return None
+
+    def upload_image(self, image_data: bytes, filename: str) -> Optional[str]:
+        return self._upload(image_data, filename)
+
+    def upload_file(self, file_path: str, filename: str) -> Optional[str]:
+        return self._upload(file_path, filename)
+
+    def upload_files(self, files: List[Tuple[str, str]]) -> List[Optional[str]]:
+        """并发上传多张图片，总耗时接近最慢的一张"""
+        if len(files) <= 1:
+            return super().upload_files(files)
+        return list(self.executor.map(lambda item: self.upload_file(*item), files))
+
+class ImgBBStorage(PooledHTTPStorage):
     """ImgBB免费图片托管服务"""
     
     def __init__(self):
         super().__init__()
         # ImgBB API密钥 - 免费注册获取
         self.api_key = os.environ.get('IMGBB_API_KEY', '')
+        self.api_url = os.environ.get('IMGBB_API_URL', 'https://api.imgbb.com/1/upload')
         self.enabled = bool(self.api_key)
         
         if self.enabled:
@@ -41,39 +237,14 @@ class ImgBBStorage(CloudStorage):
         else:
             logger.warning("ImgBB云存储未启用，请设置IMGBB_API_KEY环境变量")
     
-    def upload_image(self, image_data: bytes, filename: str) -> Optional[str]:
-        """上传图片到ImgBB"""
-        if not self.enabled:
-            return None
-            
-        try:
-            # 将图片数据编码为base64
-            image_base64 = base64.b64encode(image_data).decode('utf-8')
-            
-            # 准备上传数据
-            data = {
-                'key': self.api_key,
-                'image': image_base64,
-                'name': filename
-            }
-            
-            # 发送上传请求
-            response = requests.post('https://api.imgbb.com/1/upload', data=data, timeout=30)
+    def _upload_request(self, filename: str) -> Tuple[str, Dict[str, str], str]:
+        # 以二进制文件上传，无需 base64 编码
+        return self.api_url, {'key': self.api_key, 'name': filename}, 'image'
             
-            if response.status_code == 200:
-                result = response.json()
-                if result.get('success'):
-                    image_url = result['data']['url']
-                    logger.info(f"图片上传到ImgBB成功: {filename}")
-                    return image_url
-                else:
-                    logger.error(f"ImgBB上传失败: {result.get('error', {}).get('message', '未知错误')}")
-            else:
-                logger.error(f"ImgBB API请求失败: {response.status_code}")
-                
-        except Exception as e:
-            logger.error(f"ImgBB上传异常: {e}")
-        
+    def _parse_upload(self, result: dict, filename: str) -> Optional[str]:
+        if result.get('success'):
+            return result['data']['url']
+        logger.error(f"ImgBB上传失败: {result.get('error', {}).get('message', '未知错误')}")
         return None
     
     def delete_image(self, image_url: str) -> bool:
@@ -82,7 +253,7 @@ class ImgBBStorage(CloudStorage):
         logger.info(f"ImgBB图片无法删除: {image_url}")
         return True
 
-class CloudinaryStorage(CloudStorage):
+class CloudinaryStorage(PooledHTTPStorage):
     """Cloudinary免费图片托管服务"""
     
     def __init__(self):
@@ -91,6 +262,7 @@ class CloudinaryStorage(CloudStorage):
         self.cloud_name = os.environ.get('CLOUDINARY_CLOUD_NAME', '')
         self.api_key = os.environ.get('CLOUDINARY_API_KEY', '')
         self.api_secret = os.environ.get('CLOUDINARY_API_SECRET', '')
+        self.api_base = os.environ.get('CLOUDINARY_API_URL', 'https://api.cloudinary.com')
         
         self.enabled = bool(self.cloud_name and self.api_key and self.api_secret)
         
@@ -99,41 +271,52 @@ class CloudinaryStorage(CloudStorage):
         else:
             logger.warning("Cloudinary云存储未启用，请设置相关环境变量")
     
-    def upload_image(self, image_data: bytes, filename: str) -> Optional[str]:
-        """上传图片到Cloudinary"""
-        if not self.enabled:
-            return None
+    def _upload_request(self, filename: str) -> Tuple[str, Dict[str, str], str]:
+        # 这里需要实现签名验证，简化版本
+        data = {
+            'api_key': self.api_key,
+            'timestamp': str(int(time.time()))
+        }
+        return f'{self.api_base}/v1_1/{self.cloud_name}/image/upload', data, 'file'
             
+    def _parse_upload(self, result: dict, filename: str) -> Optional[str]:
+        return result.get('secure_url')
+
+    @staticmethod
+    def _public_id(image_url: str) -> Optional[str]:
+        """.../image/upload/v1712345678/<public_id>.jpg -> public_id"""
+        path = urllib.parse.urlsplit(image_url).path
+        marker = '/image/upload/'
+        if marker not in path:
+            return None
+        parts = path.split(marker, 1)[1].split('/')
+        if parts[0][:1] == 'v' and parts[0][1:].isdigit():
+            parts = parts[1:]
+        return os.path.splitext('/'.join(parts))[0] or None
+
+    def delete_image(self, image_url: str) -> bool:
+        """调用 destroy 接口删除图片（需要签名）；图片已不存在也视为成功"""
+        if not self.enabled:
+            return False
+        public_id = self._public_id(image_url)
+        if not public_id:
+            logger.warning(f"不是Cloudinary图片地址，无法删除: {image_url}")
+            return False
+        timestamp = str(int(time.time()))
+        signature = hashlib.sha1(f'public_id={public_id}&timestamp={timestamp}{self.api_secret}'.encode('utf-8')).hexdigest()
+        data = {'public_id': public_id, 'timestamp': timestamp, 'api_key': self.api_key, 'signature': signature}
         try:
-            # 准备上传数据
-            files = {
-                'file': (filename, image_data, 'image/jpeg')
-            }
-            
-            data = {
-                'api_key': self.api_key,
-                'timestamp': str(int(time.time()))
-            }
-            
-            # 这里需要实现签名验证，简化版本
-            response = requests.post(
-                f'https://api.cloudinary.com/v1_1/{self.cloud_name}/image/upload',
-                files=files,
-                data=data,
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                image_url = result.get('secure_url')
-                if image_url:
-                    logger.info(f"图片上传到Cloudinary成功: {filename}")
-                    return image_url
-                    
+            response = self.session.post(f'{self.api_base}/v1_1/{self.cloud_name}/image/destroy',
+                                         data=data, timeout=self.timeout)
+            result = response.json().get('result') if response.status_code == 200 else None
         except Exception as e:
-            logger.error(f"Cloudinary上传异常: {e}")
-        
-        return None
+            logger.error(f"Cloudinary删除图片异常: {image_url}, {e}")
+            return False
+        if result in ('ok', 'not found'):
+            logger.info(f"Cloudinary图片已删除: {public_id}")
+            return True
+        logger.error(f"Cloudinary删除图片失败: {image_url}, {response.status_code} {result}")
+        return False
 
 class LocalStorage(CloudStorage):
     """本地存储（开发环境使用）"""
@@ -161,6 +344,12 @@ class LocalStorage(CloudStorage):
             logger.error(f"本地保存失败: {e}")
             return None
     
+    def upload_file(self, file_path: str, filename: str) -> Optional[str]:
+        """文件已在上传目录中时无需复制"""
+        if os.path.abspath(file_path) == os.path.abspath(os.path.join(self.upload_folder, filename)):
+            return f'/api/uploads/{filename}'
+        return super().upload_file(file_path, filename)
+
     def delete_image(self, image_url: str) -> bool:
         """删除本地图片文件"""
         try:
@@ -177,6 +366,348 @@ class LocalStorage(CloudStorage):
         
         return False
 
+class ContentIndex:
+    """内容哈希 -> 云存储地址的持久化索引（每条记录一个小文件，同时保存地址到哈希的反向记录）"""
+
+    def __init__(self, folder: str):
+        self.hash_folder = os.path.join(folder, 'hash')
+        self.url_folder = os.path.join(folder, 'url')
+        os.makedirs(self.hash_folder, exist_ok=True)
+        os.makedirs(self.url_folder, exist_ok=True)
+
+    @staticmethod
+    def _url_key(url: str) -> str:
+        return hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _read(path: str) -> Optional[str]:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return f.read() or None
+        except FileNotFoundError:
+            return None
+
+    def get(self, sha256: str) -> Optional[str]:
+        return self._read(os.path.join(self.hash_folder, sha256))
+
+    def put(self, sha256: str, url: str) -> None:
+        atomic_write(os.path.join(self.url_folder, self._url_key(url)), sha256.encode('utf-8'))
+        atomic_write(os.path.join(self.hash_folder, sha256), url.encode('utf-8'))
+
+    def remove_url(self, url: str) -> None:
+        """删除地址对应的记录（云端副本被删除后，相同内容需要重新上传）"""
+        url_path = os.path.join(self.url_folder, self._url_key(url))
+        sha256 = self._read(url_path)
+        if sha256 and self.get(sha256) == url:
+            os.remove(os.path.join(self.hash_folder, sha256))
+        if os.path.exists(url_path):
+            os.remove(url_path)
+
+
+def file_sha256(file_path: str) -> str:
+    """按块计算文件的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(READ_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DedupCloudStorage(CloudStorage):
+    """按内容去重的云存储：内容的哈希已有云端地址时跳过上传，直接返回已有地址"""
+
+    def __init__(self, backend: CloudStorage, index_folder: str):
+        super().__init__()
+        self.backend = backend
+        self.index = ContentIndex(index_folder)
+        self.enabled = backend.enabled
+        self.dedup_hits = 0
+
+    def _lookup(self, sha256: str, filename: str) -> Optional[str]:
+        url = self.index.get(sha256)
+        if url:
+            self.dedup_hits += 1
+            logger.info(f"云存储中已有相同内容，跳过上传: {filename}")
+        return url
+
+    def upload_image(self, image_data: bytes, filename: str) -> Optional[str]:
+        sha256 = hashlib.sha256(image_data).hexdigest()
+        url = self._lookup(sha256, filename)
+        if url is None:
+            url = self.backend.upload_image(image_data, filename)
+            if url:
+                self.index.put(sha256, url)
+        return url
+
+    def upload_file(self, file_path: str, filename: str) -> Optional[str]:
+        return self.upload_files([(file_path, filename)])[0]
+
+    def upload_files(self, files: List[Tuple[str, str]]) -> List[Optional[str]]:
+        """已有云端地址的内容直接返回，其余的每种内容只上传一次（并发）"""
+        hashes = [file_sha256(file_path) for file_path, _ in files]
+        urls: Dict[str, Optional[str]] = {}
+        uploads: Dict[str, Tuple[str, str]] = {}
+        for sha256, (file_path, filename) in zip(hashes, files):
+            if sha256 in urls or sha256 in uploads:
+                continue
+            url = self._lookup(sha256, filename)
+            if url:
+                urls[sha256] = url
+            else:
+                uploads[sha256] = (file_path, filename)
+
+        for sha256, url in zip(uploads, self.backend.upload_files(list(uploads.values()))):
+            if url:
+                self.index.put(sha256, url)
+            urls[sha256] = url
+        return [urls[sha256] for sha256 in hashes]
+
+    def delete_image(self, image_url: str) -> bool:
+        self.index.remove_url(image_url)
+        return self.backend.delete_image(image_url)
+
+
+class ReplicationQueue:
+    """持久化的复制任务队列：每个任务一个 JSON 文件，进程重启后继续处理
+
+    任务由 (文件名, 附加信息) 确定，同一文件可以有多个任务（如被多个作品引用）；
+    多个进程共用同一目录时，通过文件锁保证同一任务同时只由一个进程处理
+    """
+
+    def __init__(self, folder: str):
+        self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+
+    @staticmethod
+    def task_id(filename: str, meta: Dict[str, Any]) -> str:
+        if not meta:
+            return filename
+        digest = hashlib.sha1(json.dumps(meta, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+        return f'{filename}.{digest}'
+
+    def _path(self, task_id: str) -> str:
+        return os.path.join(self.folder, f'{task_id}.json')
+
+    def put(self, filename: str, meta: Dict[str, Any]) -> None:
+        """加入复制任务（写临时文件后改名，不会留下半个任务文件）"""
+        task_id = self.task_id(filename, meta)
+        path = self._path(task_id)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'id': task_id, 'filename': filename, 'meta': meta, 'created_at': time.time()},
+                      f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def remove(self, task_id: str) -> None:
+        try:
+            os.remove(self._path(task_id))
+        except FileNotFoundError:
+            pass
+
+    def pending(self) -> List[str]:
+        """待处理的任务ID（按加入顺序）"""
+        try:
+            names = [name for name in os.listdir(self.folder) if name.endswith('.json')]
+        except OSError:
+            return []
+        paths = sorted((os.path.join(self.folder, name) for name in names), key=_mtime)
+        return [os.path.basename(path)[:-len('.json')] for path in paths]
+
+    def claim(self, task_id: str) -> Optional[Tuple[int, dict]]:
+        """锁定任务，返回 (文件描述符, 任务)；任务已被其他进程处理时返回 None"""
+        path = self._path(task_id)
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except FileNotFoundError:
+            return None
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            # 加锁前任务可能已被完成并删除
+            if os.fstat(fd).st_ino != os.stat(path).st_ino:
+                raise FileNotFoundError(path)
+            with os.fdopen(os.dup(fd), 'r', encoding='utf-8') as f:
+                task = json.load(f)
+        except (OSError, ValueError):
+            os.close(fd)
+            return None
+        return fd, task
+
+
+def _mtime(path: str) -> float:
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return 0.0
+
+
+class TieredStorage(CloudStorage):
+    """分层存储：图片写入本地后立即返回本地地址，由后台线程复制到云存储
+
+    复制成功后调用 on_replicated(filename, local_url, cloud_url, meta)；
+    返回 False 表示图片已不再需要（如作品已被删除），此时删除云端副本。
+    复制失败的任务保留在队列中，按指数退避重试
+    """
+
+    def __init__(self, local: LocalStorage, remote: CloudStorage, queue_folder: str,
+                 on_replicated: Optional[Callable[[str, str, str, dict], bool]] = None,
+                 poll_interval: float = 5.0, max_backoff: float = 600.0, batch_size: int = 8):
+        super().__init__()
+        self.local = local
+        self.remote = remote
+        self.queue = ReplicationQueue(queue_folder)
+        self.on_replicated = on_replicated
+        self.poll_interval = poll_interval
+        self.max_backoff = max_backoff
+        self.batch_size = batch_size
+        self.enabled = True
+        self.replicated = 0
+        self.failed_attempts = 0
+        self._failures: Dict[str, int] = {}
+        self._retry_at: Dict[str, float] = {}
+        self._wakeup = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+        self._worker_lock = threading.Lock()
+        # 启动时继续处理上次未完成的任务
+        if self.queue.pending():
+            self._ensure_worker()
+
+    @staticmethod
+    def local_url(filename: str) -> str:
+        return f'/api/uploads/{filename}'
+
+    def upload_image(self, image_data: bytes, filename: str) -> Optional[str]:
+        url = self.local.upload_image(image_data, filename)
+        if url:
+            self.replicate([filename])
+        return url
+
+    def upload_file(self, file_path: str, filename: str) -> Optional[str]:
+        url = self.local.upload_file(file_path, filename)
+        if url:
+            self.replicate([filename])
+        return url
+
+    def replicate(self, filenames: List[str], meta: Optional[Dict[str, Any]] = None) -> None:
+        """把已保存在本地的图片加入复制队列，不等待复制完成"""
+        for filename in filenames:
+            self.queue.put(filename, meta or {})
+        self._ensure_worker()
+        self._wakeup.set()
+
+    def cancel(self, filename: str, meta: Optional[Dict[str, Any]] = None) -> None:
+        """取消尚未完成的复制任务"""
+        self.queue.remove(self.queue.task_id(filename, meta or {}))
+
+    def delete_image(self, image_url: str) -> bool:
+        if image_url.startswith('/api/uploads/'):
+            self.cancel(image_url.split('/')[-1])
+            return self.local.delete_image(image_url)
+        return self.remote.delete_image(image_url)
+
+    def after_fork(self) -> None:
+        """fork 出的子进程中没有复制线程，有未完成的任务时重新启动"""
+        self._worker = None
+        if self.queue.pending():
+            self._ensure_worker()
+
+    def _ensure_worker(self) -> None:
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='cloud-replication', daemon=True)
+                self._worker.start()
+
+    def _run(self) -> None:
+        while True:
+            try:
+                while self.process_pending():
+                    pass
+            except Exception as e:
+                logger.error(f"云存储复制失败: {e}")
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def process_pending(self) -> int:
+        """处理一批到期的复制任务，返回处理的任务数"""
+        now = time.time()
+        claims = []
+        for task_id in self.queue.pending():
+            if len(claims) >= self.batch_size:
+                break
+            if self._retry_at.get(task_id, 0) > now:
+                continue
+            claim = self.queue.claim(task_id)
+            if claim:
+                claims.append(claim)
+        if not claims:
+            return 0
+
+        try:
+            uploads = []
+            for fd, task in claims:
+                local_path = os.path.join(self.local.upload_folder, task['filename'])
+                if os.path.exists(local_path):
+                    uploads.append((task, local_path))
+                else:
+                    # 本地文件已删除（作品已删除），放弃复制
+                    self._finish(task['id'])
+            # 同一批图片并发上传
+            cloud_urls = self.remote.upload_files([(path, task['filename']) for task, path in uploads])
+            for (task, _), cloud_url in zip(uploads, cloud_urls):
+                if cloud_url:
+                    self._complete(task, cloud_url)
+                else:
+                    self._retry_later(task['id'])
+        finally:
+            for fd, _ in claims:
+                os.close(fd)
+        return len(claims)
+
+    def _complete(self, task: dict, cloud_url: str) -> None:
+        filename = task['filename']
+        try:
+            keep = self.on_replicated(filename, self.local_url(filename), cloud_url, task['meta']) \
+                if self.on_replicated else True
+        except Exception as e:
+            logger.error(f"更新图片地址失败: {filename}, {e}")
+            self._retry_later(task['id'])
+            return
+        if keep is False:
+            logger.info(f"图片已不再使用，删除云端副本: {filename}")
+            # 删除失败只留下一个无人引用的云端副本；不能让任务留在队列中，否则每次重试都会再上传一次
+            try:
+                self.remote.delete_image(cloud_url)
+            except Exception as e:
+                logger.error(f"删除云端副本失败: {cloud_url}, {e}")
+        self._finish(task['id'])
+        self.replicated += 1
+        logger.info(f"图片已复制到云存储: {filename}")
+
+    def _finish(self, task_id: str) -> None:
+        self.queue.remove(task_id)
+        self._failures.pop(task_id, None)
+        self._retry_at.pop(task_id, None)
+
+    def _retry_later(self, task_id: str) -> None:
+        failures = self._failures.get(task_id, 0) + 1
+        self._failures[task_id] = failures
+        self._retry_at[task_id] = time.time() + min(self.poll_interval * (2 ** (failures - 1)), self.max_backoff)
+        self.failed_attempts += 1
+        logger.warning(f"图片复制到云存储失败，稍后重试: {task_id}（第 {failures} 次）")
+
+    def stats(self) -> dict:
+        """复制队列统计"""
+        return {
+            'pending': len(self.queue.pending()),
+            'replicated': self.replicated,
+            'failed_attempts': self.failed_attempts
+        }
+
+def cloud_storage_configured() -> bool:
+    """是否配置了云存储服务"""
+    return bool(os.environ.get('IMGBB_API_KEY') or os.environ.get('CLOUDINARY_CLOUD_NAME'))
+
 # 创建存储实例
 def create_storage() -> CloudStorage:
     """创建存储实例，按优先级选择"""
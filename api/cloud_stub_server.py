@@ -0,0 +1,106 @@
+# api/cloud_stub_server.py
+"""
+本地云存储替身服务器 - 模拟 ImgBB / Cloudinary 的上传接口，用于本地开发和测试
+可模拟网络延迟和间歇性失败（返回 503），用于验证并发上传和重试
+
+用法:
+    python cloud_stub_server.py --port 8090 --delay 0.2 --fail-every 3
+    IMGBB_API_KEY=test IMGBB_API_URL=http://localhost:8090/1/upload python app.py
+    CLOUDINARY_CLOUD_NAME=demo CLOUDINARY_API_KEY=k CLOUDINARY_API_SECRET=s \
+        CLOUDINARY_API_URL=http://localhost:8090 python app.py
+"""
+
+import re
+import time
+import json
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FILENAME_PATTERN = re.compile(rb'filename="([^"]*)"')
+
+
+class StubState:
+    """服务器状态：已接收的图片和请求计数"""
+
+    def __init__(self, delay: float = 0.0, fail_every: int = 0):
+        self.delay = delay
+        self.fail_every = fail_every
+        self.images = {}
+        self.requests = 0
+        self.lock = threading.Lock()
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # 支持长连接
+    state = StubState()
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length)
+        state = self.state
+        with state.lock:
+            state.requests += 1
+            count = state.requests
+        if state.delay:
+            time.sleep(state.delay)
+        if state.fail_every and count % state.fail_every == 0:
+            self._send_json(503, {'error': {'message': 'stub failure'}}, {'Retry-After': '0'})
+            return
+
+        match = FILENAME_PATTERN.search(body)
+        filename = match.group(1).decode('utf-8') if match else f'{count}.bin'
+        with state.lock:
+            state.images[filename] = body
+        url = f'http://{self.headers.get("Host")}/i/{filename}'
+
+        if self.path.startswith('/1/upload'):
+            self._send_json(200, {'success': True, 'data': {'url': url}})
+        elif re.match(r'^/v1_1/[^/]+/image/upload', self.path):
+            self._send_json(200, {'secure_url': url})
+        else:
+            self._send_json(404, {'error': {'message': 'not found'}})
+
+    def do_GET(self):
+        if self.path == '/stats':
+            with self.state.lock:
+                self._send_json(200, {'requests': self.state.requests, 'images': len(self.state.images)})
+        elif self.path.startswith('/i/') and self.path[3:] in self.state.images:
+            self._send_json(200, {'filename': self.path[3:]})
+        else:
+            self._send_json(404, {'error': {'message': 'not found'}})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(host='localhost', port=0, delay=0.0, fail_every=0):
+    """在后台线程启动服务器（port=0 时自动分配端口），返回 server"""
+    handler = type('StubHandler', (Handler,), {'state': StubState(delay, fail_every)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='本地云存储替身服务器')
+    parser.add_argument('--port', type=int, default=8090)
+    parser.add_argument('--delay', type=float, default=0.0, help='每个请求的模拟延迟（秒）')
+    parser.add_argument('--fail-every', type=int, default=0, help='每 N 个请求返回一次 503')
+    args = parser.parse_args()
+
+    Handler.state = StubState(args.delay, args.fail_every)
+    server = ThreadingHTTPServer(('localhost', args.port), Handler)
+    print(f"云存储替身服务器运行在 http://localhost:{args.port}")
+    server.serve_forever()
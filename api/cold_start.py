@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+冷启动模块 - 无服务器部署（Vercel）时每个新实例的 /tmp 都是空的，作品数据需要从持久存储恢复
+
+- 快照格式: 魔数 + 编码方式 + zlib 压缩的作品列表（安装了 msgpack 时使用 msgpack，否则使用 JSON）
+- SnapshotStore: 保存快照的持久存储（本地目录，或支持 GET/PUT 的 HTTP 对象存储）
+- hydrate: 本地没有作品数据时从快照恢复
+- SnapshotSync: 修改请求完成后把最新数据写回快照
+- StartupTimer: 记录导入、初始化、恢复数据各阶段的耗时，按部署汇报冷启动时间
+"""
+
+import os
+import time
+import zlib
+import threading
+from typing import Any, Dict, List, Optional
+import logging
+
+import json_codec
+from write_coordinator import atomic_write
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_MAGIC = b'WSNP1'
+# 快照在修改请求的处理过程中写入，使用最快的压缩级别
+SNAPSHOT_COMPRESS_LEVEL = 1
+
+
+class SnapshotError(ValueError):
+    """快照数据损坏或格式不支持"""
+
+
+def encode_snapshot(works: List[dict]) -> bytes:
+    if msgpack is not None:
+        codec, payload = b'm', msgpack.packb(works, use_bin_type=True)
+    else:
+        codec, payload = b'j', json_codec.dumps(works)
+    return SNAPSHOT_MAGIC + codec + zlib.compress(payload, SNAPSHOT_COMPRESS_LEVEL)
+
+
+def decode_snapshot(data: bytes) -> List[dict]:
+    header = len(SNAPSHOT_MAGIC)
+    if data[:header] != SNAPSHOT_MAGIC:
+        raise SnapshotError("不是作品快照")
+    codec = data[header:header + 1]
+    try:
+        payload = zlib.decompress(data[header + 1:])
+    except zlib.error as e:
+        raise SnapshotError(f"快照解压失败: {e}")
+    if codec == b'm':
+        if msgpack is None:
+            raise SnapshotError("快照使用 msgpack 编码，但没有安装 msgpack")
+        return msgpack.unpackb(payload, raw=False)
+    if codec == b'j':
+        return json_codec.loads(payload)
+    raise SnapshotError(f"未知的快照编码: {codec!r}")
+
+
+class SnapshotStore:
+    """快照的持久存储"""
+
+    def read(self) -> Optional[bytes]:
+        """读取快照，不存在时返回 None"""
+        raise NotImplementedError
+
+    def write(self, data: bytes) -> None:
+        raise NotImplementedError
+
+
+class DirectorySnapshotStore(SnapshotStore):
+    """保存在本地目录（挂载的持久卷，或本地开发时代替对象存储）"""
+
+    def __init__(self, directory: str, name: str = 'works.snapshot'):
+        self.path = os.path.join(directory, name)
+
+    def read(self) -> Optional[bytes]:
+        try:
+            with open(self.path, 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def write(self, data: bytes) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        atomic_write(self.path, data)
+
+    def __repr__(self) -> str:
+        return f'DirectorySnapshotStore({self.path})'
+
+
+class HTTPSnapshotStore(SnapshotStore):
+    """HTTP 对象存储：GET 读取、PUT 写入同一个地址（如对象存储的预签名地址或简单的文件服务）"""
+
+    def __init__(self, url: str, token: Optional[str] = None, timeout: float = 10):
+        self.url = url
+        self.token = token
+        self.timeout = timeout
+
+    def _request(self, method: str, data: Optional[bytes] = None):
+        # 使用标准库，避免为一次请求导入 requests
+        import urllib.request
+        request = urllib.request.Request(self.url, data=data, method=method)
+        if self.token:
+            request.add_header('Authorization', f'Bearer {self.token}')
+        if data is not None:
+            request.add_header('Content-Type', 'application/octet-stream')
+        return urllib.request.urlopen(request, timeout=self.timeout)
+
+    def read(self) -> Optional[bytes]:
+        import urllib.error
+        try:
+            with self._request('GET') as response:
+                return response.read()
+        except urllib.error.HTTPError as e:
+            if e.code == 404:
+                return None
+            raise
+
+    def write(self, data: bytes) -> None:
+        with self._request('PUT', data):
+            pass
+
+    def __repr__(self) -> str:
+        return f'HTTPSnapshotStore({self.url})'
+
+
+def create_snapshot_store() -> Optional[SnapshotStore]:
+    """根据环境变量创建快照存储：SNAPSHOT_URL（HTTP）优先，其次 SNAPSHOT_DIR（本地目录），都未设置时返回 None"""
+    url = os.environ.get('SNAPSHOT_URL')
+    if url:
+        return HTTPSnapshotStore(url, os.environ.get('SNAPSHOT_TOKEN'))
+    directory = os.environ.get('SNAPSHOT_DIR')
+    if directory:
+        return DirectorySnapshotStore(directory)
+    return None
+
+
+def hydrate(works_store, snapshot_store: SnapshotStore) -> Optional[Dict[str, Any]]:
+    """本地没有作品数据时从快照恢复，返回恢复的作品数、快照大小和耗时；没有需要恢复的数据时返回 None
+
+    快照存在但读取或解码失败时抛出异常（调用方不应再写回快照，否则会用空数据覆盖）
+    """
+    if not works_store.is_empty():
+        return None
+    start = time.perf_counter()
+    data = snapshot_store.read()
+    if data is None:
+        logger.info(f"没有可恢复的作品快照: {snapshot_store!r}")
+        return None
+    works = decode_snapshot(data)
+    works_store.save_works(works)
+    return {'works': len(works), 'bytes': len(data),
+            'seconds': round(time.perf_counter() - start, 4)}
+
+
+class SnapshotSync:
+    """数据变化后把全部作品写回快照
+
+    无服务器实例在返回响应后可能被冻结或回收，不能依赖后台线程，所以在修改请求结束时同步写入。
+    min_interval: 两次写入的最小间隔（秒），为 0 时每次修改都写入；大于 0 时间隔内的修改可能随实例回收而丢失
+    """
+
+    def __init__(self, works_store, snapshot_store: SnapshotStore, min_interval: float = 0.0):
+        self.works_store = works_store
+        self.snapshot_store = snapshot_store
+        self.min_interval = min_interval
+        self._saved_version = works_store.version()
+        self._last_save = 0.0
+        self._lock = threading.Lock()
+        self.saves = 0
+        self.failures = 0
+
+    def maybe_save(self) -> bool:
+        """数据有变化且距上次写入超过 min_interval 时写入快照，返回是否写入"""
+        if self.works_store.version() == self._saved_version:
+            return False
+        if time.monotonic() - self._last_save < self.min_interval:
+            return False
+        with self._lock:
+            # 先取版本再导出：导出期间又有修改时，下次仍会再写一次
+            version = self.works_store.version()
+            if version == self._saved_version:
+                return False
+            try:
+                data = encode_snapshot(self.works_store.export_works())
+                self.snapshot_store.write(data)
+            except Exception as e:
+                self.failures += 1
+                logger.error(f"写入作品快照失败: {e}")
+                return False
+            self._saved_version = version
+            self._last_save = time.monotonic()
+            self.saves += 1
+            logger.debug(f"作品快照已写入，{len(data)} 字节")
+            return True
+
+    def stats(self) -> dict:
+        return {'store': repr(self.snapshot_store), 'saves': self.saves, 'failures': self.failures}
+
+
+def deploy_id() -> str:
+    """当前部署的标识（Vercel 部署 ID 或提交哈希），用于按部署比较冷启动时间"""
+    return (os.environ.get('VERCEL_DEPLOYMENT_ID') or os.environ.get('VERCEL_GIT_COMMIT_SHA', '')[:12]
+            or 'local')
+
+
+class StartupTimer:
+    """按阶段记录启动耗时：mark(阶段名) 记录距上一次 mark 的时间"""
+
+    def __init__(self, start: Optional[float] = None):
+        self.start = start if start is not None else time.perf_counter()
+        self._last = self.start
+        self.phases: Dict[str, float] = {}
+        self.details: Dict[str, Any] = {}
+
+    def mark(self, phase: str) -> float:
+        now = time.perf_counter()
+        seconds = now - self._last
+        self.phases[phase] = seconds
+        self._last = now
+        return seconds
+
+    @property
+    def total(self) -> float:
+        return self._last - self.start
+
+    def report(self) -> dict:
+        return {
+            'deploy': deploy_id(),
+            'total_ms': round(self.total * 1000, 1),
+            'phases_ms': {phase: round(seconds * 1000, 1) for phase, seconds in self.phases.items()},
+            **self.details,
+        }
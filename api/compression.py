@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+响应压缩 - 根据请求的 Accept-Encoding 协商 br/gzip 编码
+
+安装了 brotli 时优先使用 br（JSON 通常比 gzip 再小 15% ~ 20%），否则使用 gzip。
+压缩后的表示使用不同的 ETag（在原 ETag 后加上 -<编码>），客户端带回任一形式都视为匹配
+"""
+
+import gzip
+from typing import Optional
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# 服务端支持的编码，按优先级排列
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+# 压缩级别：作品数据每次修改后列表都要重新压缩一次，选择速度和压缩率折中的级别
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def negotiate(accept_encodings) -> Optional[str]:
+    """从 werkzeug 解析的 Accept-Encoding 中选出客户端接受、质量值最高的编码，都不接受时返回 None"""
+    best, best_quality = None, 0
+    for encoding in ENCODINGS:
+        quality = accept_encodings[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == 'gzip':
+        # 固定 mtime，相同内容在各进程中压缩结果相同
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    raise ValueError(f"不支持的压缩编码: {encoding}")
+
+
+def encoded_etag(etag: str, encoding: Optional[str]) -> str:
+    """压缩后表示的 ETag"""
+    return f'{etag}-{encoding}' if encoding else etag
+
+
+def etag_matches(if_none_match, etag: str) -> bool:
+    """If-None-Match 是否包含该 ETag 或其任一压缩表示的 ETag"""
+    return if_none_match.contains(etag) or any(
+        if_none_match.contains(encoded_etag(etag, encoding)) for encoding in ENCODINGS)
@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+实时事件推送模块 - 通过 Server-Sent Events 推送新作品、点赞、评论、置顶、删除等增量事件
+
+- EventLog: 跨进程共享的事件日志文件（每行一个事件），同时作为断线续传（Last-Event-ID）的缓冲区
+- EventStreamServer: 基于 asyncio 的 SSE 服务器，一个事件循环线程服务所有长连接（不为每个客户端占用线程）；
+  多个 worker 进程通过 SO_REUSEPORT 监听同一端口，各自跟踪事件日志，客户端连到任意进程都能收到全部事件
+"""
+
+import os
+import json
+import time
+import socket
+import asyncio
+import threading
+from typing import Any, List, Optional, Set, Tuple
+from urllib.parse import parse_qs, urlsplit
+import logging
+
+from write_coordinator import FileLock, atomic_write
+
+logger = logging.getLogger(__name__)
+
+
+def format_event_id(inode: int, offset: int) -> str:
+    """事件ID: 日志文件 inode 和事件在文件中的偏移量（日志轮转后 inode 变化，旧ID不会被误用）"""
+    return f'{inode:x}-{offset:x}'
+
+
+def parse_event_id(event_id: str) -> Optional[Tuple[int, int]]:
+    try:
+        inode, offset = event_id.split('-')
+        return int(inode, 16), int(offset, 16)
+    except (AttributeError, ValueError):
+        return None
+
+
+def format_frame(event_id: str, event_type: str, data: Any) -> bytes:
+    """生成一条 SSE 消息"""
+    payload = json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+    return f'id: {event_id}\nevent: {event_type}\ndata: {payload}\n\n'.encode('utf-8')
+
+
+# 续传位置已不在日志中（日志已轮转或ID无效）时发送，客户端应重新获取作品列表
+RESET_FRAME = b'event: reset\ndata: {}\n\n'
+HEARTBEAT_FRAME = b': ping\n\n'
+
+
+class EventLog:
+    """事件日志文件：追加时持有进程间文件锁，超过 max_bytes 后清空（轮转）"""
+
+    def __init__(self, path: str, max_bytes: int = 4 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.lock = FileLock(path + '.lock')
+
+    def append(self, event_type: str, data: Any) -> str:
+        """追加一个事件，返回事件ID"""
+        line = json.dumps({'type': event_type, 'data': data, 'ts': time.time()},
+                          ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+        with self.lock:
+            try:
+                if os.path.getsize(self.path) > self.max_bytes:
+                    atomic_write(self.path, b'')
+            except FileNotFoundError:
+                pass
+            with open(self.path, 'ab') as f:
+                offset = f.tell()
+                f.write(line)
+                inode = os.fstat(f.fileno()).st_ino
+        return format_event_id(inode, offset)
+
+
+class _Client:
+    """一个 SSE 连接：待发送的消息队列"""
+
+    def __init__(self, writer: asyncio.StreamWriter, max_queue: int):
+        self.writer = writer
+        self.queue: asyncio.Queue = asyncio.Queue(max_queue)
+
+
+class EventStreamServer:
+    """SSE 服务器
+
+    GET /api/events：先按 Last-Event-ID 请求头（或 last_event_id 参数）补发断线期间的事件，再持续推送新事件；
+    客户端读取过慢、队列积压超过 max_queue 时断开连接，由客户端带上 Last-Event-ID 重连续传
+    """
+
+    def __init__(self, log: EventLog, host: str = '0.0.0.0', port: int = 8001,
+                 poll_interval: float = 0.5, heartbeat: float = 15.0, max_queue: int = 256):
+        self.log = log
+        self.host = host
+        self.port = port
+        self.poll_interval = poll_interval
+        self.heartbeat = heartbeat
+        self.max_queue = max_queue
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._clients: Set[_Client] = set()
+        self._wake: Optional[asyncio.Event] = None
+        self._ready = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # 当前跟踪的日志文件及读取位置
+        self._file = None
+        self._inode: Optional[int] = None
+        self._offset = 0
+        self.events_sent = 0
+        self.clients_dropped = 0
+
+    # ---- 生命周期 ----
+
+    def start(self) -> None:
+        """在后台线程中启动事件循环（每个进程只启动一次）"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='event-stream', daemon=True)
+        self._thread.start()
+        self._ready.wait(5)
+
+    def _run(self) -> None:
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self._serve())
+        except Exception as e:
+            logger.error(f"事件推送服务器已停止: {e}")
+        finally:
+            self._ready.set()
+
+    def _listen_socket(self) -> socket.socket:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if hasattr(socket, 'SO_REUSEPORT'):
+            # 多个 worker 进程共享端口，由内核分配连接
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(1024)
+        sock.setblocking(False)
+        return sock
+
+    async def _serve(self) -> None:
+        self._wake = asyncio.Event()
+        self._open_log(from_end=True)
+        server = await asyncio.start_server(self._handle, sock=self._listen_socket())
+        self.port = server.sockets[0].getsockname()[1]
+        logger.info(f"事件推送服务器运行在 {self.host}:{self.port}")
+        self._ready.set()
+        async with server:
+            await self._follow_log()
+
+    def notify(self) -> None:
+        """本进程追加了事件，立即唤醒事件循环（其他进程追加的事件由轮询发现）"""
+        if self.loop is not None and self._wake is not None:
+            self.loop.call_soon_threadsafe(self._wake.set)
+
+    def stats(self) -> dict:
+        return {
+            'port': self.port,
+            'clients': len(self._clients),
+            'events_sent': self.events_sent,
+            'clients_dropped': self.clients_dropped
+        }
+
+    # ---- 跟踪事件日志 ----
+
+    def _open_log(self, from_end: bool) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        try:
+            self._file = open(self.log.path, 'rb')
+        except FileNotFoundError:
+            self._inode, self._offset = None, 0
+            return
+        self._inode = os.fstat(self._file.fileno()).st_ino
+        self._offset = self._file.seek(0, os.SEEK_END) if from_end else 0
+
+    async def _follow_log(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                self._read_new_events()
+            except Exception as e:
+                logger.error(f"读取事件日志失败: {e}")
+
+    def _read_new_events(self) -> None:
+        # 先检查是否轮转再读取：轮转在文件锁内完成，发现轮转时旧文件已不会再写入
+        try:
+            inode = os.stat(self.log.path).st_ino
+        except FileNotFoundError:
+            inode = self._inode
+        if self._file is not None:
+            for frame in self._read_frames(self._file, self._inode):
+                self._broadcast(frame)
+            self._offset = self._file.tell()
+        if inode != self._inode:
+            # 旧文件已读完，从新文件开头继续
+            self._open_log(from_end=False)
+            self._read_new_events()
+
+    @staticmethod
+    def _read_frames(f, inode: int) -> List[bytes]:
+        """从文件当前位置读取完整的事件行（不完整的最后一行留到下次读取）"""
+        frames = []
+        while True:
+            offset = f.tell()
+            line = f.readline()
+            if not line.endswith(b'\n'):
+                f.seek(offset)
+                return frames
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue
+            frames.append(format_frame(format_event_id(inode, offset), event['type'], event['data']))
+
+    def _backlog(self, last_event_id: Optional[str]) -> List[bytes]:
+        """断线期间错过的事件；续传位置已不在当前日志中时返回 reset"""
+        if not last_event_id:
+            return []
+        parsed = parse_event_id(last_event_id)
+        if parsed is None or self._file is None or parsed[0] != self._inode:
+            return [RESET_FRAME]
+        start = parsed[1]
+        if start >= self._offset:
+            # 其他进程已先推送了本进程尚未读到的事件，之后会照常广播
+            return []
+        # pread 不改变跟踪位置
+        data = os.pread(self._file.fileno(), self._offset - start, start)
+        frames = []
+        offset = start
+        for line in data.splitlines(keepends=True):
+            if offset > start:  # 第一行是客户端已收到的最后一个事件
+                try:
+                    event = json.loads(line)
+                    frames.append(format_frame(format_event_id(self._inode, offset), event['type'], event['data']))
+                except ValueError:
+                    pass
+            offset += len(line)
+        return frames
+
+    def _broadcast(self, frame: bytes) -> None:
+        self.events_sent += 1
+        for client in list(self._clients):
+            try:
+                client.queue.put_nowait(frame)
+            except asyncio.QueueFull:
+                # 客户端读取过慢，断开后由客户端续传
+                self._clients.discard(client)
+                self.clients_dropped += 1
+                client.writer.transport.abort()
+
+    # ---- HTTP ----
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        client = None
+        try:
+            try:
+                head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), 10)
+            except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                return
+            lines = head.decode('latin-1').split('\r\n')
+            method, target, _ = (lines[0].split(' ') + ['', '', ''])[:3]
+            headers = {}
+            for line in lines[1:]:
+                name, sep, value = line.partition(':')
+                if sep:
+                    headers[name.strip().lower()] = value.strip()
+            url = urlsplit(target)
+
+            if method != 'GET' or url.path != '/api/events':
+                body = json.dumps({'error': '不存在'}).encode('utf-8')
+                writer.write(b'HTTP/1.1 404 Not Found\r\nContent-Type: application/json\r\n'
+                             b'Content-Length: %d\r\nConnection: close\r\n\r\n%s' % (len(body), body))
+                await writer.drain()
+                return
+
+            last_event_id = headers.get('last-event-id') or parse_qs(url.query).get('last_event_id', [None])[0]
+            writer.write(b'HTTP/1.1 200 OK\r\n'
+                         b'Content-Type: text/event-stream; charset=utf-8\r\n'
+                         b'Cache-Control: no-cache\r\n'
+                         b'Connection: keep-alive\r\n'
+                         b'Access-Control-Allow-Origin: *\r\n'
+                         b'X-Accel-Buffering: no\r\n\r\n'
+                         b'retry: 3000\n\n')
+            # 补发与注册之间没有 await，不会漏掉事件
+            for frame in self._backlog(last_event_id):
+                writer.write(frame)
+            client = _Client(writer, self.max_queue)
+            self._clients.add(client)
+            await writer.drain()
+
+            while True:
+                try:
+                    frame = await asyncio.wait_for(client.queue.get(), self.heartbeat)
+                except asyncio.TimeoutError:
+                    frame = HEARTBEAT_FRAME
+                writer.write(frame)
+                await writer.drain()
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            if client is not None:
+                self._clients.discard(client)
+            writer.close()
+
+
+class EventStream:
+    """应用使用的事件发布接口：写入事件日志并通知本进程的 SSE 服务器"""
+
+    def __init__(self, log: EventLog, server: EventStreamServer):
+        self.log = log
+        self.server = server
+
+    def publish(self, event_type: str, data: Any) -> Optional[str]:
+        """发布事件，失败时只记录日志（不影响请求本身）"""
+        try:
+            event_id = self.log.append(event_type, data)
+        except Exception as e:
+            logger.error(f"发布事件失败: {event_type}, {e}")
+            return None
+        self.server.notify()
+        return event_id
+
+    def stats(self) -> dict:
+        return self.server.stats()
+
+
+def create_event_stream(log_path: str, start: bool = True) -> Optional[EventStream]:
+    """设置了 EVENTS_PORT 时创建并启动事件推送，否则返回 None
+
+    start=False 时只创建不启动（预加载后 fork 的 worker 进程中再调用 server.start()）
+    """
+    port = os.environ.get('EVENTS_PORT')
+    if not port:
+        return None
+    log = EventLog(log_path, max_bytes=int(os.environ.get('EVENTS_LOG_MAX_BYTES', str(4 * 1024 * 1024))))
+    server = EventStreamServer(log, host=os.environ.get('EVENTS_HOST', '0.0.0.0'), port=int(port))
+    if start:
+        server.start()
+    return EventStream(log, server)
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+gunicorn 配置 - 生产环境多进程部署：gunicorn -c gunicorn.conf.py app:app
+
+- 进程模型: WEB_CONCURRENCY 个 worker 进程（默认 CPU 核数 * 2 + 1），每个进程 GUNICORN_THREADS 个线程（gthread）
+- 预加载: 主进程先导入应用并加载作品数据、建立索引和列表缓存，再 fork 出 worker，
+  各 worker 通过写时复制共享这些内存，启动时不必各自重新加载（GUNICORN_PRELOAD=0 关闭）
+- 多进程共享状态:
+  - json 存储: works.json 快照 + 修改日志，写入时加文件锁；各 worker 读取前检查日志，只回放其他进程新追加的记录
+  - sqlite 存储: WAL 模式，多个进程可以同时读，写入由 SQLite 串行化
+  - 运行指标: 设置 METRICS_DIR 后各进程把数据写入共享目录，/api/metrics 汇总所有进程
+  - 实时事件: 事件写入共享的事件文件，每个 worker 各自推送
+- 日志: LOG_LEVEL / LOG_FORMAT 控制应用日志；访问日志默认关闭（ACCESS_LOG=1 开启，输出到标准输出）
+"""
+
+import os
+import gc
+import multiprocessing
+
+bind = os.environ.get('BIND', f"{os.environ.get('HOST', '0.0.0.0')}:{os.environ.get('PORT', '8000')}")
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', '4'))
+worker_class = 'gthread'
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') != '0'
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '60'))
+graceful_timeout = 30
+keepalive = 5
+# 定期重启 worker，避免内存碎片长期累积（随机抖动避免所有 worker 同时重启）
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', '10000'))
+max_requests_jitter = max_requests // 10
+
+loglevel = os.environ.get('LOG_LEVEL', 'info').lower()
+accesslog = '-' if os.environ.get('ACCESS_LOG') == '1' else None
+
+if preload_app:
+    # 告诉应用由主进程预加载：事件推送等后台线程留到 worker 中启动
+    os.environ['APP_PRELOAD'] = '1'
+
+
+def when_ready(server):
+    """主进程开始 fork worker 之前：预加载数据，并把已有对象移出 GC 跟踪，避免 GC 扫描时触发写时复制"""
+    if not server.cfg.preload_app:
+        return
+    from app import warm_up
+    warm_up()
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    """worker 进程中：重建线程和数据库连接（未预加载时应用在 worker 中导入，不需要处理）"""
+    if not server.cfg.preload_app:
+        return
+    from app import after_fork
+    after_fork()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+图片多尺寸处理模块 - 上传后在后台线程生成缩略图、中图、大图（WebP/JPEG）
+列表页使用缩略图/中图，避免每张卡片都下载原图
+"""
+
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 各尺寸的最长边（像素）
+VARIANT_SIZES = {
+    'thumb': 320,
+    'medium': 960,
+    'full': 2048,
+}
+
+# 输出格式：扩展名 -> (Pillow格式, 保存参数)
+VARIANT_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+}
+
+
+class ImageVariantPipeline:
+    """图片多尺寸生成流水线"""
+
+    def __init__(self, upload_folder: str, max_workers: int = 2):
+        self.upload_folder = upload_folder
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='image-variants')
+
+    @staticmethod
+    def variant_filename(filename: str, size: str, ext: str) -> str:
+        """变体文件名，如 {work_id}_0_thumb.webp"""
+        stem = os.path.splitext(filename)[0]
+        return f"{stem}_{size}.{ext}"
+
+    @staticmethod
+    def variant_urls(image_url: str) -> Dict[str, str]:
+        """图片各尺寸的访问地址（变体生成前回退为原图）"""
+        return {size: f"{image_url}?size={size}" for size in VARIANT_SIZES}
+
+    def submit(self, filenames: List[str]) -> Future:
+        """提交后台生成任务，不阻塞上传请求"""
+        return self._executor.submit(self._generate_all, list(filenames))
+
+    def _generate_all(self, filenames: List[str]) -> None:
+        for filename in filenames:
+            try:
+                self.generate(filename)
+            except Exception as e:
+                logger.error(f"生成图片变体失败: {filename}, {e}")
+
+    def generate(self, filename: str) -> List[str]:
+        """为一张原图生成所有尺寸和格式的变体，返回生成的文件名"""
+        # Pillow 导入较慢，第一次生成变体时才导入
+        from PIL import Image, ImageOps
+
+        source_path = os.path.join(self.upload_folder, filename)
+        created = []
+        if not os.path.exists(source_path):
+            # 作品可能在生成前已被删除
+            logger.info(f"原图不存在，跳过变体生成: {filename}")
+            return created
+        with Image.open(source_path) as img:
+            if getattr(img, 'is_animated', False):
+                # 动图保留原图，避免丢失动画
+                logger.info(f"动图跳过变体生成: {filename}")
+                return created
+
+            # 按 EXIF 方向旋转；有透明通道的统一为 RGBA（WebP 保留透明），其余统一为 RGB
+            img = ImageOps.exif_transpose(img)
+            if img.mode in ('RGBA', 'LA', 'PA') or (img.mode == 'P' and 'transparency' in img.info):
+                img = img.convert('RGBA')
+            elif img.mode not in ('RGB', 'L'):
+                img = img.convert('RGB')
+
+            # 从大到小依次缩放，减少重复计算
+            current = img
+            for size, max_side in sorted(VARIANT_SIZES.items(), key=lambda item: -item[1]):
+                if max(current.size) > max_side:
+                    current = current.copy()
+                    current.thumbnail((max_side, max_side), Image.LANCZOS)
+                for ext, (fmt, options) in VARIANT_FORMATS.items():
+                    variant = self.variant_filename(filename, size, ext)
+                    tmp_path = os.path.join(self.upload_folder, variant + '.tmp')
+                    output = current
+                    if fmt == 'JPEG' and current.mode == 'RGBA':
+                        # JPEG 不支持透明，合成到白色背景上（直接转 RGB 透明部分会变黑）
+                        output = Image.new('RGB', current.size, (255, 255, 255))
+                        output.paste(current, mask=current.getchannel('A'))
+                    output.save(tmp_path, fmt, **options)
+                    # 写完再改名，避免读到半个文件
+                    os.replace(tmp_path, os.path.join(self.upload_folder, variant))
+                    created.append(variant)
+
+        if not os.path.exists(source_path):
+            # 生成期间作品被删除，清理刚生成的变体
+            self.delete_variants(filename)
+            return []
+
+        logger.info(f"图片变体生成完成: {filename}, 共 {len(created)} 个")
+        return created
+
+    def resolve(self, filename: str, size: str, accept_webp: bool) -> Optional[str]:
+        """返回已生成的变体文件名，尚未生成时返回 None"""
+        if size not in VARIANT_SIZES:
+            return None
+        for ext in (('webp', 'jpg') if accept_webp else ('jpg',)):
+            variant = self.variant_filename(filename, size, ext)
+            if os.path.exists(os.path.join(self.upload_folder, variant)):
+                return variant
+        return None
+
+    def delete_variants(self, filename: str) -> None:
+        """删除一张原图的所有变体"""
+        for size in VARIANT_SIZES:
+            for ext in VARIANT_FORMATS:
+                path = os.path.join(self.upload_folder, self.variant_filename(filename, size, ext))
+                try:
+                    if os.path.exists(path):
+                        os.remove(path)
+                except OSError as e:
+                    logger.warning(f"删除图片变体失败: {path}, {e}")
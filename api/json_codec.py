@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+JSON 编解码 - 安装了 orjson 时使用 orjson（序列化快数倍），否则使用标准库 json
+
+- dumps / loads: 持久化数据（works.json、修改日志）的读写，输出 UTF-8 编码的字节串
+- FastJSONProvider: Flask 的 JSON 响应（jsonify），中文直接输出 UTF-8 而不是 \\uXXXX 转义
+"""
+
+import json
+from typing import Any
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(obj: Any, pretty: bool = False) -> bytes:
+    """紧凑格式（无多余空格）；pretty=True 时缩进 2 格"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if pretty else 0)
+    if pretty:
+        return json.dumps(obj, ensure_ascii=False, indent=2).encode('utf-8')
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def loads(data) -> Any:
+    """data 可以是 str 或 bytes"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """jsonify 使用的序列化：与默认实现相同（键排序、紧凑格式），只是不转义非 ASCII 字符"""
+
+    ensure_ascii = False
+
+    def _orjson_option(self) -> int:
+        return orjson.OPT_SORT_KEYS if self.sort_keys else 0
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        # 调用方指定了缩进等参数时交给标准库
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self._orjson_option()).decode('utf-8')
+
+    def loads(self, s, **kwargs: Any) -> Any:
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any):
+        # 调试模式下缩进输出
+        if orjson is None or self.compact is False or (self.compact is None and self._app.debug):
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=self.default, option=self._orjson_option() | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+排行榜模块 - 增量维护的点赞排行（全部时间 / 最近一周 / 最近一天）
+点赞、取消点赞、删除作品时只调整受影响的计数，取前 K 名的开销为 O(K)，与作品总数无关
+"""
+
+import heapq
+import time
+from bisect import bisect_left, insort
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+# 时间窗口 -> 秒数（None 表示全部时间）
+LEADERBOARD_WINDOWS = {
+    'day': 24 * 3600,
+    'week': 7 * 24 * 3600,
+    'all': None,
+}
+
+
+def parse_timestamp(ts: str) -> Optional[float]:
+    """ISO 格式时间 -> Unix 时间戳；旧数据没有点赞时间时返回 None"""
+    if not ts:
+        return None
+    try:
+        return datetime.fromisoformat(ts).timestamp()
+    except ValueError:
+        return None
+
+
+class RankedCounter:
+    """按计数分桶的排名
+
+    计数相同的作品在同一个桶中，按到达该计数的先后排序；
+    非空桶的计数保存在有序列表中，取前 K 名时从最大的桶开始遍历
+    """
+
+    def __init__(self):
+        self.counts: Dict[str, int] = {}
+        self._buckets: Dict[int, Dict[str, None]] = {}
+        self._levels: List[int] = []
+
+    def _leave(self, key: str, count: int) -> None:
+        bucket = self._buckets[count]
+        del bucket[key]
+        if not bucket:
+            del self._buckets[count]
+            del self._levels[bisect_left(self._levels, count)]
+
+    def _enter(self, key: str, count: int) -> None:
+        bucket = self._buckets.get(count)
+        if bucket is None:
+            bucket = self._buckets[count] = {}
+            insort(self._levels, count)
+        bucket[key] = None
+
+    def set(self, key: str, count: int) -> None:
+        old = self.counts.get(key)
+        if old == count:
+            return
+        if old is not None:
+            self._leave(key, old)
+        self.counts[key] = count
+        self._enter(key, count)
+
+    def add(self, key: str, delta: int) -> None:
+        if key in self.counts:
+            self.set(key, self.counts[key] + delta)
+
+    def remove(self, key: str) -> None:
+        count = self.counts.pop(key, None)
+        if count is not None:
+            self._leave(key, count)
+
+    def top(self, k: int) -> List[Tuple[str, int]]:
+        result = []
+        for count in reversed(self._levels):
+            if len(result) >= k:
+                break
+            for key in self._buckets[count]:
+                result.append((key, count))
+                if len(result) >= k:
+                    break
+        return result
+
+
+class _WindowCounter:
+    """最近 seconds 秒内的点赞计数；过期的点赞在查询时从最小堆中移除"""
+
+    def __init__(self, seconds: int):
+        self.seconds = seconds
+        self.ranked = RankedCounter()
+        self._active: Dict[Tuple[str, str], float] = {}
+        self._heap: List[Tuple[float, str, str]] = []
+
+    def like(self, work_id: str, user_id: str, ts: float, now: float) -> None:
+        if ts < now - self.seconds:
+            return
+        self._active[(work_id, user_id)] = ts
+        heapq.heappush(self._heap, (ts, work_id, user_id))
+        if work_id in self.ranked.counts:
+            self.ranked.add(work_id, 1)
+        else:
+            self.ranked.set(work_id, 1)
+
+    def unlike(self, work_id: str, user_id: str) -> None:
+        if self._active.pop((work_id, user_id), None) is not None:
+            self._decrement(work_id)
+
+    def _decrement(self, work_id: str) -> None:
+        count = self.ranked.counts.get(work_id)
+        if count is None:
+            return
+        if count <= 1:
+            self.ranked.remove(work_id)
+        else:
+            self.ranked.set(work_id, count - 1)
+
+    def expire(self, now: float) -> None:
+        cutoff = now - self.seconds
+        while self._heap and self._heap[0][0] < cutoff:
+            ts, work_id, user_id = heapq.heappop(self._heap)
+            # 已取消点赞或重新点赞过的记录跳过
+            if self._active.get((work_id, user_id)) == ts:
+                del self._active[(work_id, user_id)]
+                self._decrement(work_id)
+
+
+class Leaderboard:
+    """点赞排行榜，由作品索引在每次修改时增量更新"""
+
+    def __init__(self, clock: Callable[[], float] = time.time):
+        self.clock = clock
+        self.all_time = RankedCounter()
+        self.windows = {name: _WindowCounter(seconds)
+                        for name, seconds in LEADERBOARD_WINDOWS.items() if seconds}
+
+    def add_work(self, work_id: str) -> None:
+        self.all_time.set(work_id, 0)
+
+    def remove_work(self, work_id: str) -> None:
+        self.all_time.remove(work_id)
+        for window in self.windows.values():
+            window.ranked.remove(work_id)
+
+    def like(self, work_id: str, user_id: str, ts: str = '') -> None:
+        self.all_time.add(work_id, 1)
+        liked_at = parse_timestamp(ts)
+        if liked_at is None:
+            return
+        now = self.clock()
+        for window in self.windows.values():
+            window.like(work_id, user_id, liked_at, now)
+
+    def unlike(self, work_id: str, user_id: str) -> None:
+        self.all_time.add(work_id, -1)
+        for window in self.windows.values():
+            window.unlike(work_id, user_id)
+
+    def top(self, window: str, k: int) -> List[Tuple[str, int]]:
+        """前 k 名的 (作品ID, 点赞数)；时间窗口内只统计窗口中的点赞（不包含窗口内没有点赞的作品）"""
+        if window == 'all':
+            return self.all_time.top(k)
+        counter = self.windows[window]
+        counter.expire(self.clock())
+        return counter.ranked.top(k)
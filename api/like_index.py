@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+点赞索引模块 - 每个作品一个用户集合，点赞/取消点赞和计数都是 O(1)
+点赞数由集合大小得出，不会与 liked_by 不一致
+"""
+
+from typing import Dict, Iterable, List
+
+
+class LikeIndex:
+    """作品ID -> {用户ID: 点赞时间}（dict 保持点赞顺序，查找为 O(1)）"""
+
+    def __init__(self):
+        self._likes: Dict[str, Dict[str, str]] = {}
+
+    @classmethod
+    def from_works(cls, works: Iterable[dict]) -> 'LikeIndex':
+        """从作品的 liked_by 列表建立索引"""
+        index = cls()
+        for work in works:
+            index.add_work(work)
+        return index
+
+    def has_liked(self, work_id: str, user_id: str) -> bool:
+        """用户是否点赞过该作品"""
+        return user_id in self._likes.get(work_id, {})
+
+    def count(self, work_id: str) -> int:
+        return len(self._likes.get(work_id, {}))
+
+    def liked_by(self, work_id: str) -> List[str]:
+        return list(self._likes.get(work_id, {}))
+
+    def like_times(self, work_id: str) -> Dict[str, str]:
+        """用户ID -> 点赞时间（旧数据为空字符串）"""
+        return dict(self._likes.get(work_id, {}))
+
+    def like(self, work_id: str, user_id: str, ts: str = '') -> bool:
+        """点赞，已点赞时返回 False"""
+        users = self._likes.setdefault(work_id, {})
+        if user_id in users:
+            return False
+        users[user_id] = ts
+        return True
+
+    def unlike(self, work_id: str, user_id: str) -> bool:
+        """取消点赞，未点赞时返回 False"""
+        users = self._likes.get(work_id)
+        if not users or user_id not in users:
+            return False
+        del users[user_id]
+        return True
+
+    def toggle(self, work_id: str, user_id: str, ts: str = '') -> bool:
+        """切换点赞状态，返回切换后是否为已点赞"""
+        if self.has_liked(work_id, user_id):
+            self.unlike(work_id, user_id)
+            return False
+        self.like(work_id, user_id, ts)
+        return True
+
+    def add_work(self, work: dict) -> None:
+        """从作品的 liked_by 和 like_times（快照中保存的点赞时间）建立索引"""
+        like_times = work.get('like_times') or {}
+        self._likes[work['id']] = {user_id: like_times.get(user_id, '') for user_id in work.get('liked_by', [])}
+
+    def remove_work(self, work_id: str) -> None:
+        self._likes.pop(work_id, None)
+
+    def status(self, user_id: str, work_ids: Iterable[str]) -> Dict[str, bool]:
+        """批量查询用户对多个作品的点赞状态"""
+        return {work_id: self.has_liked(work_id, user_id) for work_id in work_ids}
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+日志配置 - 级别和格式由环境变量决定，写日志不阻塞请求线程
+
+- LOG_LEVEL: DEBUG/INFO/WARNING/ERROR（默认 INFO）
+- LOG_FORMAT: text（默认）或 json（每行一个 JSON 对象，便于日志系统采集；extra={'data': {...}} 附带结构化字段）
+- LOG_ASYNC: 为 1 时（默认，Vercel 上默认为 0）请求线程只把日志记录放入队列，格式化和写入由后台线程完成
+  （QueueHandler + QueueListener）。无服务器实例在响应后可能被冻结，队列中的日志来不及写出，因此同步写入
+"""
+
+import os
+import sys
+import json
+import queue
+import atexit
+import logging
+import logging.handlers
+from datetime import datetime, timezone
+from typing import Optional
+
+TEXT_FORMAT = '%(asctime)s %(levelname)s [%(process)d] %(name)s: %(message)s'
+
+_configured = False
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """一行一个 JSON 对象"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'process': record.process,
+            'thread': record.threadName,
+        }
+        if isinstance(getattr(record, 'data', None), dict):
+            entry['data'] = record.data
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def _formatter() -> logging.Formatter:
+    if os.environ.get('LOG_FORMAT', 'text').lower() == 'json':
+        return JsonFormatter()
+    return logging.Formatter(TEXT_FORMAT)
+
+
+def configure_logging() -> None:
+    """配置根日志记录器（重复调用时只生效一次）"""
+    global _configured, _listener
+    if _configured:
+        return
+    _configured = True
+    level = getattr(logging, os.environ.get('LOG_LEVEL', 'INFO').upper(), logging.INFO)
+    use_queue = os.environ.get('LOG_ASYNC', '0' if os.environ.get('VERCEL') else '1') != '0'
+
+    stream = logging.StreamHandler(sys.stderr)
+    stream.setFormatter(_formatter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.setLevel(level)
+    # 开发服务器的逐请求日志只在 DEBUG 级别输出
+    if level > logging.DEBUG:
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)
+
+    if not use_queue:
+        root.addHandler(stream)
+        return
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=False)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    _listener.start()
+    atexit.register(_stop_listener)
+
+
+def _stop_listener() -> None:
+    # 退出前写完队列中剩余的日志
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()
+
+
+def after_fork() -> None:
+    """fork 出的子进程中没有写日志的后台线程，重新启动"""
+    if _listener is not None:
+        _listener._thread = None
+        _listener.start()
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+运行指标模块 - 请求数、延迟、响应大小和存储操作耗时，以 Prometheus 文本格式导出
+
+- Counter / Histogram: 按标签分组的计数器和直方图（固定分桶，记录一次只是一次二分查找和加锁自增）
+- MetricsRegistry: 指标集合；设置了共享目录时各进程定期把自己的数据写入目录，导出时合并所有进程
+- instrument_methods: 给对象的方法加上计时（load_works/save_works、图片上传/删除等）
+"""
+
+import os
+import json
+import time
+import bisect
+import functools
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import logging
+
+from write_coordinator import atomic_write
+
+logger = logging.getLogger(__name__)
+
+# 耗时分桶（秒）
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# 响应大小分桶（字节）
+SIZE_BUCKETS = (128, 512, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = '') -> str:
+    parts = []
+    for name, value in zip(names, values):
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{name}="{value}"')
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """按标签分组的计数器"""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, help_text: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def dump(self) -> list:
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+    @staticmethod
+    def merge(into: dict, dumped: list) -> None:
+        for key, value in dumped:
+            key = tuple(key)
+            into[key] = into.get(key, 0) + value
+
+    def render(self, merged: dict) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        for key in sorted(merged):
+            lines.append(f'{self.name}{_format_labels(self.labels, key)} {_format_value(merged[key])}')
+        return lines
+
+
+class Histogram:
+    """按标签分组的直方图：各桶计数（非累计）、总和、次数"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, labels: Iterable[str] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # 标签 -> [各桶计数 + 超出最大桶的计数, 总和]
+        self._values: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(label_values)
+            if entry is None:
+                entry = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def time(self, *label_values: str) -> '_Timer':
+        """计时上下文：with histogram.time('label'): ..."""
+        return _Timer(self, label_values)
+
+    def dump(self) -> list:
+        with self._lock:
+            return [[list(key), list(counts), total] for key, (counts, total) in self._values.items()]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+    def merge(self, into: dict, dumped: list) -> None:
+        for key, counts, total in dumped:
+            key = tuple(key)
+            if len(counts) != len(self.buckets) + 1:
+                # 分桶定义不同的旧数据
+                continue
+            entry = into.setdefault(key, [[0] * len(counts), 0.0])
+            entry[0] = [a + b for a, b in zip(entry[0], counts)]
+            entry[1] += total
+
+    def render(self, merged: dict) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        for key in sorted(merged):
+            counts, total = merged[key]
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = 'le="' + _format_value(float(bound)) + '"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labels, key)} {_format_value(total)}')
+            lines.append(f'{self.name}_count{_format_labels(self.labels, key)} {cumulative}')
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, label_values: Tuple[str, ...]):
+        self.histogram = histogram
+        self.label_values = label_values
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.start, *self.label_values)
+        return False
+
+
+class MetricsRegistry:
+    """指标集合
+
+    shared_dir: 多个 worker 进程共享的目录。每个进程最多每 flush_interval 秒把自己的数据写入
+    metrics.<pid>.json，导出时合并目录中所有进程的数据（已退出进程的计数仍然保留）
+    """
+
+    def __init__(self, shared_dir: Optional[str] = None, flush_interval: float = 5.0):
+        self.metrics: Dict[str, object] = {}
+        self.shared_dir = shared_dir
+        self.flush_interval = flush_interval
+        self._last_flush = 0.0
+        self._flush_lock = threading.Lock()
+        if shared_dir:
+            os.makedirs(shared_dir, exist_ok=True)
+
+    def counter(self, name: str, help_text: str, labels: Iterable[str] = ()) -> Counter:
+        return self._register(Counter(name, help_text, labels))
+
+    def histogram(self, name: str, help_text: str, labels: Iterable[str] = (),
+                  buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, labels, buckets))
+
+    def _register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f"指标已存在: {metric.name}")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def dump(self) -> dict:
+        return {name: metric.dump() for name, metric in self.metrics.items()}
+
+    def reset(self) -> None:
+        """清空本进程的数据（fork 出的 worker 不继承主进程的计数）"""
+        for metric in self.metrics.values():
+            metric.reset()
+        self._last_flush = 0.0
+
+    def _own_file(self) -> str:
+        return os.path.join(self.shared_dir, f'metrics.{os.getpid()}.json')
+
+    def flush(self) -> None:
+        """把本进程的数据写入共享目录"""
+        if not self.shared_dir:
+            return
+        with self._flush_lock:
+            atomic_write(self._own_file(), json.dumps(self.dump()).encode('utf-8'))
+            self._last_flush = time.monotonic()
+
+    def maybe_flush(self) -> None:
+        """距上次写入超过 flush_interval 时写入（每个请求结束时调用，开销只是一次时间比较）"""
+        if self.shared_dir and time.monotonic() - self._last_flush >= self.flush_interval:
+            try:
+                self.flush()
+            except OSError as e:
+                logger.warning(f"写入指标数据失败: {e}")
+
+    def _collect(self) -> List[dict]:
+        if not self.shared_dir:
+            return [self.dump()]
+        self.flush()
+        dumps = []
+        for name in os.listdir(self.shared_dir):
+            if not (name.startswith('metrics.') and name.endswith('.json')):
+                continue
+            try:
+                with open(os.path.join(self.shared_dir, name), encoding='utf-8') as f:
+                    dumps.append(json.load(f))
+            except (OSError, ValueError) as e:
+                logger.warning(f"读取指标数据失败: {name}, {e}")
+        return dumps
+
+    def render(self) -> str:
+        """Prometheus 文本格式"""
+        dumps = self._collect()
+        lines = []
+        for name, metric in self.metrics.items():
+            merged = {}
+            for dumped in dumps:
+                metric.merge(merged, dumped.get(name, []))
+            lines.extend(metric.render(merged))
+        return '\n'.join(lines) + '\n'
+
+
+def instrument_methods(obj, methods: Iterable[str], histogram: Histogram, *label_values: str,
+                       errors: Optional[Counter] = None) -> None:
+    """把对象的方法替换为计时版本（只影响这个实例），标签为 (*label_values, 方法名)
+
+    errors: 方法抛出异常时计数
+    """
+    for name in methods:
+        method = getattr(obj, name, None)
+        if method is None:
+            continue
+        setattr(obj, name, _timed(method, histogram, label_values + (name,), errors))
+
+
+def _timed(method: Callable, histogram: Histogram, labels: Tuple[str, ...], errors: Optional[Counter]):
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        except Exception:
+            if errors is not None:
+                errors.inc(*labels)
+            raise
+        finally:
+            histogram.observe(time.perf_counter() - start, *labels)
+    return wrapper
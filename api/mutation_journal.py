@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+修改日志模块 - 点赞、评论、置顶等修改以一行 JSON 追加到日志文件
+加载时在最近一次快照（works.json）之上重放日志（见 WorksIndex.replay），
+日志过大时由后台线程压缩进新快照
+
+日志中的每条记录都是幂等的（点赞/取消点赞、设置置顶状态等），
+即使压缩过程中崩溃导致部分记录被重放两次，结果也不会改变
+"""
+
+import os
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+
+import json_codec
+
+logger = logging.getLogger(__name__)
+
+
+class MutationJournal:
+    """追加写的修改日志（每行一条 JSON）"""
+
+    def __init__(self, path: str, fsync: bool = True):
+        self.path = path
+        self.fsync = fsync
+
+    def inode(self) -> Optional[int]:
+        """日志文件的 inode，压缩时日志被替换为新文件"""
+        try:
+            return os.stat(self.path).st_ino
+        except OSError:
+            return None
+
+    def size(self) -> int:
+        try:
+            return os.stat(self.path).st_size
+        except OSError:
+            return 0
+
+    def append(self, entries: List[Dict[str, Any]]) -> int:
+        """追加一批记录（一次 write），返回写入的字节数"""
+        data = b''.join(json_codec.dumps(entry) + b'\n' for entry in entries)
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, data)
+            if self.fsync:
+                os.fsync(fd)
+        finally:
+            os.close(fd)
+        return len(data)
+
+    def read_from(self, offset: int) -> Tuple[List[Dict[str, Any]], int]:
+        """读取 offset 之后的完整记录，返回记录和新的偏移量"""
+        try:
+            with open(self.path, 'rb') as f:
+                f.seek(offset)
+                data = f.read()
+        except FileNotFoundError:
+            return [], offset
+
+        # 只处理以换行结尾的完整记录，未写完的行留到下次读取
+        end = data.rfind(b'\n') + 1
+        entries = []
+        for line in data[:end].splitlines():
+            if not line.strip():
+                continue
+            try:
+                entries.append(json_codec.loads(line))
+            except ValueError:
+                logger.error(f"修改日志记录损坏，已跳过: {line[:100]!r}")
+        return entries, offset + end
+
+
+def journal_entry(op: Dict[str, Any], result: Any) -> Dict[str, Any]:
+    """把一次修改操作及其结果转换为幂等的日志记录"""
+    kind = op['op']
+    if kind in ('toggle_like', 'set_like'):
+        return {'op': 'like' if result['liked'] else 'unlike', 'work_id': op['work_id'],
+                'user_id': op['user_id'], 'ts': op.get('created_at', '')}
+    if kind in ('toggle_pin', 'set_pin'):
+        return {'op': 'set_pin', 'work_id': op['work_id'], 'is_pinned': result}
+    if kind == 'delete_comment':
+        return {'op': 'delete_comment', 'work_id': op['work_id'], 'comment_id': op['comment_id']}
+    if kind == 'delete_work':
+        return {'op': 'delete_work', 'work_id': op['work_id']}
+    if kind == 'add_comment':
+        return {'op': 'add_comment', 'work_id': op['work_id'], 'comment': op['comment']}
+    if kind == 'create_work':
+        return {'op': 'create_work', 'work': op['work']}
+    if kind == 'replace_image_url':
+        return {'op': 'replace_image_url', 'work_id': op['work_id'], 'old_url': op['old_url'],
+                'new_url': op['new_url']}
+    raise ValueError(f"未知的操作类型: {kind}")
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+分页与字段投影工具 - 基于游标的分页
+作品游标对应 (is_pinned, created_at, id) 排序键，评论游标对应 (created_at, id)，搜索游标对应 (score, id)
+"""
+
+import base64
+import json
+from typing import Iterable, List, Optional
+
+
+class InvalidCursorError(ValueError):
+    """游标格式错误"""
+
+
+# 投影时可用的计算字段
+COMPUTED_FIELDS = {
+    'comments_count': lambda work: work.get('comments_count', len(work.get('comments', []))),
+    'liked_by_count': lambda work: len(work.get('liked_by', [])),
+}
+
+
+def encode_cursor(values: Iterable) -> str:
+    """将排序键编码为URL安全的游标字符串"""
+    raw = json.dumps(list(values), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> list:
+    """解析游标字符串"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+    except Exception as e:
+        raise InvalidCursorError(cursor) from e
+    if not isinstance(values, list):
+        raise InvalidCursorError(cursor)
+    return values
+
+
+def work_cursor(work: dict) -> str:
+    """作品在列表排序中的游标"""
+    return encode_cursor([bool(work.get('is_pinned', False)), work.get('created_at', ''), work.get('id', '')])
+
+
+def work_cursor_key(cursor: str) -> tuple:
+    """将作品游标还原为 work_sort_key 形式的排序键"""
+    values = decode_cursor(cursor)
+    if len(values) != 3:
+        raise InvalidCursorError(cursor)
+    is_pinned, created_at, work_id = values
+    return (not is_pinned, str(created_at), str(work_id))
+
+
+def comment_cursor(comment: dict) -> str:
+    """评论在时间顺序中的游标"""
+    return encode_cursor([comment.get('created_at', ''), comment.get('id', '')])
+
+
+def comment_cursor_key(cursor: str) -> tuple:
+    """将评论游标还原为 (created_at, id) 排序键"""
+    values = decode_cursor(cursor)
+    if len(values) != 2:
+        raise InvalidCursorError(cursor)
+    return (str(values[0]), str(values[1]))
+
+
+def search_cursor(work: dict) -> str:
+    """搜索结果在相关度排序中的游标"""
+    return encode_cursor([work.get('score', 0), work.get('id', '')])
+
+
+def search_cursor_key(cursor: str) -> tuple:
+    """将搜索游标还原为 (score, id)"""
+    values = decode_cursor(cursor)
+    if len(values) != 2 or not isinstance(values[0], (int, float)) or isinstance(values[0], bool):
+        raise InvalidCursorError(cursor)
+    return (float(values[0]), str(values[1]))
+
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """解析 fields=a,b,c 参数；id 字段总是返回"""
+    if fields is None:
+        return None
+    names = [name.strip() for name in fields.split(',') if name.strip()]
+    if 'id' not in names:
+        names.insert(0, 'id')
+    return names
+
+
+def project(item: dict, fields: Optional[List[str]]) -> dict:
+    """只保留指定字段（支持计算字段，如 comments_count）"""
+    if fields is None:
+        return item
+    result = {}
+    for name in fields:
+        if name in COMPUTED_FIELDS:
+            result[name] = COMPUTED_FIELDS[name](item)
+        elif name in item:
+            result[name] = item[name]
+    return result
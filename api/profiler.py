@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+慢请求采样分析 - 后台线程定期采样正在处理请求的线程的调用栈
+
+请求结束时耗时超过阈值的，保留其采样到的热点调用栈（折叠格式，可直接交给 flamegraph.pl），
+其余请求的采样直接丢弃。默认关闭，设置 PROFILE_SLOW_REQUEST_MS 启用
+"""
+
+import os
+import sys
+import time
+import threading
+from collections import Counter, deque
+from typing import Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+MAX_STACK_DEPTH = 64
+
+
+def _collapse(frame) -> str:
+    """调用栈 -> 'file:func:line;...'（从外到内）"""
+    names = []
+    while frame is not None and len(names) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        names.append(f'{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}')
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class _ActiveRequest:
+    __slots__ = ('start', 'samples')
+
+    def __init__(self, start: float):
+        self.start = start
+        self.samples: Counter = Counter()
+
+
+class SlowRequestProfiler:
+    """采样分析器
+
+    threshold: 超过该耗时（秒）的请求保留采样结果
+    interval: 采样间隔（秒）
+    max_profiles: 最多保留最近的多少个慢请求
+    """
+
+    def __init__(self, threshold: float, interval: float = 0.005, max_profiles: int = 50, top_stacks: int = 20):
+        self.threshold = threshold
+        self.interval = interval
+        self.top_stacks = top_stacks
+        self.profiles = deque(maxlen=max_profiles)
+        self._active: Dict[int, _ActiveRequest] = {}
+        self._lock = threading.Lock()
+        # 没有正在处理的请求时采样线程休眠
+        self._has_active = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='slow-request-profiler', daemon=True)
+        self._thread.start()
+
+    def after_fork(self) -> None:
+        """fork 出的子进程中没有采样线程，重新启动"""
+        self._active.clear()
+        self._lock = threading.Lock()
+        self._has_active = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='slow-request-profiler', daemon=True)
+        self._thread.start()
+
+    def start(self) -> None:
+        """在处理请求的线程中调用"""
+        with self._lock:
+            self._active[threading.get_ident()] = _ActiveRequest(time.perf_counter())
+            self._has_active.set()
+
+    def stop(self, **info) -> Optional[dict]:
+        """在处理请求的线程中调用；请求耗时超过阈值时返回并保存采样结果"""
+        with self._lock:
+            request = self._active.pop(threading.get_ident(), None)
+        if request is None:
+            return None
+        duration = time.perf_counter() - request.start
+        if duration < self.threshold or not request.samples:
+            return None
+        profile = dict(info, duration_ms=round(duration * 1000, 2), time=time.time(),
+                       samples=sum(request.samples.values()),
+                       stacks=[{'stack': stack, 'count': count}
+                               for stack, count in request.samples.most_common(self.top_stacks)])
+        self.profiles.append(profile)
+        hottest = profile['stacks'][0]['stack'].rsplit(';', 3)[-3:]
+        logger.warning(f"慢请求 {info.get('method', '')} {info.get('path', '')} 耗时 {profile['duration_ms']} ms，"
+                       f"热点: {' <- '.join(reversed(hottest))}")
+        return profile
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while True:
+            self._has_active.wait()
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._active:
+                    self._has_active.clear()
+                    continue
+                frames = sys._current_frames()
+                for ident, request in self._active.items():
+                    frame = frames.get(ident)
+                    if frame is not None and ident != own:
+                        request.samples[_collapse(frame)] += 1
+
+    def recent(self) -> List[dict]:
+        """最近的慢请求（从新到旧）"""
+        return list(reversed(self.profiles))
+
+    def collapsed(self) -> str:
+        """所有保留的慢请求合并后的折叠调用栈（flamegraph.pl 输入格式）"""
+        merged: Counter = Counter()
+        for profile in list(self.profiles):
+            for item in profile['stacks']:
+                merged[item['stack']] += item['count']
+        return ''.join(f'{stack} {count}\n' for stack, count in merged.most_common())
+
+
+def create_profiler() -> Optional[SlowRequestProfiler]:
+    """根据环境变量创建采样分析器（未设置 PROFILE_SLOW_REQUEST_MS 时返回 None）"""
+    threshold_ms = os.environ.get('PROFILE_SLOW_REQUEST_MS')
+    if not threshold_ms:
+        return None
+    interval_ms = float(os.environ.get('PROFILE_INTERVAL_MS', '5'))
+    profiler = SlowRequestProfiler(float(threshold_ms) / 1000, interval_ms / 1000)
+    logger.info(f"慢请求采样分析已启用: 阈值 {threshold_ms} ms，采样间隔 {interval_ms} ms")
+    return profiler
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+限流模块 - 写接口按客户端 IP 和用户ID 的令牌桶限流，上传接口限制同时处理的数量
+
+- Limit: '60/minute' 形式的限额，令牌按 60/60 每秒的速度补充，桶容量 60（允许短时间内突发）
+- MemoryBucketBackend: 进程内的令牌桶（默认）
+- SQLiteBucketBackend: 同一台机器上多个 worker 进程共享的令牌桶（SQLite WAL）
+- RateLimiter: 按路由和维度（ip、user）配置的限流规则
+- ConcurrencyLimiter: 同时处理的请求数上限，超出时在有界队列中等待，队列已满或等待超时则拒绝
+"""
+
+import os
+import time
+import sqlite3
+import threading
+from typing import Dict, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+
+class Limit:
+    """每 period 秒 count 次"""
+
+    __slots__ = ('count', 'period', 'rate', 'burst')
+
+    def __init__(self, count: int, period: float):
+        if count <= 0 or period <= 0:
+            raise ValueError(f"无效的限额: {count}/{period}")
+        self.count = count
+        self.period = period
+        self.rate = count / period
+        self.burst = float(count)
+
+    @classmethod
+    def parse(cls, text: str) -> 'Limit':
+        """'60/minute'、'10/hour' 或 '5/30'（每 30 秒 5 次）"""
+        count, _, period = text.strip().partition('/')
+        period = period.strip().lower()
+        try:
+            seconds = float(period) if period[:1].isdigit() else PERIODS[period.rstrip('s')]
+            return cls(int(count), seconds)
+        except (KeyError, ValueError):
+            raise ValueError(f"无效的限额: {text}")
+
+    def __repr__(self) -> str:
+        return f'Limit({self.count}/{self.period:g}s)'
+
+
+class BucketBackend:
+    """令牌桶存储"""
+
+    def take(self, key: str, limit: Limit, cost: float = 1) -> float:
+        """从 key 的桶中取 cost 个令牌：成功返回 0，令牌不足时不扣除并返回需要等待的秒数"""
+        raise NotImplementedError
+
+    def after_fork(self) -> None:
+        """fork 出的子进程中重建不能跨进程共享的资源"""
+
+    @staticmethod
+    def _refill(limit: Limit, tokens: float, elapsed: float) -> float:
+        return min(limit.burst, tokens + max(elapsed, 0.0) * limit.rate)
+
+
+class MemoryBucketBackend(BucketBackend):
+    """进程内令牌桶；桶的数量超过 max_keys 时清理已补满的桶"""
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        # key -> [令牌数, 更新时间, 补满所需的秒数]
+        self._buckets: Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def take(self, key: str, limit: Limit, cost: float = 1) -> float:
+        cost = min(cost, limit.burst)
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            tokens = limit.burst if bucket is None else self._refill(limit, bucket[0], now - bucket[1])
+            wait = 0.0
+            if tokens >= cost:
+                tokens -= cost
+            else:
+                wait = (cost - tokens) / limit.rate
+            self._buckets[key] = [tokens, now, (limit.burst - tokens) / limit.rate]
+            if len(self._buckets) > self.max_keys:
+                self._prune(now)
+            return wait
+
+    def _prune(self, now: float) -> None:
+        self._buckets = {key: bucket for key, bucket in self._buckets.items() if now - bucket[1] < bucket[2]}
+        if len(self._buckets) > self.max_keys:
+            # 大量不同的客户端同时活跃：保留最近更新的一半
+            recent = sorted(self._buckets.items(), key=lambda item: item[1][1], reverse=True)
+            self._buckets = dict(recent[:self.max_keys // 2])
+            logger.warning(f"限流桶数量超过 {self.max_keys}，已清理较早的桶")
+
+
+class SQLiteBucketBackend(BucketBackend):
+    """多个 worker 进程共享的令牌桶，每次取令牌是一个 BEGIN IMMEDIATE 事务
+
+    expire_after: 超过该时间（秒）未使用的桶会被删除（这些桶已经补满，删除后效果相同）
+    """
+
+    def __init__(self, path: str, expire_after: float = 3600):
+        self.path = path
+        self.expire_after = expire_after
+        self._local = threading.local()
+        self._takes = 0
+        self._connect().execute('CREATE TABLE IF NOT EXISTS buckets '
+                                '(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)')
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            # 限流状态丢失只是重新开始计数，不需要每次都刷盘
+            conn.execute('PRAGMA synchronous=OFF')
+            self._local.conn = conn
+        return conn
+
+    def after_fork(self) -> None:
+        self._local = threading.local()
+
+    def take(self, key: str, limit: Limit, cost: float = 1) -> float:
+        cost = min(cost, limit.burst)
+        # 多个进程之间比较时间，使用系统时间
+        now = time.time()
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT tokens, updated FROM buckets WHERE key = ?', (key,)).fetchone()
+            tokens = limit.burst if row is None else self._refill(limit, row[0], now - row[1])
+            wait = 0.0
+            if tokens >= cost:
+                tokens -= cost
+            else:
+                wait = (cost - tokens) / limit.rate
+            conn.execute('INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)',
+                         (key, tokens, now))
+            self._takes += 1
+            if self._takes % 1000 == 0:
+                conn.execute('DELETE FROM buckets WHERE updated < ?', (now - self.expire_after,))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return wait
+
+
+def create_bucket_backend(default_db_path: str) -> BucketBackend:
+    """RATE_LIMIT_BACKEND=memory（默认）/sqlite；sqlite 的数据库路径由 RATE_LIMIT_DB 指定"""
+    backend = os.environ.get('RATE_LIMIT_BACKEND', 'memory').lower()
+    if backend == 'sqlite':
+        path = os.environ.get('RATE_LIMIT_DB', default_db_path)
+        logger.info(f"限流状态保存在SQLite: {path}")
+        return SQLiteBucketBackend(path)
+    return MemoryBucketBackend()
+
+
+def build_rules(defaults: Dict[str, Dict[str, str]]) -> Dict[str, Dict[str, Limit]]:
+    """路由 -> {维度: 限额}；环境变量 RATE_LIMIT_<路由>_<维度>（如 RATE_LIMIT_LIKE_USER=30/minute）覆盖默认值，
+    设为 off 关闭该规则"""
+    rules = {}
+    for route, scopes in defaults.items():
+        rules[route] = {}
+        for scope, text in scopes.items():
+            text = os.environ.get(f'RATE_LIMIT_{route.upper()}_{scope.upper()}', text)
+            if text.strip().lower() in ('off', '0', ''):
+                continue
+            rules[route][scope] = Limit.parse(text)
+    return rules
+
+
+class RateLimiter:
+    """按路由的令牌桶限流，一个请求需要同时满足各维度（ip、user）的限额
+
+    按规则顺序检查，被后面的维度拒绝的请求仍然计入前面维度的用量（同一 IP 反复重试也会被限制）
+    """
+
+    def __init__(self, backend: BucketBackend, rules: Dict[str, Dict[str, Limit]]):
+        self.backend = backend
+        self.rules = rules
+
+    def check(self, route: str, identities: Dict[str, Optional[str]], cost: float = 1) -> Tuple[float, Optional[str]]:
+        """返回 (需要等待的秒数, 超出限额的维度)，允许时返回 (0.0, None)"""
+        for scope, limit in self.rules.get(route, {}).items():
+            value = identities.get(scope)
+            if not value:
+                continue
+            try:
+                wait = self.backend.take(f'{route}:{scope}:{value}', limit, cost)
+            except Exception as e:
+                # 限流存储出错时放行，不影响正常请求
+                logger.warning(f"限流检查失败，已放行: {e}")
+                continue
+            if wait > 0:
+                return wait, scope
+        return 0.0, None
+
+
+class ConcurrencyLimiter:
+    """同时处理的请求数上限（进程内）
+
+    max_active 个请求同时处理，其余最多 max_waiting 个按到达顺序等待，最多等待 timeout 秒
+    """
+
+    def __init__(self, max_active: int, max_waiting: int, timeout: float):
+        self.max_active = max_active
+        self.max_waiting = max_waiting
+        self.timeout = timeout
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+        self._cond = threading.Condition()
+
+    def acquire(self) -> bool:
+        with self._cond:
+            # 已有请求在等待时新请求排在后面，不插队
+            if self.active < self.max_active and not self.waiting:
+                self.active += 1
+                return True
+            if self.waiting >= self.max_waiting:
+                self.rejected += 1
+                return False
+            self.waiting += 1
+            try:
+                acquired = self._cond.wait_for(lambda: self.active < self.max_active, self.timeout)
+            finally:
+                self.waiting -= 1
+            if not acquired:
+                self.rejected += 1
+                return False
+            self.active += 1
+            return True
+
+    def release(self) -> None:
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+    def stats(self) -> dict:
+        return {'active': self.active, 'waiting': self.waiting, 'rejected': self.rejected,
+                'max_active': self.max_active, 'max_waiting': self.max_waiting}
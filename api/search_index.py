@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+全文搜索模块 - 作品标题、描述、作者和评论内容的倒排索引
+中日韩文字没有空格分词，按单字和相邻两字（bigram）建索引；其他文字按单词建索引（忽略大小写、全半角）
+结果按 BM25 打分排序，各字段权重不同（标题 > 作者 > 描述 > 评论）
+"""
+
+import math
+import re
+import unicodedata
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# 字段权重：一个词在标题中出现相当于在评论中出现 6 次
+FIELD_WEIGHTS = {
+    'title': 3.0,
+    'author': 2.0,
+    'description': 1.0,
+    'comments': 0.5,
+}
+
+# 中日韩文字（汉字、日文假名、韩文）
+_CJK = '\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff'
+_SEGMENT_PATTERN = re.compile(rf'([{_CJK}]+)|([^\W_{_CJK}]+)')
+
+# BM25 参数
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def _segments(text: str):
+    """切分为 (是否为中日韩文字, 片段)"""
+    text = unicodedata.normalize('NFKC', text or '').lower()
+    for match in _SEGMENT_PATTERN.finditer(text):
+        if match.group(1):
+            yield True, match.group(1)
+        else:
+            yield False, match.group(2)
+
+
+def index_terms(text: str) -> List[str]:
+    """建索引用的词：中日韩文字的单字和 bigram，其他文字的单词"""
+    terms = []
+    for is_cjk, segment in _segments(text):
+        if is_cjk:
+            terms.extend(segment)
+            terms.extend(segment[i:i + 2] for i in range(len(segment) - 1))
+        else:
+            terms.append(segment)
+    return terms
+
+
+def query_terms(text: str) -> List[str]:
+    """查询用的词：中日韩文字只有一个字时用单字，否则用 bigram（所有词都要匹配）"""
+    terms = []
+    for is_cjk, segment in _segments(text):
+        if is_cjk and len(segment) > 1:
+            terms.extend(segment[i:i + 2] for i in range(len(segment) - 1))
+        else:
+            terms.append(segment)
+    return list(dict.fromkeys(terms))
+
+
+def work_fields(work: dict) -> Dict[str, str]:
+    """作品中参与搜索的文本（不含评论）"""
+    return {
+        'title': work.get('title', ''),
+        'author': f"{work.get('username', '')} {work.get('realName', '')}",
+        'description': work.get('description', ''),
+    }
+
+
+def _weighted_terms(fields: Dict[str, str]) -> Counter:
+    counts = Counter()
+    for field, text in fields.items():
+        weight = FIELD_WEIGHTS[field]
+        for term in index_terms(text):
+            counts[term] += weight
+    return counts
+
+
+class SearchIndex:
+    """倒排索引：词 -> {作品ID: 加权词频}，作品和评论的增删都只更新受影响的词"""
+
+    def __init__(self):
+        self._postings: Dict[str, Dict[str, float]] = {}
+        self._work_terms: Dict[str, Counter] = {}
+        self._comment_terms: Dict[str, Dict[str, Counter]] = {}
+        self._lengths: Dict[str, float] = {}
+        self._total_length = 0.0
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def _update(self, work_id: str, counts: Counter, sign: int) -> None:
+        length = 0.0
+        for term, weight in counts.items():
+            postings = self._postings.setdefault(term, {})
+            value = postings.get(work_id, 0.0) + sign * weight
+            if value > 1e-9:
+                postings[work_id] = value
+            else:
+                postings.pop(work_id, None)
+                if not postings:
+                    del self._postings[term]
+            length += weight
+        self._lengths[work_id] = self._lengths.get(work_id, 0.0) + sign * length
+        self._total_length += sign * length
+
+    def add_work(self, work: dict, comments: Iterable[dict] = ()) -> None:
+        work_id = work['id']
+        if work_id in self._lengths:
+            self.remove_work(work_id)
+        counts = _weighted_terms(work_fields(work))
+        self._work_terms[work_id] = counts
+        self._comment_terms[work_id] = {}
+        self._lengths[work_id] = 0.0
+        self._update(work_id, counts, 1)
+        for comment in comments:
+            self.add_comment(work_id, comment)
+
+    def remove_work(self, work_id: str) -> None:
+        if work_id not in self._lengths:
+            return
+        self._update(work_id, self._work_terms.pop(work_id), -1)
+        for counts in self._comment_terms.pop(work_id).values():
+            self._update(work_id, counts, -1)
+        # 词频已全部减去，剩下的只是浮点误差
+        self._total_length -= self._lengths.pop(work_id)
+
+    def add_comment(self, work_id: str, comment: dict) -> None:
+        comments = self._comment_terms.get(work_id)
+        if comments is None or comment['id'] in comments:
+            return
+        counts = _weighted_terms({'comments': comment.get('content', '')})
+        comments[comment['id']] = counts
+        self._update(work_id, counts, 1)
+
+    def remove_comment(self, work_id: str, comment_id: str) -> None:
+        counts = self._comment_terms.get(work_id, {}).pop(comment_id, None)
+        if counts is not None:
+            self._update(work_id, counts, -1)
+
+    def search(self, query: str) -> List[Tuple[str, float]]:
+        """返回匹配所有查询词的 (作品ID, 分数)，按分数从高到低排序"""
+        terms = query_terms(query)
+        postings = [self._postings.get(term) for term in terms]
+        if not terms or not all(postings):
+            return []
+        postings.sort(key=len)
+        candidates = [work_id for work_id in postings[0] if all(work_id in p for p in postings[1:])]
+
+        total_docs = len(self._lengths)
+        avg_length = self._total_length / total_docs if total_docs else 1.0
+        idf = [math.log(1 + (total_docs - len(p) + 0.5) / (len(p) + 0.5)) for p in postings]
+        results = []
+        for work_id in candidates:
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[work_id] / (avg_length or 1.0))
+            score = 0.0
+            for weight, p in zip(idf, postings):
+                tf = p[work_id]
+                score += weight * tf * (BM25_K1 + 1) / (tf + norm)
+            results.append((work_id, round(score, 6)))
+        results.sort(key=lambda item: (-item[1], item[0]))
+        return results
+
+
+def page_results(results: List[Tuple[str, float]], after: Optional[Tuple[float, str]],
+                 limit: int) -> Tuple[List[Tuple[str, float]], bool]:
+    """按 (分数, 作品ID) 游标取一页排好序的结果"""
+    if after is not None:
+        after_key = (-after[0], after[1])
+        results = [item for item in results if (-item[1], item[0]) > after_key]
+    return results[:limit], len(results) > limit
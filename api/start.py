@@ -1,9 +1,23 @@
 #!/usr/bin/env python3
 """
 启动脚本 - 运行Flask应用
+
+默认使用 gunicorn 多进程启动（配置见 gunicorn.conf.py）；`python start.py --dev` 或未安装 gunicorn 时
+使用 Flask 开发服务器（FLASK_DEBUG=1 开启调试模式和自动重载）
 """
 
-from app import app
+import os
+import sys
+import shutil
+
+def run_gunicorn():
+    """用 gunicorn 替换当前进程；未安装时返回"""
+    gunicorn = shutil.which('gunicorn')
+    if gunicorn is None:
+        print("⚠️ 未安装 gunicorn，使用开发服务器（pip install gunicorn）")
+        return
+    api_dir = os.path.dirname(os.path.abspath(__file__))
+    os.execv(gunicorn, [gunicorn, '--chdir', api_dir, '-c', os.path.join(api_dir, 'gunicorn.conf.py'), 'app:app'])
 
 if __name__ == '__main__':
     print("🚀 启动作品展示平台后端服务...")
@@ -14,5 +28,9 @@ if __name__ == '__main__':
     print("   - POST /api/works/<id>/like - 点赞/取消点赞")
     print("   - GET  /api/health - 健康检查")
     print("\n按 Ctrl+C 停止服务")
-    
-    app.run(debug=True, host='0.0.0.0', port=8000)
+
+    if '--dev' not in sys.argv[1:]:
+        run_gunicorn()
+
+    from app import app
+    app.run(debug=os.environ.get('FLASK_DEBUG') == '1', host='0.0.0.0', port=8000)
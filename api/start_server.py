@@ -38,4 +38,4 @@ if __name__ == '__main__':
     os.makedirs('uploads', exist_ok=True)
     
     # 启动服务器
-    app.run(debug=True, host='0.0.0.0', port=8000, use_reloader=False)
+    app.run(debug=os.environ.get('FLASK_DEBUG') == '1', host='0.0.0.0', port=8000, use_reloader=False)
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+上传流式写入模块 - 按块把上传的图片直接写入目标文件
+写入过程中计算内容哈希并校验文件头（magic bytes），内存占用只与块大小有关；
+同时提供可断点续传的分块上传会话
+"""
+
+import os
+import json
+import time
+import uuid
+import fcntl
+import shutil
+import hashlib
+from typing import BinaryIO, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+# 文件头 -> 图片类型
+IMAGE_SIGNATURES = (
+    (b'\xff\xd8\xff', 'jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+)
+HEADER_SIZE = 12
+
+
+class InvalidImageError(ValueError):
+    """不是受支持的图片文件"""
+
+
+class UploadTooLargeError(ValueError):
+    """上传内容超过大小限制"""
+
+
+class UploadSessionError(LookupError):
+    """上传会话不存在或状态不正确"""
+
+
+def detect_image_type(header: bytes) -> Optional[str]:
+    """根据文件头识别图片类型"""
+    for signature, image_type in IMAGE_SIGNATURES:
+        if header.startswith(signature):
+            return image_type
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+
+class IngestResult:
+    """一次写入的结果"""
+
+    def __init__(self, sha256: str, size: int, image_type: str):
+        self.sha256 = sha256
+        self.size = size
+        self.image_type = image_type
+
+
+def stream_to_file(stream: BinaryIO, dest_path: str, max_size: Optional[int] = None,
+                   chunk_size: int = CHUNK_SIZE) -> IngestResult:
+    """按块把流写入 dest_path，写入完成后原子地改名，失败时不留下半个文件"""
+    part_path = dest_path + '.part'
+    digest = hashlib.sha256()
+    header = b''
+    image_type = None
+    size = 0
+    try:
+        with open(part_path, 'wb') as f:
+            while True:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if max_size is not None and size > max_size:
+                    raise UploadTooLargeError(dest_path)
+                if image_type is None:
+                    # 文件头可能跨块，攒够后再校验
+                    header += chunk[:HEADER_SIZE - len(header)]
+                    if len(header) >= HEADER_SIZE:
+                        image_type = _require_image_type(header)
+                digest.update(chunk)
+                f.write(chunk)
+        if image_type is None:
+            image_type = _require_image_type(header)
+        os.replace(part_path, dest_path)
+    except Exception:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+    return IngestResult(digest.hexdigest(), size, image_type)
+
+
+def _require_image_type(header: bytes) -> str:
+    image_type = detect_image_type(header)
+    if image_type is None:
+        raise InvalidImageError('文件内容不是有效的图片')
+    return image_type
+
+
+class UploadSessionManager:
+    """分块上传会话：客户端按偏移量依次上传，中断后可查询进度继续上传"""
+
+    def __init__(self, upload_folder: str, max_size: int, expire_seconds: int = 24 * 3600):
+        self.session_folder = os.path.join(upload_folder, '.sessions')
+        self.max_size = max_size
+        self.expire_seconds = expire_seconds
+        os.makedirs(self.session_folder, exist_ok=True)
+
+    def _meta_path(self, upload_id: str) -> str:
+        return os.path.join(self.session_folder, f'{upload_id}.json')
+
+    def _data_path(self, upload_id: str) -> str:
+        return os.path.join(self.session_folder, f'{upload_id}.part')
+
+    def _write_meta(self, session: dict) -> None:
+        tmp_path = self._meta_path(session['upload_id']) + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(session, f, ensure_ascii=False)
+        os.replace(tmp_path, self._meta_path(session['upload_id']))
+
+    def get(self, upload_id: str) -> dict:
+        """读取会话状态"""
+        try:
+            uuid.UUID(upload_id)
+            with open(self._meta_path(upload_id), 'r', encoding='utf-8') as f:
+                session = json.load(f)
+        except (ValueError, OSError):
+            raise UploadSessionError(upload_id)
+        session['offset'] = os.path.getsize(self._data_path(upload_id))
+        return session
+
+    def create(self, filename: str, total_size: int) -> dict:
+        """创建上传会话"""
+        if total_size <= 0 or total_size > self.max_size:
+            raise UploadTooLargeError(filename)
+        self.cleanup_expired()
+        session = {
+            'upload_id': str(uuid.uuid4()),
+            'filename': filename,
+            'size': total_size,
+            'created_at': time.time()
+        }
+        open(self._data_path(session['upload_id']), 'wb').close()
+        self._write_meta(session)
+        session['offset'] = 0
+        return session
+
+    def append(self, upload_id: str, offset: int, stream: BinaryIO, chunk_size: int = CHUNK_SIZE) -> dict:
+        """从 offset 处追加一块数据；offset 与已接收的字节数不一致时拒绝"""
+        session = self.get(upload_id)
+        with open(self._data_path(upload_id), 'ab') as f:
+            try:
+                # 同一会话同时只允许一个请求写入（跨进程有效）
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                raise UploadSessionError(upload_id)
+            received = f.seek(0, os.SEEK_END)
+            if offset != received:
+                raise UploadSessionError(upload_id)
+            header = b''
+            try:
+                while True:
+                    chunk = stream.read(chunk_size)
+                    if not chunk:
+                        break
+                    if received + len(chunk) > session['size']:
+                        raise UploadTooLargeError(upload_id)
+                    if offset == 0 and len(header) < HEADER_SIZE:
+                        header += chunk[:HEADER_SIZE - len(header)]
+                        if len(header) >= HEADER_SIZE:
+                            _require_image_type(header)
+                    f.write(chunk)
+                    received += len(chunk)
+            except Exception:
+                # 丢弃这一块已写入的部分，客户端可从 offset 重试
+                f.truncate(offset)
+                raise
+        session['offset'] = received
+        return session
+
+    def finalize(self, upload_id: str, dest_path: str) -> IngestResult:
+        """上传完成后把数据链接到目标位置（不复制内容），并按块计算哈希
+
+        会话本身保留，由调用方在作品保存成功后 discard：同一请求中的其他图片无效时，
+        客户端不需要重新上传已完成的会话
+        """
+        session = self.get(upload_id)
+        if session['offset'] != session['size']:
+            raise UploadSessionError(upload_id)
+        data_path = self._data_path(upload_id)
+        digest = hashlib.sha256()
+        with open(data_path, 'rb') as f:
+            image_type = _require_image_type(f.read(HEADER_SIZE))
+            f.seek(0)
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+        if os.path.exists(dest_path):
+            os.remove(dest_path)
+        try:
+            os.link(data_path, dest_path)
+        except OSError:
+            # 不支持硬链接的文件系统
+            shutil.copyfile(data_path, dest_path)
+        return IngestResult(digest.hexdigest(), session['size'], image_type)
+
+    def discard(self, upload_id: str) -> None:
+        """删除会话及其数据"""
+        for path in (self._data_path(upload_id), self._meta_path(upload_id)):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def cleanup_expired(self) -> None:
+        """清理过期的上传会话"""
+        deadline = time.time() - self.expire_seconds
+        try:
+            for name in os.listdir(self.session_folder):
+                path = os.path.join(self.session_folder, name)
+                if os.path.getmtime(path) < deadline:
+                    os.remove(path)
+        except OSError as e:
+            logger.warning(f"清理上传会话失败: {e}")
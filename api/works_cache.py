@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+作品列表读缓存 - 缓存已排序的作品列表、序列化好的 JSON 响应体及其压缩结果
+数据版本（文件 mtime/大小或内部写入计数）变化时自动失效
+"""
+
+import bisect
+import hashlib
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import logging
+
+from compression import compress
+from works_store import WorksStore, sort_works, work_sort_key
+
+logger = logging.getLogger(__name__)
+
+
+class WorksSnapshot:
+    """某一数据版本下的作品列表快照（只读，不要修改其中的作品）"""
+
+    def __init__(self, version: Any, works: List[dict], body: bytes):
+        self.version = version
+        self.works = works
+        self.body = body
+        # 快照建立时间即本进程观察到该版本数据的时间
+        self.last_modified = time.time()
+        self._ascending_keys: Optional[List[tuple]] = None
+        self._etag: Optional[str] = None
+        self._encoded: Dict[str, bytes] = {}
+
+    @property
+    def etag(self) -> str:
+        """基于响应体内容的强 ETag，多个进程间保持一致"""
+        if self._etag is None:
+            self._etag = hashlib.sha1(self.body).hexdigest()
+        return self._etag
+
+    def encoded(self, encoding: str) -> bytes:
+        """压缩后的响应体，每个数据版本每种编码只压缩一次
+        （并发的首次请求可能重复压缩，结果相同，不加锁）"""
+        body = self._encoded.get(encoding)
+        if body is None:
+            body = self._encoded[encoding] = compress(self.body, encoding)
+        return body
+
+    def variant_etag(self, variant: str) -> str:
+        """分页、字段投影等派生响应的 ETag"""
+        if not variant:
+            return self.etag
+        return hashlib.sha1(f'{self.etag}:{variant}'.encode('utf-8')).hexdigest()
+
+    def page(self, after_key: Optional[tuple], limit: int) -> Tuple[List[dict], bool]:
+        """返回排序键在 after_key 之后的一页作品，以及是否还有更多"""
+        start = 0
+        if after_key is not None:
+            if self._ascending_keys is None:
+                # 列表按排序键倒序，反转后可二分查找
+                self._ascending_keys = [work_sort_key(w) for w in reversed(self.works)]
+            start = len(self.works) - bisect.bisect_left(self._ascending_keys, after_key)
+        end = start + limit
+        return self.works[start:end], end < len(self.works)
+
+
+class WorksCache:
+    """进程内作品列表缓存"""
+
+    def __init__(self, store: WorksStore, serialize: Callable[[List[dict]], bytes]):
+        self.store = store
+        self.serialize = serialize
+        self._snapshot: Optional[WorksSnapshot] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self) -> WorksSnapshot:
+        """获取当前版本的快照，版本不一致时重新加载"""
+        version = self.store.version()
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == version:
+            self.hits += 1
+            return snapshot
+
+        with self._lock:
+            # 其他线程可能已经重建了快照
+            snapshot = self._snapshot
+            version = self.store.version()
+            if snapshot is not None and snapshot.version == version:
+                self.hits += 1
+                return snapshot
+
+            self.misses += 1
+            # 列表不含评论内容，评论数量再多也不影响列表的加载和序列化
+            works = sort_works(self.store.list_works())
+            snapshot = WorksSnapshot(version, works, self.serialize(works))
+            self._snapshot = snapshot
+            logger.debug(f"作品列表缓存已重建，版本: {version}")
+            return snapshot
+
+    def invalidate(self) -> None:
+        """手动清空缓存"""
+        self._snapshot = None
+
+    def stats(self) -> dict:
+        """缓存命中统计"""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0,
+            'version': str(self._snapshot.version) if self._snapshot else None
+        }
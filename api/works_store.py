@@ -0,0 +1,1220 @@
+#!/usr/bin/env python3
+"""
+作品数据存储模块 - 可插拔的存储后端
+支持 JSON 文件存储（默认）和 SQLite（WAL）存储，
+SQLite 后端对点赞、评论、置顶等单点修改只更新受影响的行
+"""
+
+import os
+import json
+import bisect
+import sqlite3
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import logging
+
+import json_codec
+from write_coordinator import FileLock, GroupCommitQueue, atomic_write
+from mutation_journal import MutationJournal, journal_entry
+from like_index import LikeIndex
+from leaderboard import LEADERBOARD_WINDOWS, Leaderboard
+from search_index import FIELD_WEIGHTS, SearchIndex, index_terms, page_results, query_terms, work_fields
+
+logger = logging.getLogger(__name__)
+
+
+class WorkNotFoundError(LookupError):
+    """作品不存在"""
+
+
+class CommentNotFoundError(LookupError):
+    """评论不存在"""
+
+
+class PermissionDeniedError(Exception):
+    """权限不足"""
+
+
+# 作品和点赞时间使用北京时间
+BEIJING_TZ = timezone(timedelta(hours=8))
+
+# 排行榜中返回的作品字段
+LEADERBOARD_FIELDS = ('id', 'title', 'username', 'realName', 'main_image_url', 'image_urls', 'likes', 'created_at')
+
+
+def work_sort_key(work: dict):
+    """作品排序键（与 reverse=True 配合使用）"""
+    return (not work.get('is_pinned', False), work.get('created_at', ''), work.get('id', ''))
+
+
+def sort_works(works: List[dict]) -> List[dict]:
+    """按置顶状态和创建时间排序"""
+    return sorted(works, key=work_sort_key, reverse=True)
+
+
+def comment_sort_key(comment: dict) -> tuple:
+    """评论排序键：按创建时间正序"""
+    return (comment.get('created_at', ''), comment.get('id', ''))
+
+
+def summarize_work(work: dict) -> dict:
+    """作品列表中的作品：评论只保留数量（评论内容通过评论接口分页获取）"""
+    work = dict(work)
+    work['comments_count'] = len(work.pop('comments', None) or [])
+    return work
+
+
+def normalize_work(work: dict) -> dict:
+    """补齐作品缺失的字段"""
+    if 'is_pinned' not in work:
+        work['is_pinned'] = False
+    return work
+
+
+def leaderboard_entry(work: dict, score: int) -> dict:
+    """排行榜中的作品摘要"""
+    entry = {key: work[key] for key in LEADERBOARD_FIELDS if key in work}
+    entry['score'] = score
+    return entry
+
+
+def _replace_image_url(work: dict, old_url: str, new_url: str) -> bool:
+    """把作品中的图片地址 old_url 替换为 new_url，返回是否有替换"""
+    image_urls = work.get('image_urls', [])
+    if old_url not in image_urls:
+        return False
+    work['image_urls'] = [new_url if url == old_url else url for url in image_urls]
+    if work.get('main_image_url') == old_url:
+        work['main_image_url'] = new_url
+    return True
+
+
+class WorksIndex:
+    """按ID索引的内存作品数据
+
+    - works: 作品ID -> 作品元数据（不含 liked_by 和 comments）
+    - comments: 作品ID -> {评论ID: 评论}（按添加顺序）
+    - likes: 点赞索引
+    - leaderboard: 点赞排行榜
+    - search_index: 全文搜索倒排索引（第一次搜索时建立）
+    查找、点赞、评论的增删都是 O(1)，修改时增量维护各个索引
+    """
+
+    def __init__(self, works: Iterable[dict] = ()):
+        self.works: Dict[str, dict] = {}
+        self.comments: Dict[str, Dict[str, dict]] = {}
+        self.likes = LikeIndex()
+        self.leaderboard = Leaderboard()
+        # 作品ID -> (评论排序键列表, 按时间排序的评论)，评论变化时失效
+        self._sorted_comments: Dict[str, Tuple[List[tuple], List[dict]]] = {}
+        self._search: Optional[SearchIndex] = None
+        for work in works:
+            self._add(work)
+
+    def __len__(self) -> int:
+        return len(self.works)
+
+    def _add(self, work: dict) -> None:
+        work = normalize_work(dict(work))
+        self.likes.add_work(work)
+        self.comments[work['id']] = {c['id']: c for c in work.pop('comments', None) or []}
+        work.pop('liked_by', None)
+        work.pop('like_times', None)
+        work['likes'] = self.likes.count(work['id'])
+        self.works[work['id']] = work
+        self.leaderboard.add_work(work['id'])
+        for user_id, ts in self.likes.like_times(work['id']).items():
+            self.leaderboard.like(work['id'], user_id, ts)
+        if self._search is not None:
+            self._search.add_work(work, self.comments[work['id']].values())
+
+    def _remove(self, work_id: str) -> dict:
+        work = self.materialize(self._require(work_id))
+        del self.works[work_id]
+        del self.comments[work_id]
+        self._sorted_comments.pop(work_id, None)
+        self.likes.remove_work(work_id)
+        self.leaderboard.remove_work(work_id)
+        if self._search is not None:
+            self._search.remove_work(work_id)
+        return work
+
+    def _require(self, work_id: str) -> dict:
+        work = self.works.get(work_id)
+        if work is None:
+            raise WorkNotFoundError(work_id)
+        return work
+
+    def materialize(self, work: dict, include_like_times: bool = False) -> dict:
+        """生成完整的作品字典（复制，调用方修改不会影响索引）
+
+        include_like_times: 写入快照时附带点赞时间，重新加载后时间窗口排行榜不丢失数据
+        """
+        work = dict(work)
+        work['liked_by'] = self.likes.liked_by(work['id'])
+        if include_like_times:
+            work['like_times'] = {user_id: ts for user_id, ts in self.likes.like_times(work['id']).items() if ts}
+        work['comments'] = list(self.comments[work['id']].values())
+        return work
+
+    def materialize_all(self, include_like_times: bool = False) -> List[dict]:
+        return [self.materialize(work, include_like_times) for work in self.works.values()]
+
+    def summary(self, work: dict) -> dict:
+        """不含评论内容的作品字典（只有 comments_count）"""
+        work = dict(work)
+        work['liked_by'] = self.likes.liked_by(work['id'])
+        work['comments_count'] = len(self.comments[work['id']])
+        return work
+
+    def summaries(self) -> List[dict]:
+        return [self.summary(work) for work in self.works.values()]
+
+    def get(self, work_id: str, include_comments: bool = True) -> Optional[dict]:
+        work = self.works.get(work_id)
+        if work is None:
+            return None
+        return self.materialize(work) if include_comments else self.summary(work)
+
+    def comment_page(self, work_id: str, after_key: Optional[tuple], limit: int) -> Tuple[List[dict], bool]:
+        """按创建时间排序的一页评论（after_key 之后），以及是否还有更多"""
+        self._require(work_id)
+        cached = self._sorted_comments.get(work_id)
+        if cached is None:
+            comments = sorted(self.comments[work_id].values(), key=comment_sort_key)
+            cached = self._sorted_comments[work_id] = ([comment_sort_key(c) for c in comments], comments)
+        keys, comments = cached
+        start = bisect.bisect_right(keys, after_key) if after_key is not None else 0
+        return comments[start:start + limit], start + limit < len(comments)
+
+    @property
+    def search_index(self) -> SearchIndex:
+        if self._search is None:
+            search = SearchIndex()
+            for work_id, work in self.works.items():
+                search.add_work(work, self.comments[work_id].values())
+            self._search = search
+        return self._search
+
+    def _comment_added(self, work_id: str, comment: dict) -> None:
+        self._sorted_comments.pop(work_id, None)
+        if self._search is not None:
+            self._search.add_comment(work_id, comment)
+
+    def _comment_removed(self, work_id: str, comment_id: str) -> None:
+        self._sorted_comments.pop(work_id, None)
+        if self._search is not None:
+            self._search.remove_comment(work_id, comment_id)
+
+    def search(self, query: str, after: Optional[tuple], limit: int) -> Tuple[List[dict], bool, int]:
+        """全文搜索：按相关度排序的一页作品摘要（score 为相关度）、是否还有更多、匹配总数"""
+        results = self.search_index.search(query)
+        page, has_more = page_results(results, after, limit)
+        works = []
+        for work_id, score in page:
+            work = self.summary(self.works[work_id])
+            work['score'] = score
+            works.append(work)
+        return works, has_more, len(results)
+
+    def top_liked(self, window: str, limit: int) -> List[dict]:
+        """排行榜前 limit 名的作品摘要，score 为时间窗口内的点赞数"""
+        result = []
+        for work_id, score in self.leaderboard.top(window, limit):
+            work = self.works[work_id]
+            result.append(leaderboard_entry(work, score))
+        return result
+
+    def apply(self, op: Dict[str, Any]):
+        """执行一次修改操作，返回操作结果"""
+        kind = op['op']
+
+        if kind == 'create_work':
+            self._add(op['work'])
+            return op['work']
+
+        if kind == 'delete_work':
+            return self._remove(op['work_id'])
+
+        if kind == 'toggle_like':
+            work = self._require(op['work_id'])
+            liked = self.likes.toggle(op['work_id'], op['user_id'], op.get('created_at', ''))
+            work['likes'] = self.likes.count(op['work_id'])
+            if liked:
+                self.leaderboard.like(op['work_id'], op['user_id'], op.get('created_at', ''))
+            else:
+                self.leaderboard.unlike(op['work_id'], op['user_id'])
+            return {'likes': work['likes'], 'liked': liked}
+
+        if kind == 'set_like':
+            # 点赞 / 取消点赞（已经是目标状态时不变）
+            self._require(op['work_id'])
+            if self.likes.has_liked(op['work_id'], op['user_id']) != op['liked']:
+                return self.apply(dict(op, op='toggle_like'))
+            return {'likes': self.likes.count(op['work_id']), 'liked': op['liked']}
+
+        if kind == 'add_comment':
+            self._require(op['work_id'])
+            comments = self.comments[op['work_id']]
+            if op['comment']['id'] in comments:
+                self._comment_removed(op['work_id'], op['comment']['id'])
+            comments[op['comment']['id']] = op['comment']
+            self._comment_added(op['work_id'], op['comment'])
+            return op['comment']
+
+        if kind == 'delete_comment':
+            self._require(op['work_id'])
+            comments = self.comments[op['work_id']]
+            comment = comments.get(op['comment_id'])
+            if comment is None:
+                raise CommentNotFoundError(op['comment_id'])
+            # 检查权限（管理员或评论作者）
+            if not op.get('is_admin') and comment['user_id'] != op.get('user_id'):
+                raise PermissionDeniedError(op['comment_id'])
+            self._comment_removed(op['work_id'], op['comment_id'])
+            return comments.pop(op['comment_id'])
+
+        if kind == 'toggle_pin':
+            work = self._require(op['work_id'])
+            work['is_pinned'] = not work.get('is_pinned', False)
+            return work['is_pinned']
+
+        if kind == 'set_pin':
+            work = self._require(op['work_id'])
+            work['is_pinned'] = bool(op['is_pinned'])
+            return work['is_pinned']
+
+        if kind == 'replace_image_url':
+            return _replace_image_url(self._require(op['work_id']), op['old_url'], op['new_url'])
+
+        raise ValueError(f"未知的操作类型: {kind}")
+
+    def replay(self, entry: Dict[str, Any]) -> None:
+        """重放一条修改日志记录（幂等）"""
+        kind = entry['op']
+
+        if kind == 'create_work':
+            if entry['work']['id'] not in self.works:
+                self._add(entry['work'])
+            return
+
+        work = self.works.get(entry['work_id'])
+        if work is None:
+            return
+
+        if kind == 'delete_work':
+            self._remove(entry['work_id'])
+        elif kind == 'like':
+            if self.likes.like(entry['work_id'], entry['user_id'], entry.get('ts', '')):
+                self.leaderboard.like(entry['work_id'], entry['user_id'], entry.get('ts', ''))
+            work['likes'] = self.likes.count(entry['work_id'])
+        elif kind == 'unlike':
+            if self.likes.unlike(entry['work_id'], entry['user_id']):
+                self.leaderboard.unlike(entry['work_id'], entry['user_id'])
+            work['likes'] = self.likes.count(entry['work_id'])
+        elif kind == 'add_comment':
+            comments = self.comments[entry['work_id']]
+            if entry['comment']['id'] not in comments:
+                comments[entry['comment']['id']] = entry['comment']
+                self._comment_added(entry['work_id'], entry['comment'])
+        elif kind == 'delete_comment':
+            if self.comments[entry['work_id']].pop(entry['comment_id'], None) is not None:
+                self._comment_removed(entry['work_id'], entry['comment_id'])
+        elif kind == 'set_pin':
+            work['is_pinned'] = entry['is_pinned']
+        elif kind == 'replace_image_url':
+            _replace_image_url(work, entry['old_url'], entry['new_url'])
+        else:
+            logger.error(f"未知的修改日志记录: {kind}")
+
+
+class WorksStore:
+    """作品存储基类
+
+    子类至少需要实现 load_works/save_works；默认的修改操作
+    通过“整体加载 - 修改 - 整体保存”完成，子类可覆盖 apply 做增量更新。
+    """
+
+    def load_works(self) -> List[dict]:
+        """加载全部作品（已排序）"""
+        raise NotImplementedError
+
+    def save_works(self, works: List[dict]) -> None:
+        """整体保存全部作品"""
+        raise NotImplementedError
+
+    def version(self) -> Any:
+        """数据版本标识，数据变化后返回值必然不同（用于缓存失效）"""
+        raise NotImplementedError
+
+    def warm_up(self) -> None:
+        """预先加载数据并建立内存索引（多进程服务器在 fork 之前调用，各 worker 共享）"""
+
+    def after_fork(self) -> None:
+        """fork 出的子进程中重建不能跨进程共享的资源（如数据库连接）"""
+
+    def is_empty(self) -> bool:
+        """是否还没有任何作品数据"""
+        return not self.list_works()
+
+    def export_works(self) -> List[dict]:
+        """导出全部作品（含评论），用于迁移和快照"""
+        return self.load_works()
+
+    def list_works(self) -> List[dict]:
+        """作品列表（不含评论内容，只有 comments_count）"""
+        return [summarize_work(work) for work in self.load_works()]
+
+    def get_work(self, work_id: str, include_comments: bool = True) -> Optional[dict]:
+        """按ID获取单个作品"""
+        for work in self.load_works():
+            if work['id'] == work_id:
+                return work if include_comments else summarize_work(work)
+        return None
+
+    def list_comments(self, work_id: str, after_key: Optional[tuple] = None,
+                      limit: int = 20) -> Tuple[List[dict], bool]:
+        """按创建时间排序的一页评论，以及是否还有更多"""
+        return WorksIndex(self.load_works()).comment_page(work_id, after_key, limit)
+
+    def search(self, query: str, after: Optional[tuple] = None,
+               limit: int = 20) -> Tuple[List[dict], bool, int]:
+        """全文搜索作品：一页结果（按相关度排序）、是否还有更多、匹配总数
+
+        after 为上一页最后一个结果的 (score, id)
+        """
+        return WorksIndex(self.load_works()).search(query, after, limit)
+
+    def apply(self, op: Dict[str, Any]):
+        """执行一次修改操作"""
+        index = WorksIndex(self.load_works())
+        result = index.apply(op)
+        self.save_works(index.materialize_all())
+        return result
+
+    def apply_batch(self, ops: List[Dict[str, Any]]) -> List[Tuple[bool, Any]]:
+        """一次加载、一次保存执行多个修改，返回与 ops 一一对应的 (ok, 结果或异常)
+
+        单个修改失败不影响其他修改
+        """
+        index = WorksIndex(self.load_works())
+        outcomes = []
+        for op in ops:
+            try:
+                outcomes.append((True, index.apply(op)))
+            except Exception as e:
+                outcomes.append((False, e))
+        if any(ok for ok, _ in outcomes):
+            self.save_works(index.materialize_all())
+        return outcomes
+
+    def create_work(self, work: dict) -> dict:
+        return self.apply({'op': 'create_work', 'work': work})
+
+    def delete_work(self, work_id: str) -> dict:
+        return self.apply({'op': 'delete_work', 'work_id': work_id})
+
+    def toggle_like(self, work_id: str, user_id: str, created_at: str = '') -> dict:
+        return self.apply({'op': 'toggle_like', 'work_id': work_id, 'user_id': user_id,
+                           'created_at': created_at})
+
+    def add_comment(self, work_id: str, comment: dict) -> dict:
+        return self.apply({'op': 'add_comment', 'work_id': work_id, 'comment': comment})
+
+    def delete_comment(self, work_id: str, comment_id: str, user_id: str, is_admin: bool = False) -> dict:
+        return self.apply({'op': 'delete_comment', 'work_id': work_id, 'comment_id': comment_id,
+                           'user_id': user_id, 'is_admin': is_admin})
+
+    def toggle_pin(self, work_id: str) -> bool:
+        return self.apply({'op': 'toggle_pin', 'work_id': work_id})
+
+    def set_pin(self, work_id: str, is_pinned: bool) -> bool:
+        return self.apply({'op': 'set_pin', 'work_id': work_id, 'is_pinned': is_pinned})
+
+    def set_like(self, work_id: str, user_id: str, liked: bool, created_at: str = '') -> dict:
+        return self.apply({'op': 'set_like', 'work_id': work_id, 'user_id': user_id, 'liked': liked,
+                           'created_at': created_at})
+
+    def replace_image_url(self, work_id: str, old_url: str, new_url: str) -> bool:
+        return self.apply({'op': 'replace_image_url', 'work_id': work_id, 'old_url': old_url, 'new_url': new_url})
+
+    def liked_status(self, user_id: str, work_ids: List[str]) -> Dict[str, bool]:
+        """批量查询用户对多个作品的点赞状态"""
+        liked = {work['id']: user_id in work.get('liked_by', []) for work in self.load_works()}
+        return {work_id: liked.get(work_id, False) for work_id in work_ids}
+
+    def leaderboard(self, window: str = 'all', limit: int = 10) -> List[dict]:
+        """点赞排行榜（window: day/week/all）"""
+        return WorksIndex(self.load_works()).top_liked(window, limit)
+
+
+def _file_signature(path: str) -> Optional[tuple]:
+    try:
+        st = os.stat(path)
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
+
+# 只修改评论的操作
+COMMENT_OPS = ('add_comment', 'delete_comment')
+
+
+class _JsonState:
+    """内存中的作品数据（快照 + 已重放的修改日志）及其对应的磁盘文件状态"""
+
+    def __init__(self, works: List[dict], snapshot_sig: Optional[tuple], journal_inode: Optional[int]):
+        self.index = WorksIndex(works)
+        self.snapshot_sig = snapshot_sig
+        self.journal_inode = journal_inode
+        self.journal_offset = 0
+
+
+class JsonWorksStore(WorksStore):
+    """JSON 文件存储（原 works.json 格式）
+
+    写入时持有进程间文件锁，并发的修改通过组提交合并为一次写入。
+    启用修改日志时，点赞、评论等修改只追加一行到 works.json.journal，
+    读取时在 works.json 快照之上重放，日志超过阈值后由后台线程压缩进新快照；
+    未启用时每次提交都原子地重写快照文件。
+
+    评论与作品元数据分开保存：works.json 不含评论内容，评论保存在 works.comments.json
+    （作品ID -> 评论列表）；未启用修改日志时，评论的增删只重写评论文件。
+
+    compact_json: 快照写成紧凑格式（无缩进和多余空格），文件更小、读写更快，但不便于人工查看
+    """
+
+    def __init__(self, data_file: str, commit_window: float = 0.005, journal: bool = False,
+                 journal_max_bytes: int = 1024 * 1024, journal_fsync: bool = True, compact_json: bool = False):
+        self.data_file = data_file
+        self.compact_json = compact_json
+        self.comments_file = os.path.splitext(data_file)[0] + '.comments.json'
+        self.lock = FileLock(data_file + '.lock')
+        self.commits = GroupCommitQueue(self._commit_ops, window=commit_window)
+        self.journal = MutationJournal(data_file + '.journal', fsync=journal_fsync) if journal else None
+        self.journal_max_bytes = journal_max_bytes
+        self.compactions = 0
+        self._state: Optional[_JsonState] = None
+        self._state_lock = threading.RLock()
+        self._compact_event = threading.Event()
+        self._compactor: Optional[threading.Thread] = None
+        # 进程内写入计数，弥补文件 mtime 精度不足
+        self._write_version = 0
+
+    def version(self) -> Any:
+        journal_sig = (self.journal.inode(), self.journal.size()) if self.journal else None
+        return (self._snapshot_signature(), journal_sig, self._write_version)
+
+    def _snapshot_signature(self) -> tuple:
+        return (_file_signature(self.data_file), _file_signature(self.comments_file))
+
+    def _read_works(self) -> List[dict]:
+        """读取作品快照和评论快照，文件损坏时抛出异常（避免用空列表覆盖原数据）"""
+        if not os.path.exists(self.data_file):
+            return []
+        with open(self.data_file, 'rb') as f:
+            works = json_codec.loads(f.read())
+        comments = {}
+        if os.path.exists(self.comments_file):
+            with open(self.comments_file, 'rb') as f:
+                comments = json_codec.loads(f.read())
+        for work in works:
+            # 确保每个作品都有置顶字段
+            normalize_work(work)
+            # 旧版本的评论内嵌在作品中，下次写入快照时移到评论文件
+            if work['id'] in comments:
+                work['comments'] = comments[work['id']]
+        return works
+
+    def _write_works(self, works: List[dict], write_works: bool = True, write_comments: bool = True) -> None:
+        """在持有文件锁时调用：原子写入快照（作品元数据和评论分别写入各自的文件）"""
+        # 旧版本数据还没有评论文件时，评论只存在于作品文件中，必须一起写出
+        if write_comments or not os.path.exists(self.comments_file):
+            comments = {work['id']: work.get('comments', []) for work in works}
+            atomic_write(self.comments_file, json_codec.dumps(comments, pretty=not self.compact_json))
+        if write_works:
+            # 与列表接口相同的顺序（work_sort_key）
+            sorted_works = [{k: v for k, v in work.items() if k != 'comments'} for work in sort_works(works)]
+            atomic_write(self.data_file, json_codec.dumps(sorted_works, pretty=not self.compact_json))
+        self._write_version += 1
+
+    def _refresh(self) -> _JsonState:
+        """让内存状态追上磁盘：快照变化时重新加载，否则只重放新增的日志"""
+        with self._state_lock:
+            for _ in range(5):
+                snapshot_sig = self._snapshot_signature()
+                journal_inode = self.journal.inode() if self.journal else None
+                state = self._state
+                if state is None or state.snapshot_sig != snapshot_sig or state.journal_inode != journal_inode:
+                    state = _JsonState(self._read_works(), snapshot_sig, journal_inode)
+
+                entries, offset = [], state.journal_offset
+                if self.journal:
+                    entries, offset = self.journal.read_from(state.journal_offset)
+                if self._snapshot_signature() != snapshot_sig:
+                    # 读取期间发生了压缩，重新读取
+                    continue
+
+                for entry in entries:
+                    state.index.replay(entry)
+                state.journal_offset = offset
+                self._state = state
+                return state
+            raise RuntimeError('作品数据读取冲突，请稍后重试')
+
+    def load_works(self) -> List[dict]:
+        """加载作品数据（快照 + 修改日志）"""
+        try:
+            with self._state_lock:
+                return self._refresh().index.materialize_all()
+        except Exception as e:
+            logger.error(f"加载作品数据失败: {e}")
+            return []
+
+    def save_works(self, works: List[dict]) -> None:
+        """保存作品数据到JSON文件（整体替换，并清空修改日志）"""
+        try:
+            with self.lock, self._state_lock:
+                self._write_works(works)
+                if self.journal:
+                    atomic_write(self.journal.path, b'')
+                self._state = None
+            logger.info(f"作品数据已保存，共 {len(works)} 个作品")
+        except Exception as e:
+            logger.error(f"保存作品数据失败: {e}")
+
+    def apply(self, op: Dict[str, Any]):
+        return self.commits.submit(op)
+
+    def apply_batch(self, ops: List[Dict[str, Any]]) -> List[Tuple[bool, Any]]:
+        # 整批作为一次组提交（一次日志追加或一次快照写入）
+        return self._commit_ops(ops) if ops else []
+
+    def warm_up(self) -> None:
+        with self._state_lock:
+            index = self._refresh().index
+            index.search_index
+        logger.info(f"作品数据和索引已加载，共 {len(index)} 个作品")
+
+    def liked_status(self, user_id: str, work_ids: List[str]) -> Dict[str, bool]:
+        with self._state_lock:
+            return self._refresh().index.likes.status(user_id, work_ids)
+
+    def list_works(self) -> List[dict]:
+        with self._state_lock:
+            return self._refresh().index.summaries()
+
+    def get_work(self, work_id: str, include_comments: bool = True) -> Optional[dict]:
+        with self._state_lock:
+            return self._refresh().index.get(work_id, include_comments)
+
+    def list_comments(self, work_id: str, after_key: Optional[tuple] = None,
+                      limit: int = 20) -> Tuple[List[dict], bool]:
+        with self._state_lock:
+            return self._refresh().index.comment_page(work_id, after_key, limit)
+
+    def leaderboard(self, window: str = 'all', limit: int = 10) -> List[dict]:
+        with self._state_lock:
+            return self._refresh().index.top_liked(window, limit)
+
+    def search(self, query: str, after: Optional[tuple] = None,
+               limit: int = 20) -> Tuple[List[dict], bool, int]:
+        with self._state_lock:
+            return self._refresh().index.search(query, after, limit)
+
+    def is_empty(self) -> bool:
+        # 不读取快照，只检查文件是否存在
+        return not os.path.exists(self.data_file) and not (self.journal and self.journal.size())
+
+    def export_works(self) -> List[dict]:
+        """导出全部作品（含点赞时间），用于迁移"""
+        with self._state_lock:
+            return self._refresh().index.materialize_all(include_like_times=True)
+
+    def _commit_ops(self, ops: List[Dict[str, Any]]) -> List[Tuple[bool, Any]]:
+        """组提交：加锁后追上最新数据，依次执行所有修改，只写一次"""
+        outcomes = []
+        entries = []
+        with self.lock, self._state_lock:
+            state = self._refresh()
+            try:
+                for op in ops:
+                    try:
+                        result = state.index.apply(op)
+                    except Exception as e:
+                        outcomes.append((False, e))
+                        continue
+                    outcomes.append((True, result))
+                    entries.append(journal_entry(op, result))
+
+                if entries and self.journal:
+                    # 只追加日志，写入量与修改数量成正比
+                    state.journal_offset += self.journal.append(entries)
+                    self._write_version += 1
+                elif entries:
+                    # 只有评论变化时不重写作品文件
+                    comment_ops = [entry['op'] in COMMENT_OPS for entry in entries]
+                    self._write_works(state.index.materialize_all(include_like_times=True),
+                                      write_works=not all(comment_ops), write_comments=any(comment_ops))
+                    state.snapshot_sig = self._snapshot_signature()
+            except Exception:
+                # 写入失败时内存状态可能与磁盘不一致，下次重新加载
+                self._state = None
+                raise
+
+        if self.journal and self.journal.size() > self.journal_max_bytes:
+            self._schedule_compaction()
+        logger.info(f"作品数据已保存，共 {len(state.index)} 个作品，本次合并 {len(ops)} 个修改")
+        return outcomes
+
+    # ---- 日志压缩 ----
+
+    def _schedule_compaction(self) -> None:
+        if self._compactor is None or not self._compactor.is_alive():
+            self._compactor = threading.Thread(target=self._compaction_loop, name='works-journal-compactor',
+                                               daemon=True)
+            self._compactor.start()
+        self._compact_event.set()
+
+    def _compaction_loop(self) -> None:
+        while True:
+            self._compact_event.wait()
+            self._compact_event.clear()
+            try:
+                self.compact()
+            except Exception as e:
+                logger.error(f"压缩修改日志失败: {e}")
+
+    def compact(self) -> None:
+        """把修改日志合并进新的 works.json 快照，然后清空日志"""
+        if not self.journal:
+            return
+        with self.lock, self._state_lock:
+            state = self._refresh()
+            if self.journal.size() == 0:
+                return
+            # 先写快照再替换日志；中途崩溃时日志会被重放到新快照上，结果不变
+            self._write_works(state.index.materialize_all(include_like_times=True))
+            atomic_write(self.journal.path, b'')
+            state.snapshot_sig = self._snapshot_signature()
+            state.journal_inode = self.journal.inode()
+            state.journal_offset = 0
+            self.compactions += 1
+        logger.info(f"修改日志已压缩进快照，共 {len(state.index)} 个作品")
+
+
+# SQLite 表结构：作品、评论、点赞分别一行
+SQLITE_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS works (
+    id TEXT PRIMARY KEY,
+    title TEXT NOT NULL DEFAULT '',
+    description TEXT NOT NULL DEFAULT '',
+    image_urls TEXT NOT NULL DEFAULT '[]',
+    main_image_url TEXT,
+    likes INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT NOT NULL DEFAULT '',
+    username TEXT NOT NULL DEFAULT '',
+    realName TEXT NOT NULL DEFAULT '',
+    is_pinned INTEGER NOT NULL DEFAULT 0,
+    extra TEXT NOT NULL DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS idx_works_order ON works (is_pinned, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_works_likes ON works (likes DESC);
+
+CREATE TABLE IF NOT EXISTS comments (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    work_id TEXT NOT NULL REFERENCES works (id) ON DELETE CASCADE,
+    content TEXT NOT NULL DEFAULT '',
+    user_id TEXT NOT NULL DEFAULT '',
+    username TEXT NOT NULL DEFAULT '',
+    created_at TEXT NOT NULL DEFAULT '',
+    extra TEXT NOT NULL DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS idx_comments_work ON comments (work_id, seq);
+CREATE INDEX IF NOT EXISTS idx_comments_time ON comments (work_id, created_at, id);
+
+CREATE TABLE IF NOT EXISTS likes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    work_id TEXT NOT NULL REFERENCES works (id) ON DELETE CASCADE,
+    user_id TEXT NOT NULL,
+    created_at TEXT NOT NULL DEFAULT '',
+    UNIQUE (work_id, user_id)
+);
+CREATE INDEX IF NOT EXISTS idx_likes_user ON likes (user_id);
+CREATE INDEX IF NOT EXISTS idx_likes_time ON likes (created_at, work_id);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+'''
+
+# 全文搜索表：保存 index_terms 切好的词（空格分隔），中日韩文字的 bigram 也能按词匹配
+SEARCH_COLUMNS = ('title', 'author', 'description', 'comments')
+SQLITE_SEARCH_SCHEMA = f'''
+CREATE VIRTUAL TABLE IF NOT EXISTS works_fts USING fts5(
+    work_id UNINDEXED, {', '.join(SEARCH_COLUMNS)}, tokenize = 'unicode61 remove_diacritics 0'
+)
+'''
+
+WORK_COLUMNS = ('id', 'title', 'description', 'main_image_url', 'likes',
+                'created_at', 'username', 'realName')
+COMMENT_COLUMNS = ('id', 'content', 'user_id', 'username', 'created_at')
+
+
+class SQLiteWorksStore(WorksStore):
+    """SQLite 存储（WAL 模式），单点修改只更新受影响的行"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._connect().executescript(SQLITE_SCHEMA)
+        try:
+            self._connect().execute(SQLITE_SEARCH_SCHEMA)
+            self.fts_enabled = True
+        except sqlite3.OperationalError as e:
+            logger.warning(f"SQLite不支持FTS5，搜索将在内存中进行: {e}")
+            self.fts_enabled = False
+        if self.fts_enabled and self.get_meta('search_indexed') is None:
+            self._rebuild_search_index()
+        logger.info(f"SQLite作品存储已启用: {db_path}")
+
+    def _connect(self) -> sqlite3.Connection:
+        # 每个线程使用独立连接
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA foreign_keys=ON')
+            conn.execute('PRAGMA busy_timeout=5000')
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self):
+        return _Transaction(self._connect())
+
+    def after_fork(self) -> None:
+        # SQLite 连接不能在 fork 前后的进程之间共用
+        self._local = threading.local()
+
+    # ---- 行与字典之间的转换 ----
+
+    @staticmethod
+    def _work_row(work: dict) -> tuple:
+        extra = {k: v for k, v in work.items()
+                 if k not in WORK_COLUMNS and k not in ('image_urls', 'is_pinned', 'liked_by', 'like_times', 'comments')}
+        return (work['id'], work.get('title', ''), work.get('description', ''),
+                json.dumps(work.get('image_urls', []), ensure_ascii=False),
+                work.get('main_image_url'), work.get('likes', 0), work.get('created_at', ''),
+                work.get('username', ''), work.get('realName', ''),
+                1 if work.get('is_pinned') else 0, json.dumps(extra, ensure_ascii=False))
+
+    @staticmethod
+    def _comment_row(work_id: str, comment: dict) -> tuple:
+        extra = {k: v for k, v in comment.items() if k not in COMMENT_COLUMNS}
+        return (comment['id'], work_id, comment.get('content', ''), comment.get('user_id', ''),
+                comment.get('username', ''), comment.get('created_at', ''),
+                json.dumps(extra, ensure_ascii=False))
+
+    @staticmethod
+    def _row_to_work(row: sqlite3.Row) -> dict:
+        work = {key: row[key] for key in WORK_COLUMNS}
+        work['image_urls'] = json.loads(row['image_urls'])
+        if work['main_image_url'] is None:
+            del work['main_image_url']
+        work['is_pinned'] = bool(row['is_pinned'])
+        work['liked_by'] = []
+        work['comments'] = []
+        work.update(json.loads(row['extra']))
+        return work
+
+    @staticmethod
+    def _row_to_comment(row: sqlite3.Row) -> dict:
+        comment = {key: row[key] for key in COMMENT_COLUMNS}
+        comment.update(json.loads(row['extra']))
+        return comment
+
+    def _insert_work(self, conn: sqlite3.Connection, work: dict) -> None:
+        if 'image_urls' not in work and work.get('image_url'):
+            # 旧版本：单图支持，转换为多图格式并保留原字段
+            work = dict(work, image_urls=[work['image_url']])
+            work.setdefault('main_image_url', work['image_url'])
+        conn.execute('INSERT INTO works (id, title, description, image_urls, main_image_url, likes, '
+                     'created_at, username, realName, is_pinned, extra) '
+                     'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', self._work_row(work))
+        like_times = work.get('like_times') or {}
+        conn.executemany('INSERT OR IGNORE INTO likes (work_id, user_id, created_at) VALUES (?, ?, ?)',
+                         [(work['id'], user_id, like_times.get(user_id, '')) for user_id in work.get('liked_by', [])])
+        conn.executemany('INSERT INTO comments (id, work_id, content, user_id, username, created_at, extra) '
+                         'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                         [self._comment_row(work['id'], c) for c in work.get('comments', [])])
+        self._index_work(conn, work['id'])
+
+    # ---- 全文搜索索引 ----
+
+    def _index_work(self, conn: sqlite3.Connection, work_id: str) -> None:
+        """重新生成作品的搜索索引行（FTS 行的 rowid 与 works 表相同）"""
+        if not self.fts_enabled:
+            return
+        row = conn.execute('SELECT rowid, * FROM works WHERE id = ?', (work_id,)).fetchone()
+        conn.execute('DELETE FROM works_fts WHERE rowid = ?', (row['rowid'],))
+        comments = [r['content'] for r in conn.execute('SELECT content FROM comments WHERE work_id = ? '
+                                                       'ORDER BY seq', (work_id,))]
+        fields = dict(work_fields(dict(row)), comments='\n'.join(comments))
+        conn.execute(f"INSERT INTO works_fts (rowid, work_id, {', '.join(SEARCH_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?)",
+                     (row['rowid'], work_id, *(' '.join(index_terms(fields[c])) for c in SEARCH_COLUMNS)))
+
+    def _unindex_work(self, conn: sqlite3.Connection, work_id: str) -> None:
+        if self.fts_enabled:
+            conn.execute('DELETE FROM works_fts WHERE rowid = (SELECT rowid FROM works WHERE id = ?)', (work_id,))
+
+    def _rebuild_search_index(self) -> None:
+        with self._transaction() as conn:
+            if self.get_meta('search_indexed') is not None:
+                return
+            conn.execute('DELETE FROM works_fts')
+            work_ids = [row['id'] for row in conn.execute('SELECT id FROM works')]
+            for work_id in work_ids:
+                self._index_work(conn, work_id)
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('search_indexed', '1')")
+        logger.info(f"全文搜索索引已建立，共 {len(work_ids)} 个作品")
+
+    def _fetch_works(self, conn: sqlite3.Connection, where: str = '', params: tuple = (),
+                     include_comments: bool = True) -> List[dict]:
+        """查询作品；include_comments=False 时不读取评论内容，只统计 comments_count"""
+        rows = conn.execute(f'SELECT * FROM works {where} '
+                            'ORDER BY is_pinned ASC, created_at DESC, id DESC', params).fetchall()
+        works = [self._row_to_work(row) for row in rows]
+        by_id = {w['id']: w for w in works}
+        if not by_id:
+            return works
+
+        in_clause = f"WHERE work_id IN ({','.join('?' * len(by_id))})" if where else ''
+        in_params = tuple(by_id) if where else ()
+        like_rows = conn.execute(f'SELECT work_id, user_id FROM likes {in_clause} ORDER BY seq', in_params).fetchall()
+        for row in like_rows:
+            by_id[row['work_id']]['liked_by'].append(row['user_id'])
+
+        if include_comments:
+            comment_rows = conn.execute(f'SELECT * FROM comments {in_clause} ORDER BY seq', in_params).fetchall()
+            for row in comment_rows:
+                by_id[row['work_id']]['comments'].append(self._row_to_comment(row))
+        else:
+            for work in works:
+                del work['comments']
+                work['comments_count'] = 0
+            count_rows = conn.execute(f'SELECT work_id, COUNT(*) AS n FROM comments {in_clause} '
+                                      'GROUP BY work_id', in_params).fetchall()
+            for row in count_rows:
+                by_id[row['work_id']]['comments_count'] = row['n']
+        return works
+
+    def _bump_version(self, conn: sqlite3.Connection) -> None:
+        conn.execute("INSERT INTO meta (key, value) VALUES ('version', '1') "
+                     "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1")
+
+    # ---- WorksStore 接口 ----
+
+    def version(self) -> Any:
+        return self.get_meta('version')
+
+    def load_works(self) -> List[dict]:
+        try:
+            return self._fetch_works(self._connect())
+        except Exception as e:
+            logger.error(f"加载作品数据失败: {e}")
+            return []
+
+    def save_works(self, works: List[dict]) -> None:
+        try:
+            with self._transaction() as conn:
+                conn.execute('DELETE FROM works')
+                if self.fts_enabled:
+                    conn.execute('DELETE FROM works_fts')
+                for work in works:
+                    self._insert_work(conn, normalize_work(work))
+                self._bump_version(conn)
+            logger.info(f"作品数据已保存，共 {len(works)} 个作品")
+        except Exception as e:
+            logger.error(f"保存作品数据失败: {e}")
+
+    def list_works(self) -> List[dict]:
+        return self._fetch_works(self._connect(), include_comments=False)
+
+    def get_work(self, work_id: str, include_comments: bool = True) -> Optional[dict]:
+        works = self._fetch_works(self._connect(), 'WHERE id = ?', (work_id,), include_comments)
+        return works[0] if works else None
+
+    def list_comments(self, work_id: str, after_key: Optional[tuple] = None,
+                      limit: int = 20) -> Tuple[List[dict], bool]:
+        conn = self._connect()
+        self._require_work(conn, work_id)
+        if after_key is None:
+            rows = conn.execute('SELECT * FROM comments WHERE work_id = ? ORDER BY created_at, id LIMIT ?',
+                                (work_id, limit + 1)).fetchall()
+        else:
+            rows = conn.execute('SELECT * FROM comments WHERE work_id = ? AND (created_at, id) > (?, ?) '
+                                'ORDER BY created_at, id LIMIT ?', (work_id, *after_key, limit + 1)).fetchall()
+        return [self._row_to_comment(row) for row in rows[:limit]], len(rows) > limit
+
+    def liked_status(self, user_id: str, work_ids: List[str]) -> Dict[str, bool]:
+        result = dict.fromkeys(work_ids, False)
+        if work_ids:
+            placeholders = ','.join('?' * len(work_ids))
+            rows = self._connect().execute(f'SELECT work_id FROM likes WHERE user_id = ? '
+                                           f'AND work_id IN ({placeholders})', (user_id, *work_ids))
+            for row in rows:
+                result[row['work_id']] = True
+        return result
+
+    def leaderboard(self, window: str = 'all', limit: int = 10) -> List[dict]:
+        conn = self._connect()
+        seconds = LEADERBOARD_WINDOWS[window]
+        if seconds is None:
+            rows = conn.execute('SELECT * FROM works ORDER BY likes DESC LIMIT ?', (limit,)).fetchall()
+            return [leaderboard_entry(self._row_to_work(row), row['likes']) for row in rows]
+
+        # 点赞时间与作品时间一样为北京时间 ISO 格式，可以直接按字符串比较
+        cutoff = (datetime.now(BEIJING_TZ) - timedelta(seconds=seconds)).isoformat()
+        rows = conn.execute('SELECT w.*, t.score FROM (SELECT work_id, COUNT(*) AS score FROM likes '
+                            'WHERE created_at >= ? GROUP BY work_id ORDER BY score DESC LIMIT ?) t '
+                            'JOIN works w ON w.id = t.work_id ORDER BY t.score DESC',
+                            (cutoff, limit)).fetchall()
+        return [leaderboard_entry(self._row_to_work(row), row['score']) for row in rows]
+
+    def search(self, query: str, after: Optional[tuple] = None,
+               limit: int = 20) -> Tuple[List[dict], bool, int]:
+        if not self.fts_enabled:
+            return super().search(query, after, limit)
+        terms = query_terms(query)
+        if not terms:
+            return [], False, 0
+        # 所有词都要匹配；词只含字母数字和中日韩文字，加引号即可
+        match = ' '.join(f'"{term}"' for term in terms)
+        weights = ', '.join(str(FIELD_WEIGHTS[c]) for c in SEARCH_COLUMNS)
+        ranked = f'SELECT work_id, ROUND(-bm25(works_fts, 0, {weights}), 6) AS score FROM works_fts WHERE works_fts MATCH ?'
+        conn = self._connect()
+        if after is None:
+            rows = conn.execute(f'SELECT * FROM ({ranked}) ORDER BY score DESC, work_id LIMIT ?',
+                                (match, limit + 1)).fetchall()
+        else:
+            rows = conn.execute(f'SELECT * FROM ({ranked}) WHERE score < ? OR (score = ? AND work_id > ?) '
+                                'ORDER BY score DESC, work_id LIMIT ?',
+                                (match, after[0], after[0], after[1], limit + 1)).fetchall()
+        total = conn.execute('SELECT COUNT(*) FROM works_fts WHERE works_fts MATCH ?', (match,)).fetchone()[0]
+
+        scores = {row['work_id']: row['score'] for row in rows[:limit]}
+        works = []
+        if scores:
+            found = self._fetch_works(conn, f"WHERE id IN ({','.join('?' * len(scores))})", tuple(scores),
+                                      include_comments=False)
+            by_id = {work['id']: work for work in found}
+            for work_id, score in scores.items():
+                work = by_id[work_id]
+                work['score'] = score
+                works.append(work)
+        return works, len(rows) > limit, total
+
+    def apply(self, op: Dict[str, Any]):
+        handler = getattr(self, f"_op_{op['op']}", None)
+        if handler is None:
+            raise ValueError(f"未知的操作类型: {op['op']}")
+        with self._transaction() as conn:
+            result = handler(conn, op)
+            self._bump_version(conn)
+        return result
+
+    def apply_batch(self, ops: List[Dict[str, Any]]) -> List[Tuple[bool, Any]]:
+        # 一个事务；每个修改一个保存点，失败的修改单独回滚
+        outcomes = []
+        with self._transaction() as conn:
+            for op in ops:
+                handler = getattr(self, f"_op_{op['op']}", None)
+                if handler is None:
+                    outcomes.append((False, ValueError(f"未知的操作类型: {op['op']}")))
+                    continue
+                conn.execute('SAVEPOINT batch_op')
+                try:
+                    result = handler(conn, op)
+                except Exception as e:
+                    conn.execute('ROLLBACK TO batch_op')
+                    outcomes.append((False, e))
+                else:
+                    outcomes.append((True, result))
+                conn.execute('RELEASE batch_op')
+            if any(ok for ok, _ in outcomes):
+                self._bump_version(conn)
+        return outcomes
+
+    @staticmethod
+    def _require_work(conn: sqlite3.Connection, work_id: str) -> sqlite3.Row:
+        row = conn.execute('SELECT id, likes, is_pinned FROM works WHERE id = ?', (work_id,)).fetchone()
+        if row is None:
+            raise WorkNotFoundError(work_id)
+        return row
+
+    def _op_create_work(self, conn, op):
+        self._insert_work(conn, normalize_work(op['work']))
+        return op['work']
+
+    def _op_delete_work(self, conn, op):
+        works = self._fetch_works(conn, 'WHERE id = ?', (op['work_id'],))
+        if not works:
+            raise WorkNotFoundError(op['work_id'])
+        self._unindex_work(conn, op['work_id'])
+        conn.execute('DELETE FROM works WHERE id = ?', (op['work_id'],))
+        return works[0]
+
+    def _op_toggle_like(self, conn, op):
+        self._require_work(conn, op['work_id'])
+        deleted = conn.execute('DELETE FROM likes WHERE work_id = ? AND user_id = ?',
+                               (op['work_id'], op['user_id'])).rowcount
+        if deleted:
+            conn.execute('UPDATE works SET likes = likes - 1 WHERE id = ?', (op['work_id'],))
+        else:
+            conn.execute('INSERT INTO likes (work_id, user_id, created_at) VALUES (?, ?, ?)',
+                         (op['work_id'], op['user_id'], op.get('created_at', '')))
+            conn.execute('UPDATE works SET likes = likes + 1 WHERE id = ?', (op['work_id'],))
+        likes = conn.execute('SELECT likes FROM works WHERE id = ?', (op['work_id'],)).fetchone()[0]
+        return {'likes': likes, 'liked': not deleted}
+
+    def _op_add_comment(self, conn, op):
+        self._require_work(conn, op['work_id'])
+        conn.execute('INSERT INTO comments (id, work_id, content, user_id, username, created_at, extra) '
+                     'VALUES (?, ?, ?, ?, ?, ?, ?)', self._comment_row(op['work_id'], op['comment']))
+        self._index_work(conn, op['work_id'])
+        return op['comment']
+
+    def _op_delete_comment(self, conn, op):
+        self._require_work(conn, op['work_id'])
+        row = conn.execute('SELECT * FROM comments WHERE work_id = ? AND id = ?',
+                           (op['work_id'], op['comment_id'])).fetchone()
+        if row is None:
+            raise CommentNotFoundError(op['comment_id'])
+        # 检查权限（管理员或评论作者）
+        if not op.get('is_admin') and row['user_id'] != op.get('user_id'):
+            raise PermissionDeniedError(op['comment_id'])
+        conn.execute('DELETE FROM comments WHERE seq = ?', (row['seq'],))
+        self._index_work(conn, op['work_id'])
+        return self._row_to_comment(row)
+
+    def _op_set_like(self, conn, op):
+        self._require_work(conn, op['work_id'])
+        liked = conn.execute('SELECT 1 FROM likes WHERE work_id = ? AND user_id = ?',
+                             (op['work_id'], op['user_id'])).fetchone() is not None
+        if liked != op['liked']:
+            return self._op_toggle_like(conn, op)
+        likes = conn.execute('SELECT likes FROM works WHERE id = ?', (op['work_id'],)).fetchone()[0]
+        return {'likes': likes, 'liked': liked}
+
+    def _op_set_pin(self, conn, op):
+        self._require_work(conn, op['work_id'])
+        conn.execute('UPDATE works SET is_pinned = ? WHERE id = ?', (1 if op['is_pinned'] else 0, op['work_id']))
+        return bool(op['is_pinned'])
+
+    def _op_toggle_pin(self, conn, op):
+        row = self._require_work(conn, op['work_id'])
+        is_pinned = not row['is_pinned']
+        conn.execute('UPDATE works SET is_pinned = ? WHERE id = ?', (1 if is_pinned else 0, op['work_id']))
+        return is_pinned
+
+    def _op_replace_image_url(self, conn, op):
+        self._require_work(conn, op['work_id'])
+        row = conn.execute('SELECT image_urls, main_image_url FROM works WHERE id = ?', (op['work_id'],)).fetchone()
+        work = {'image_urls': json.loads(row['image_urls']), 'main_image_url': row['main_image_url']}
+        if not _replace_image_url(work, op['old_url'], op['new_url']):
+            return False
+        conn.execute('UPDATE works SET image_urls = ?, main_image_url = ? WHERE id = ?',
+                     (json.dumps(work['image_urls'], ensure_ascii=False), work['main_image_url'], op['work_id']))
+        return True
+
+    # ---- 迁移 ----
+
+    def is_empty(self) -> bool:
+        return self._connect().execute('SELECT 1 FROM works LIMIT 1').fetchone() is None
+
+    def get_meta(self, key: str) -> Optional[str]:
+        row = self._connect().execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def import_works(self, works: List[dict], source: str = '') -> int:
+        """一次性导入作品（兼容旧版单图 image_url 记录）"""
+        with self._transaction() as conn:
+            for work in works:
+                work = normalize_work(dict(work))
+                liked_by = list(dict.fromkeys(work.get('liked_by', [])))
+                work['liked_by'] = liked_by
+                work['likes'] = len(liked_by)
+                self._unindex_work(conn, work['id'])
+                conn.execute('DELETE FROM works WHERE id = ?', (work['id'],))
+                self._insert_work(conn, work)
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('migrated_from', ?)", (source,))
+            self._bump_version(conn)
+        logger.info(f"已导入 {len(works)} 个作品到SQLite: {source}")
+        return len(works)
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT/ROLLBACK 上下文"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.conn.execute('BEGIN IMMEDIATE')
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.conn.execute('COMMIT')
+        else:
+            self.conn.execute('ROLLBACK')
+        return False
+
+
+def migrate_json_to_sqlite(json_path: str, db_path: str) -> int:
+    """将 works.json 一次性迁移到 SQLite 数据库"""
+    works = JsonWorksStore(json_path, journal=True).export_works()
+    return SQLiteWorksStore(db_path).import_works(works, source=os.path.abspath(json_path))
+
+
+def create_works_store(data_file: str, db_path: Optional[str] = None, backend: Optional[str] = None) -> WorksStore:
+    """创建作品存储实例，通过 WORKS_STORE 环境变量选择后端（json/sqlite）"""
+    backend = (backend or os.environ.get('WORKS_STORE', 'json')).lower()
+
+    if backend == 'sqlite':
+        db_path = db_path or os.path.splitext(data_file)[0] + '.db'
+        store = SQLiteWorksStore(db_path)
+        # 首次启用时自动从 works.json 迁移
+        if store.is_empty() and store.get_meta('migrated_from') is None and os.path.exists(data_file):
+            store.import_works(JsonWorksStore(data_file, journal=True).export_works(),
+                               source=os.path.abspath(data_file))
+        return store
+
+    # 组提交窗口：该时间内到达的修改合并为一次写入
+    commit_window = float(os.environ.get('WORKS_COMMIT_WINDOW_MS', '5')) / 1000
+    return JsonWorksStore(
+        data_file,
+        commit_window=commit_window,
+        journal=os.environ.get('WORKS_JOURNAL', '1') != '0',
+        journal_max_bytes=int(os.environ.get('WORKS_JOURNAL_MAX_BYTES', str(1024 * 1024))),
+        journal_fsync=os.environ.get('WORKS_JOURNAL_FSYNC', '1') != '0',
+        compact_json=os.environ.get('WORKS_JSON_COMPACT') == '1'
+    )
+
+
+if __name__ == '__main__':
+    import sys
+
+    if len(sys.argv) >= 2 and sys.argv[1] == 'migrate':
+        source = sys.argv[2] if len(sys.argv) > 2 else 'works.json'
+        target = sys.argv[3] if len(sys.argv) > 3 else os.path.splitext(source)[0] + '.db'
+        logging.basicConfig(level=logging.INFO)
+        count = migrate_json_to_sqlite(source, target)
+        print(f"迁移完成: {source} -> {target}，共 {count} 个作品")
+    else:
+        print("用法: python works_store.py migrate [works.json] [works.db]")
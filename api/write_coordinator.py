@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+写入协调模块 - 保证多进程/多线程下 works.json 写入安全
+- FileLock: 进程间文件锁（fcntl.flock）
+- atomic_write: 写临时文件 + fsync + os.replace，崩溃时不会留下半个文件
+- GroupCommitQueue: 把几毫秒内到达的修改合并成一次读写
+"""
+
+import os
+import time
+import fcntl
+import threading
+from typing import Any, Callable, List, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class FileLock:
+    """基于 fcntl.flock 的进程间排它锁"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+    def __enter__(self):
+        # 每次加锁都打开新的文件描述符，同一进程内的不同线程之间也互斥
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        except Exception:
+            os.close(fd)
+            raise
+        self._local.fd = fd
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        fd = self._local.fd
+        self._local.fd = None
+        try:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+        return False
+
+
+def atomic_write(path: str, data: bytes) -> None:
+    """原子地替换文件内容"""
+    directory = os.path.dirname(os.path.abspath(path))
+    tmp_path = os.path.join(directory, f'.{os.path.basename(path)}.{os.getpid()}.{threading.get_ident()}.tmp')
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    # 同步目录项，确保改名在断电后仍然生效
+    try:
+        dir_fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+    except OSError:
+        pass
+
+
+class _PendingOp:
+    """等待提交的一次修改"""
+
+    def __init__(self, op: Any):
+        self.op = op
+        self.ok = False
+        self.value: Any = None
+        self.done = threading.Event()
+
+    def resolve(self, ok: bool, value: Any) -> None:
+        self.ok = ok
+        self.value = value
+        self.done.set()
+
+    def result(self) -> Any:
+        self.done.wait()
+        if not self.ok:
+            raise self.value
+        return self.value
+
+
+class GroupCommitQueue:
+    """组提交队列
+
+    第一个到达的线程成为 leader，等待 window 秒收集同时到达的修改，
+    然后调用 commit(ops) 一次性提交；commit 返回与 ops 一一对应的 (ok, 结果或异常)。
+    """
+
+    def __init__(self, commit: Callable[[List[Any]], List[Tuple[bool, Any]]],
+                 window: float = 0.005, max_batch: int = 256):
+        self.commit = commit
+        self.window = window
+        self.max_batch = max_batch
+        self._pending: List[_PendingOp] = []
+        self._leader_active = False
+        self._cond = threading.Condition()
+        self.batches = 0
+        self.committed_ops = 0
+
+    def submit(self, op: Any) -> Any:
+        """提交一次修改并等待结果"""
+        item = _PendingOp(op)
+        with self._cond:
+            self._pending.append(item)
+            while self._leader_active and not item.done.is_set():
+                self._cond.wait()
+            if item.done.is_set():
+                return item.result()
+            self._leader_active = True
+
+        try:
+            if self.window > 0:
+                time.sleep(self.window)
+            with self._cond:
+                batch = self._pending[:self.max_batch]
+                del self._pending[:self.max_batch]
+            self._commit_batch(batch)
+        finally:
+            with self._cond:
+                self._leader_active = False
+                self._cond.notify_all()
+
+        # 队列过长时自己的修改可能留给下一个 leader
+        return item.result()
+
+    def _commit_batch(self, batch: List[_PendingOp]) -> None:
+        try:
+            outcomes = self.commit([item.op for item in batch])
+        except Exception as e:
+            logger.error(f"批量提交失败: {e}")
+            outcomes = [(False, e)] * len(batch)
+        for item, (ok, value) in zip(batch, outcomes):
+            item.resolve(ok, value)
+        self.batches += 1
+        self.committed_ops += len(batch)
+
+    def stats(self) -> dict:
+        """组提交统计"""
+        return {
+            'batches': self.batches,
+            'committed_ops': self.committed_ops,
+            'avg_batch_size': round(self.committed_ops / self.batches, 2) if self.batches else 0.0
+        }
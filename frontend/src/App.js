@@ -1,4 +1,4 @@
-import React, { useState, useEffect, useCallback } from 'react';
+import React, { useState, useEffect, useCallback, useRef } from 'react';
 import axios from 'axios';
 import './App.css';
 import WorkCard from './components/WorkCard';
@@ -15,6 +15,15 @@ if (!process.env.NODE_ENV) {
   console.log('NODE_ENV未设置，使用开发环境配置');
 }
 
+// 与后端 work_sort_key 相同：按 (未置顶, 创建时间, ID) 倒序，即置顶的作品排在最后；
+// 按字符逐个比较（与 Python 的字符串比较一致），不使用 localeCompare
+const compare = (x, y) => (x < y ? -1 : x > y ? 1 : 0);
+const sortWorks = (works) => [...works].sort((a, b) =>
+  compare(Number(!b.is_pinned), Number(!a.is_pinned)) ||
+  compare(b.created_at || '', a.created_at || '') ||
+  compare(b.id || '', a.id || '')
+);
+
 function App() {
   const [works, setWorks] = useState([]);
   const [loading, setLoading] = useState(true);
@@ -31,38 +40,68 @@ function App() {
   
   // 排行榜数据
   const [leaderboard, setLeaderboard] = useState([]);
+  const [leaderboardWindow, setLeaderboardWindow] = useState('all');
   const [showWelcome, setShowWelcome] = useState(true);
+  const [searchQuery, setSearchQuery] = useState('');
+  // 搜索结果的作品ID（按相关度排序），null 表示未在搜索
+  const [searchResults, setSearchResults] = useState(null);
   
   // 生成用户ID
   const userId = localStorage.getItem('userId') || `user_${Math.random().toString(36).substr(2, 9)}`;
   localStorage.setItem('userId', userId);
   
-  // 每5分钟更新排行榜
+  // 从服务器获取排行榜（由后端增量维护），每5分钟刷新一次
+  const fetchLeaderboard = useCallback(async () => {
+    try {
+      const response = await axios.get(`${API_BASE_URL}/api/leaderboard`, {
+        params: { window: leaderboardWindow, limit: 10 }
+      });
+      const newLeaderboard = response.data.works;
+      // 只有当排行榜真正发生变化时才更新状态
+      setLeaderboard(prevLeaderboard =>
+        JSON.stringify(prevLeaderboard) !== JSON.stringify(newLeaderboard) ? newLeaderboard : prevLeaderboard
+      );
+    } catch (err) {
+      console.error('❌ 获取排行榜失败:', err.message);
+    }
+  }, [leaderboardWindow]);
+
   useEffect(() => {
-    console.log('🔄 App useEffect 执行 (排行榜定时器):', new Date().toISOString());
-    
-    const interval = setInterval(() => {
-      console.log('⏰ 排行榜定时器执行:', new Date().toISOString());
-      if (works.length > 0) {
-        const sorted = [...works].sort((a, b) => b.likes - a.likes);
-        const newLeaderboard = sorted.slice(0, 10);
-        // 只有当排行榜真正发生变化时才更新状态
-        setLeaderboard(prevLeaderboard => {
-          if (JSON.stringify(prevLeaderboard) !== JSON.stringify(newLeaderboard)) {
-            console.log('📊 定时器排行榜更新:', {
-              prevLength: prevLeaderboard.length,
-              newLength: newLeaderboard.length,
-              timestamp: new Date().toISOString()
-            });
-            return newLeaderboard;
-          }
-          return prevLeaderboard;
-        });
-      }
-    }, 5 * 60 * 1000);
+    fetchLeaderboard();
+    const interval = setInterval(fetchLeaderboard, 5 * 60 * 1000);
     return () => clearInterval(interval);
-  }, [works]);
+  }, [fetchLeaderboard]);
   
+  // 全文搜索（标题、描述、作者、评论），结果按相关度排序
+  const handleSearch = async (e) => {
+    e.preventDefault();
+    const query = searchQuery.trim();
+    if (!query) {
+      setSearchResults(null);
+      return;
+    }
+    try {
+      const response = await axios.get(`${API_BASE_URL}/api/search`, {
+        params: { q: query, limit: 100, fields: 'id' }
+      });
+      setSearchResults(response.data.works.map(work => work.id));
+    } catch (err) {
+      console.error('❌ 搜索失败:', err.message);
+      setSearchResults([]);
+    }
+  };
+
+  const clearSearch = () => {
+    setSearchQuery('');
+    setSearchResults(null);
+  };
+
+  // 搜索结果使用作品列表中的最新数据（点赞、评论数等实时更新）
+  const worksById = new Map(works.map(work => [work.id, work]));
+  const displayedWorks = searchResults
+    ? searchResults.map(id => worksById.get(id)).filter(Boolean)
+    : works;
+
   // 处理用户名修改
   const handleUsernameChange = () => {
     if (newUsername.trim()) {
@@ -116,31 +155,46 @@ function App() {
     }
   }, [fetchWorks]); // 添加fetchWorks依赖项
   
-  // 当works数据变化时更新排行榜
+  // 更新作品的评论数量；同一条评论的增删可能先后从请求响应和实时事件两处到达，只计一次
+  const handledCommentChanges = useRef(new Set());
+  const applyCommentChange = useCallback((workId, key, delta) => {
+    if (handledCommentChanges.current.has(key)) return;
+    handledCommentChanges.current.add(key);
+    setWorks(prevWorks => prevWorks.map(work =>
+      work.id === workId ? { ...work, comments_count: Math.max(0, (work.comments_count || 0) + delta) } : work
+    ));
+  }, []);
+
+  // 实时事件（SSE）：收到增量事件后直接更新本地作品列表，不再重新获取整个列表
   useEffect(() => {
-    console.log('🔄 App useEffect 执行 (works变化):', {
-      worksLength: works.length,
-      timestamp: new Date().toISOString()
-    });
-    
-    if (works.length > 0) {
-      const sorted = [...works].sort((a, b) => b.likes - a.likes);
-      // 只有当排行榜真正发生变化时才更新状态
-      setLeaderboard(prevLeaderboard => {
-        const newLeaderboard = sorted.slice(0, 10);
-        // 比较新旧排行榜是否真的不同
-        if (JSON.stringify(prevLeaderboard) !== JSON.stringify(newLeaderboard)) {
-          console.log('📊 排行榜更新:', {
-            prevLength: prevLeaderboard.length,
-            newLength: newLeaderboard.length,
-            timestamp: new Date().toISOString()
-          });
-          return newLeaderboard;
-        }
-        return prevLeaderboard;
-      });
+    if (typeof EventSource === 'undefined') {
+      return undefined;
     }
-  }, [works]);
+    const source = new EventSource(`${API_BASE_URL}/api/events`);
+    const on = (type, handler) => source.addEventListener(type, event => handler(JSON.parse(event.data)));
+    const updateWork = (workId, update) => setWorks(prevWorks => prevWorks.map(work =>
+      work.id === workId ? { ...work, ...update(work) } : work
+    ));
+
+    on('work_created', newWork => setWorks(prevWorks =>
+      prevWorks.some(work => work.id === newWork.id) ? prevWorks : sortWorks([newWork, ...prevWorks])
+    ));
+    on('work_deleted', ({ work_id }) => setWorks(prevWorks => prevWorks.filter(work => work.id !== work_id)));
+    on('work_pinned', ({ work_id, is_pinned }) => setWorks(prevWorks => sortWorks(prevWorks.map(work =>
+      work.id === work_id ? { ...work, is_pinned } : work
+    ))));
+    on('like', ({ work_id, user_id, likes, liked }) => updateWork(work_id, work => {
+      const likedBy = (work.liked_by || []).filter(id => id !== user_id);
+      return { likes, liked_by: liked ? [...likedBy, user_id] : likedBy };
+    }));
+    // 评论内容由打开的评论区按需加载，这里只更新数量
+    on('comment_added', ({ work_id, comment }) => applyCommentChange(work_id, `added:${comment.id}`, 1));
+    on('comment_deleted', ({ work_id, comment_id }) => applyCommentChange(work_id, `deleted:${comment_id}`, -1));
+    // 断线太久、错过的事件已无法补发时，重新获取作品列表
+    on('reset', () => fetchWorks());
+
+    return () => source.close();
+  }, [fetchWorks, applyCommentChange]);
 
   const handleWorkUploaded = (newWork) => {
     setWorks(prevWorks => [newWork, ...prevWorks]);
@@ -165,6 +219,7 @@ function App() {
         }
         return work;
       }));
+      fetchLeaderboard();
     } catch (err) {
       console.error('Error liking work:', err);
     }
@@ -180,6 +235,7 @@ function App() {
 
       if (response.status === 200) {
         setWorks(prevWorks => prevWorks.filter(work => work.id !== workId));
+        fetchLeaderboard();
         alert('作品删除成功！');
       }
     } catch (err) {
@@ -192,12 +248,12 @@ function App() {
     fetchWorks();
   };
   
-  const handleCommentAdded = () => {
-    fetchWorks();
+  const handleCommentAdded = (workId, commentId) => {
+    applyCommentChange(workId, `added:${commentId}`, 1);
   };
 
-  const handleCommentDeleted = () => {
-    fetchWorks();
+  const handleCommentDeleted = (workId, commentId) => {
+    applyCommentChange(workId, `deleted:${commentId}`, -1);
   };
 
   const handleAdminLogin = (token) => {
@@ -284,6 +340,17 @@ function App() {
         {/* 排行榜 */}
         <div className="leaderboard">
           <h2>🏆 热门作品排行榜</h2>
+          <div className="leaderboard-windows">
+            {[['day', '今日'], ['week', '本周'], ['all', '全部']].map(([value, label]) => (
+              <button
+                key={value}
+                className={leaderboardWindow === value ? 'active' : ''}
+                onClick={() => setLeaderboardWindow(value)}
+              >
+                {label}
+              </button>
+            ))}
+          </div>
           <div className="leaderboard-list">
             {leaderboard.length > 0 ? (
               leaderboard.map((work, index) => (
@@ -300,7 +367,7 @@ function App() {
                   <span className="rank">{index + 1}</span>
                   <span className="work-title">{work.title}</span>
                   <span className="work-author">作者: {work.username || '匿名用户'}{work.realName ? ` (${work.realName})` : ''}</span>
-                  <span className="likes-count">❤️ {work.likes}</span>
+                  <span className="likes-count">❤️ {work.score}</span>
                 </div>
               ))
             ) : (
@@ -319,13 +386,29 @@ function App() {
           />
         )}
 
+        <form className="search-bar" onSubmit={handleSearch}>
+          <input
+            type="search"
+            value={searchQuery}
+            onChange={(e) => setSearchQuery(e.target.value)}
+            placeholder="搜索作品标题、描述、作者或评论"
+            maxLength={200}
+          />
+          <button type="submit">搜索</button>
+          {searchResults && (
+            <button type="button" className="clear-search" onClick={clearSearch}>
+              显示全部
+            </button>
+          )}
+        </form>
+
         <div className="works-grid">
-          {works.length === 0 ? (
+          {displayedWorks.length === 0 ? (
             <div className="empty-state">
-              <p>还没有作品，快来上传第一个作品吧！</p>
+              <p>{searchResults ? '没有找到匹配的作品' : '还没有作品，快来上传第一个作品吧！'}</p>
             </div>
           ) : (
-            works.map(work => (
+            displayedWorks.map(work => (
               <WorkCard
                   key={work.id}
                   work={work}
@@ -3,34 +3,28 @@ import React, { useState } from 'react';
 import { FaHeart, FaRegHeart, FaComment, FaTimes } from 'react-icons/fa';
 import './WorkCard.css';
 import WorkDetailModal from './WorkDetailModal';
+import useComments from './useComments';
 
 const WorkCard = ({ work, onLike, onDelete, onCommentAdded, onCommentDeleted, onWorkUpdated, userId, username, apiBaseUrl, isAdmin }) => {
   const [showComments, setShowComments] = useState(false);
   const [newComment, setNewComment] = useState('');
   const [submittingComment, setSubmittingComment] = useState(false);
-  const [comments, setComments] = useState(work.comments || []);
   const [isPinning, setIsPinning] = useState(false);
   const [imageError, setImageError] = useState(false); // 添加图片错误状态
   const [showDetailModal, setShowDetailModal] = useState(false); // 详情弹窗状态
 
-  // 当work.comments更新时，同步本地状态，避免无限循环
-  React.useEffect(() => {
-    console.log('🔄 WorkCard useEffect 执行:', {
-      workId: work.id,
-      workComments: work.comments,
-      currentComments: comments,
-      timestamp: new Date().toISOString()
-    });
-    
-    const newComments = work.comments || [];
-    // 只有当评论真正不同时才更新，避免无限循环
-    if (JSON.stringify(newComments) !== JSON.stringify(comments)) {
-      setComments(newComments);
-    }
-  }, [work.comments, work.id]); // 移除comments依赖，避免无限循环
+  // 评论按需分页加载（打开评论区时才请求）
+  const { comments, count: commentsCount, hasMore, loading: loadingComments, loadMore, addComment, removeComment } =
+    useComments(work, apiBaseUrl, showComments);
 
   const isLiked = work.liked_by.includes(userId);
 
+  // 卡片中优先使用服务端生成的中等尺寸图片
+  const cardImageUrl = (imageUrl, index) => {
+    const url = (work.image_variants && work.image_variants[index] && work.image_variants[index].medium) || imageUrl;
+    return url.startsWith('http') ? url : `${apiBaseUrl}${url}`;
+  };
+
   const handleLikeClick = () => {
     onLike(work.id, isLiked);
   };
@@ -61,11 +55,11 @@ const WorkCard = ({ work, onLike, onDelete, onCommentAdded, onCommentDeleted, on
 
       if (response.ok) {
         const comment = await response.json();
-        setComments([...comments, comment]);
+        addComment(comment);
         setNewComment('');
         // 通知父组件更新评论数量
         if (onCommentAdded) {
-          onCommentAdded();
+          onCommentAdded(work.id, comment.id);
         }
       } else {
         const errorData = await response.json();
@@ -95,10 +89,10 @@ const WorkCard = ({ work, onLike, onDelete, onCommentAdded, onCommentDeleted, on
       });
 
       if (response.ok) {
-        setComments(comments.filter(c => c.id !== commentId));
+        removeComment(commentId);
         // 通知父组件更新评论数量
         if (onCommentDeleted) {
-          onCommentDeleted();
+          onCommentDeleted(work.id, commentId);
         }
       } else {
         const errorData = await response.json();
@@ -221,7 +215,7 @@ const WorkCard = ({ work, onLike, onDelete, onCommentAdded, onCommentDeleted, on
                 {work.image_urls.map((imageUrl, index) => (
                   <img 
                     key={index}
-                    src={imageUrl.startsWith('http') ? imageUrl : `${apiBaseUrl}${imageUrl}`}
+                    src={cardImageUrl(imageUrl, index)}
                     alt={`${work.title} - 图片 ${index + 1}`}
                     className="work-image"
                     onError={(e) => {
@@ -238,7 +232,7 @@ const WorkCard = ({ work, onLike, onDelete, onCommentAdded, onCommentDeleted, on
                 {!imageError ? (
                   <img 
                     src={work.main_image_url ? 
-                      (work.main_image_url.startsWith('http') ? work.main_image_url : `${apiBaseUrl}${work.main_image_url}`) :
+                      cardImageUrl(work.main_image_url, 0) :
                       (work.image_url ? `${apiBaseUrl}${work.image_url}` : null)
                     }
                     alt={work.title}
@@ -292,7 +286,7 @@ const WorkCard = ({ work, onLike, onDelete, onCommentAdded, onCommentDeleted, on
                   aria-label="查看评论"
                 >
                   <FaComment />
-                  <span className="comment-count">{comments.length}</span>
+                  <span className="comment-count">{commentsCount}</span>
                 </button>
               </div>
             </div>
@@ -300,7 +294,7 @@ const WorkCard = ({ work, onLike, onDelete, onCommentAdded, onCommentDeleted, on
             {/* 评论区域 */}
             {showComments && (
               <div className="comments-section">
-                <h4>评论 ({comments.length})</h4>
+                <h4>评论 ({commentsCount})</h4>
                 
                 {/* 添加评论表单 */}
                 <form onSubmit={handleAddComment} className="comment-form">
@@ -324,7 +318,7 @@ const WorkCard = ({ work, onLike, onDelete, onCommentAdded, onCommentDeleted, on
                 {/* 评论列表 */}
                 <div className="comments-list">
                   {comments.length === 0 ? (
-                    <p className="no-comments">还没有评论，快来发表第一条评论吧！</p>
+                    <p className="no-comments">{loadingComments ? '加载评论中...' : '还没有评论，快来发表第一条评论吧！'}</p>
                   ) : (
                     comments.map(comment => (
                       <div key={comment.id} className="comment-item">
@@ -345,6 +339,11 @@ const WorkCard = ({ work, onLike, onDelete, onCommentAdded, onCommentDeleted, on
                       </div>
                     ))
                   )}
+                  {hasMore && (
+                    <button className="load-more-comments" onClick={loadMore} disabled={loadingComments}>
+                      {loadingComments ? '加载中...' : '加载更多评论'}
+                    </button>
+                  )}
                 </div>
               </div>
             )}
@@ -358,6 +357,8 @@ const WorkCard = ({ work, onLike, onDelete, onCommentAdded, onCommentDeleted, on
         isOpen={showDetailModal}
         onClose={() => setShowDetailModal(false)}
         onLike={handleLikeClick}
+        onCommentAdded={onCommentAdded}
+        onCommentDeleted={onCommentDeleted}
         userId={userId}
         username={username}
         apiBaseUrl={apiBaseUrl}
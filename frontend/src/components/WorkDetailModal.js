@@ -1,13 +1,16 @@
 import React, { useState } from 'react';
 import { FaHeart, FaRegHeart, FaComment, FaTimes, FaChevronLeft, FaChevronRight } from 'react-icons/fa';
 import './WorkDetailModal.css';
+import useComments from './useComments';
 
-const WorkDetailModal = ({ work, isOpen, onClose, onLike, userId, username, apiBaseUrl, isAdmin }) => {
+const WorkDetailModal = ({ work, isOpen, onClose, onLike, onCommentAdded, onCommentDeleted, userId, username, apiBaseUrl, isAdmin }) => {
   const [currentImageIndex, setCurrentImageIndex] = useState(0);
   const [showComments, setShowComments] = useState(false);
   const [newComment, setNewComment] = useState('');
   const [submittingComment, setSubmittingComment] = useState(false);
-  const [comments, setComments] = useState(work?.comments || []);
+  // 评论按需分页加载（打开评论区时才请求）
+  const { comments, count: commentsCount, hasMore, loading: loadingComments, loadMore, addComment, removeComment } =
+    useComments(work, apiBaseUrl, isOpen && showComments);
 
   if (!isOpen || !work) return null;
 
@@ -46,8 +49,11 @@ const WorkDetailModal = ({ work, isOpen, onClose, onLike, userId, username, apiB
 
       if (response.ok) {
         const comment = await response.json();
-        setComments([...comments, comment]);
+        addComment(comment);
         setNewComment('');
+        if (onCommentAdded) {
+          onCommentAdded(work.id, comment.id);
+        }
       } else {
         const errorData = await response.json();
         alert('添加评论失败: ' + (errorData.error || '未知错误'));
@@ -76,7 +82,10 @@ const WorkDetailModal = ({ work, isOpen, onClose, onLike, userId, username, apiB
       });
 
       if (response.ok) {
-        setComments(comments.filter(c => c.id !== commentId));
+        removeComment(commentId);
+        if (onCommentDeleted) {
+          onCommentDeleted(work.id, commentId);
+        }
       } else {
         const errorData = await response.json();
         alert('删除评论失败: ' + (errorData.error || '未知错误'));
@@ -188,14 +197,14 @@ const WorkDetailModal = ({ work, isOpen, onClose, onLike, userId, username, apiB
             onClick={() => setShowComments(!showComments)}
           >
             <FaComment />
-            <span>评论 ({comments.length})</span>
+            <span>评论 ({commentsCount})</span>
           </button>
         </div>
 
         {/* 评论区域 */}
         {showComments && (
           <div className="modal-comments">
-            <h3>评论 ({comments.length})</h3>
+            <h3>评论 ({commentsCount})</h3>
             
             {/* 添加评论 */}
             <form className="comment-form" onSubmit={handleAddComment}>
@@ -218,7 +227,7 @@ const WorkDetailModal = ({ work, isOpen, onClose, onLike, userId, username, apiB
             {/* 评论列表 */}
             <div className="comments-list">
               {comments.length === 0 ? (
-                <p className="no-comments">还没有评论，快来抢沙发吧！</p>
+                <p className="no-comments">{loadingComments ? '加载评论中...' : '还没有评论，快来抢沙发吧！'}</p>
               ) : (
                 comments.map(comment => (
                   <div key={comment.id} className="comment-item">
@@ -238,6 +247,11 @@ const WorkDetailModal = ({ work, isOpen, onClose, onLike, userId, username, apiB
                   </div>
                 ))
               )}
+              {hasMore && (
+                <button className="load-more-comments" onClick={loadMore} disabled={loadingComments}>
+                  {loadingComments ? '加载中...' : '加载更多评论'}
+                </button>
+              )}
             </div>
           </div>
         )}
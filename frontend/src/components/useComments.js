@@ -0,0 +1,81 @@
+import { useState, useEffect, useCallback } from 'react';
+
+const PAGE_SIZE = 20;
+
+// 按需分页加载作品评论：作品列表中只有 comments_count，打开评论区时才请求第一页
+const useComments = (work, apiBaseUrl, open) => {
+  const workId = work?.id;
+  const total = work?.comments_count;
+  const [comments, setComments] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [hasMore, setHasMore] = useState(false);
+  const [loading, setLoading] = useState(false);
+
+  const fetchPage = useCallback(async (cursor) => {
+    const params = new URLSearchParams({ limit: PAGE_SIZE });
+    if (cursor) {
+      params.set('cursor', cursor);
+    }
+    const response = await fetch(`${apiBaseUrl}/api/works/${workId}/comments?${params}`);
+    if (!response.ok) {
+      throw new Error(`HTTP ${response.status}`);
+    }
+    return response.json();
+  }, [apiBaseUrl, workId]);
+
+  const reload = useCallback(async () => {
+    setLoading(true);
+    try {
+      const page = await fetchPage(null);
+      setComments(page.comments);
+      setNextCursor(page.next_cursor);
+      setHasMore(page.has_more);
+    } catch (error) {
+      console.error('加载评论失败:', error);
+    } finally {
+      setLoading(false);
+    }
+  }, [fetchPage]);
+
+  const loadMore = async () => {
+    if (!nextCursor || loading) return;
+    setLoading(true);
+    try {
+      const page = await fetchPage(nextCursor);
+      setComments(prev => [...prev, ...page.comments.filter(c => !prev.some(p => p.id === c.id))]);
+      setNextCursor(page.next_cursor);
+      setHasMore(page.has_more);
+    } catch (error) {
+      console.error('加载评论失败:', error);
+    } finally {
+      setLoading(false);
+    }
+  };
+
+  // 打开评论区时加载；其他用户增删评论（comments_count 变化）后重新加载
+  useEffect(() => {
+    if (open) {
+      reload();
+    }
+  }, [open, reload, total]);
+
+  const addComment = (comment) => {
+    setComments(prev => (prev.some(c => c.id === comment.id) ? prev : [...prev, comment]));
+  };
+
+  const removeComment = (commentId) => {
+    setComments(prev => prev.filter(c => c.id !== commentId));
+  };
+
+  return {
+    comments,
+    count: total ?? comments.length,
+    hasMore,
+    loading,
+    loadMore,
+    addComment,
+    removeComment
+  };
+};
+
+export default useComments;